@@ -0,0 +1,99 @@
+"""
+Benchmark: brand lookalike matching latency against a large corpus.
+
+Builds a synthetic corpus (the bundled brand list plus generated names) and
+measures per-label latency of ``BrandMatcher.match``. Results for a sample of
+queries are checked against a brute-force ``extractOne`` over the whole
+corpus, so the prefilter is verified to be lossless.
+
+Usage:
+    python benchmarks/bench_brand_match.py [--brands 50000] [--queries 5000]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rapidfuzz import fuzz, process  # noqa: E402
+
+from core import rules  # noqa: E402
+from core.brands import BrandMatcher, normalize_label  # noqa: E402
+
+CONSONANTS = 'bcdfghjklmnpqrstvwxz'
+VOWELS = 'aeiou'
+
+
+def synthetic_name(rng: random.Random) -> str:
+    return ''.join(rng.choice(CONSONANTS) + rng.choice(VOWELS) for _ in range(rng.randint(2, 6)))
+
+
+def typo(rng: random.Random, name: str) -> str:
+    """Apply one random edit, the way a typosquatter would."""
+    i = rng.randrange(len(name))
+    edit = rng.choice(('drop', 'swap', 'double', 'replace'))
+    if edit == 'drop':
+        return name[:i] + name[i + 1:]
+    if edit == 'swap' and i < len(name) - 1:
+        return name[:i] + name[i + 1] + name[i] + name[i + 2:]
+    if edit == 'double':
+        return name[:i] + name[i] + name[i:]
+    return name[:i] + rng.choice(CONSONANTS + VOWELS) + name[i + 1:]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--brands', type=int, default=50000)
+    parser.add_argument('--queries', type=int, default=5000)
+    parser.add_argument('--verify', type=int, default=500, help='queries checked against brute force')
+    parser.add_argument('--seed', type=int, default=2049)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    rules.load_brand_names()
+    corpus = set(rules.BRAND_NAMES)
+    while len(corpus) < args.brands:
+        corpus.add(synthetic_name(rng))
+    corpus = sorted(corpus)
+
+    started = time.perf_counter()
+    matcher = BrandMatcher(corpus)
+    build_ms = (time.perf_counter() - started) * 1000
+
+    # Half lookalikes of protected brands, half unrelated domains
+    queries = [typo(rng, rng.choice(corpus)) if i % 2 else synthetic_name(rng) + rng.choice(('', 'shop', 'online'))
+               for i in range(args.queries)]
+
+    latencies = []
+    hits = 0
+    for query in queries:
+        started = time.perf_counter()
+        result = matcher.match(query)
+        latencies.append((time.perf_counter() - started) * 1000)
+        hits += result is not None
+    latencies.sort()
+
+    normalized_corpus = [normalize_label(name) for name in corpus]
+    mismatches = 0
+    for query in queries[:args.verify]:
+        expected = process.extractOne(normalize_label(query), normalized_corpus, scorer=fuzz.ratio,
+                                      score_cutoff=matcher.threshold)
+        expected_score = expected[1] if expected and expected[1] > matcher.threshold else None
+        result = matcher.match(query)
+        if (result[1] if result else None) != expected_score:
+            mismatches += 1
+
+    print(f"corpus size:        {len(matcher)}")
+    print(f"build time:         {build_ms:.0f} ms")
+    print(f"queries:            {len(queries)} ({hits} matched)")
+    print(f"latency mean:       {statistics.mean(latencies):.3f} ms")
+    print(f"latency p50:        {latencies[len(latencies) // 2]:.3f} ms")
+    print(f"latency p99:        {latencies[int(len(latencies) * 0.99)]:.3f} ms")
+    print(f"brute-force check:  {args.verify - mismatches}/{args.verify} identical scores")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""
+Benchmark: denylist index build, snapshot load and lookup latency.
+
+Generates a synthetic feed, builds a ``DomainIndex`` from it, writes and
+memory-maps a snapshot, and times lookups of deep subdomains (hits through a
+parent domain and misses).
+
+Usage:
+    python benchmarks/bench_domain_index.py [--domains 2000000] [--lookups 20000]
+"""
+import argparse
+import os
+import random
+import statistics
+import string
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.domain_index import DomainIndex  # noqa: E402
+
+TLDS = ('com', 'net', 'org', 'xyz', 'top', 'shop', 'co.uk')
+
+
+def random_domain(rng: random.Random) -> str:
+    label = ''.join(rng.choices(string.ascii_lowercase + string.digits, k=rng.randint(6, 14)))
+    return f"{label}.{rng.choice(TLDS)}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--domains', type=int, default=2_000_000)
+    parser.add_argument('--lookups', type=int, default=20000)
+    parser.add_argument('--seed', type=int, default=2049)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    listed = [random_domain(rng) for _ in range(args.domains)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        feed_path = os.path.join(tmp, 'feed.txt')
+        snapshot_path = os.path.join(tmp, 'feed.idx')
+        with open(feed_path, 'w') as f:
+            f.write('\n'.join(listed))
+
+        started = time.perf_counter()
+        index = DomainIndex.from_text_files([feed_path])
+        build_s = time.perf_counter() - started
+        index.save(snapshot_path)
+
+        started = time.perf_counter()
+        index = DomainIndex.load(snapshot_path)
+        load_ms = (time.perf_counter() - started) * 1000
+
+        hosts = [f"login.secure.{rng.choice(listed)}" if i % 2 else f"www.{random_domain(rng)}"
+                 for i in range(args.lookups)]
+        latencies = []
+        hits = 0
+        for host in hosts:
+            started = time.perf_counter()
+            hits += host in index
+            latencies.append((time.perf_counter() - started) * 1_000_000)
+        latencies.sort()
+
+        print(f"entries:            {len(index)}")
+        print(f"snapshot size:      {os.path.getsize(snapshot_path) / 1e6:.1f} MB")
+        print(f"build from text:    {build_s:.2f} s")
+        print(f"snapshot load:      {load_ms:.2f} ms")
+        print(f"lookups:            {len(hosts)} ({hits} hits, expected {args.lookups // 2})")
+        print(f"lookup mean:        {statistics.mean(latencies):.1f} us")
+        print(f"lookup p99:         {latencies[int(len(latencies) * 0.99)]:.1f} us")
+
+
+if __name__ == '__main__':
+    main()
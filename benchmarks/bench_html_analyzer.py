@@ -0,0 +1,114 @@
+"""
+Micro-benchmark: single-pass HTML analyzer vs. the previous two-tree path.
+
+The previous scanner built one BeautifulSoup tree to look for redirects and a
+second one to look for sensitive forms. This script times that path against
+``core.html_analyzer.analyze_html`` (stdlib and, if installed, lxml backends)
+on synthetic pages of increasing size.
+
+Usage:
+    python benchmarks/bench_html_analyzer.py [--sizes 100 1000 5000] [--repeat 5]
+"""
+import argparse
+import os
+import re
+import sys
+import time
+from urllib.parse import urljoin
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4 import BeautifulSoup, Tag  # noqa: E402
+
+from core import html_analyzer  # noqa: E402
+from core.rules import SENSITIVE_INPUT_KEYWORDS  # noqa: E402
+
+BASE_URL = "https://example.com/landing"
+
+
+def build_page(blocks: int) -> str:
+    """A page with ``blocks`` repeated sections of text, links, scripts and forms."""
+    parts = ["<html><head><title>Account verification</title></head><body>"]
+    for i in range(blocks):
+        parts.append(
+            f'<div class="row-{i}"><p>Lorem ipsum dolor sit amet {i} '
+            f'<a href="/item/{i}">item {i}</a></p>'
+            f'<script>var counter{i} = {i}; function f{i}() {{ return counter{i} * 2; }}</script>'
+            f'<form action="/search"><input type="text" name="q{i}"></form></div>'
+        )
+    parts.append('<form action="/login"><input type="password" name="password"></form>')
+    parts.append('<script>window.location.href = "/next";</script></body></html>')
+    return ''.join(parts)
+
+
+def legacy_two_tree(html: str, base_url: str) -> tuple[str | None, bool]:
+    """The pre-analyzer code path: two BeautifulSoup trees plus per-script regex compiles."""
+    soup = BeautifulSoup(html, 'html.parser')
+    redirect = None
+    meta_refresh = soup.find('meta', attrs={'http-equiv': re.compile(r'refresh', re.I)})
+    if isinstance(meta_refresh, Tag) and meta_refresh.has_attr('content'):
+        match = re.search(r'url\s*=\s*([\'"]?)(.*?)\1', str(meta_refresh['content']), re.I)
+        if match and match.group(2).strip():
+            redirect = urljoin(base_url, match.group(2).strip())
+    if redirect is None:
+        for script in soup.find_all('script'):
+            if script.string:
+                pattern = re.compile(
+                    r"""
+                    window\.location\s*=\s*['"]([^'"]+)['"]|
+                    window\.location\.href\s*=\s*['"]([^'"]+)['"]|
+                    window\.location\.replace\(['"]([^'"]+)['"]\)
+                    """,
+                    re.IGNORECASE | re.VERBOSE
+                )
+                match = pattern.search(script.string)
+                if match:
+                    redirect = urljoin(base_url, next(g for g in match.groups() if g))
+                    break
+
+    soup = BeautifulSoup(html, 'html.parser')
+    sensitive = False
+    for form in soup.find_all('form'):
+        for input_tag in form.find_all('input'):
+            if input_tag.get('type', '').lower() == 'password' or any(
+                    k in input_tag.get('name', '').lower() or k in input_tag.get('id', '').lower()
+                    for k in SENSITIVE_INPUT_KEYWORDS):
+                sensitive = True
+    return redirect, sensitive
+
+
+def best_of(fn, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 5000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    backends = [('stdlib', False)]
+    if html_analyzer._lxml_etree is not None:
+        backends.append(('lxml', True))
+
+    print(f"{'blocks':>8} {'page KB':>9} {'two-tree ms':>12} " +
+          ' '.join(f"{name + ' ms':>10} {'speedup':>8}" for name, _ in backends))
+    for blocks in args.sizes:
+        html = build_page(blocks)
+        legacy_ms = best_of(lambda: legacy_two_tree(html, BASE_URL), args.repeat)
+        row = f"{blocks:>8} {len(html) / 1024:>9.0f} {legacy_ms:>12.1f} "
+        for _, use_lxml in backends:
+            result = html_analyzer.analyze_html(html, BASE_URL, use_lxml)
+            assert result.redirect_url == urljoin(BASE_URL, "/next") and result.has_sensitive_form
+            ms = best_of(lambda: html_analyzer.analyze_html(html, BASE_URL, use_lxml), args.repeat)
+            row += f"{ms:>10.1f} {legacy_ms / ms:>7.1f}x "
+        print(row)
+
+
+if __name__ == '__main__':
+    main()
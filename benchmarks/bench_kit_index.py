@@ -0,0 +1,164 @@
+"""
+Benchmark: phishing kit fingerprint index lookups.
+
+Fills a ``KitIndex`` with random fingerprints, then times lookups of
+perturbed copies of indexed fingerprints (near duplicates within
+``max_distance`` bits, which must all be found) and of unrelated
+fingerprints, against a brute-force popcount scan of the whole feed. Also
+fingerprints a few kit templates deployed for different brands, to show
+how far apart deployments of the same kit land, and counts how many
+ordinary pages (articles, shops, docs, plain login and sign-up forms) an
+index of those kits would flag.
+
+Usage:
+    python benchmarks/bench_kit_index.py [--kits 1000000] [--lookups 2000] [--benign 2000]
+"""
+import argparse
+import itertools
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+
+from core import kit_index  # noqa: E402
+from core.html_analyzer import analyze_html  # noqa: E402
+
+# Phishing kit templates, each deployed once per brand below
+KIT_PAGES = (
+    """<html><head><title>{brand} - Sign in</title><style>body {{ font: 14px sans-serif }}</style></head>
+<body><div class="wrap"><img src="logo.png"><h1>Sign in to your {brand} account</h1>
+<form method="post" action="next.php"><input type="email" name="login_email" placeholder="Email">
+<input type="password" name="login_pass"><button type="submit" name="go">Continue</button></form>
+<p>Your account has been limited until we hear from you. Please confirm your details to restore
+full access to your {brand} account. We will never ask you to share your password.</p>
+<p>Session {session}</p><div class="footer"><a href="#">Privacy</a> <a href="#">Legal</a>
+<a href="#">Help</a></div></div></body></html>""",
+    """<html><head><title>{brand} | Billing update</title></head><body><header><img src="img/logo.svg"><span>{brand}</span></header>
+<main><h2>Update your payment method</h2><p>We could not process your last payment. Update your billing
+information within 24 hours to avoid suspension of your {brand} membership.</p>
+<form action="billing/submit.php" method="post"><label>Name on card</label><input type="text" name="cc_name">
+<label>Card number</label><input type="text" name="cc_number"><label>Expiry</label><input type="text" name="cc_exp">
+<label>CVV</label><input type="password" name="cc_cvv"><input type="submit" value="Update"></form>
+<p class="small">Session {session}. &copy; {brand} Inc.</p></main>
+<footer><a href="#">Terms</a><a href="#">Privacy</a><a href="#">Cookies</a></footer></body></html>""",
+    """<!doctype html><html><head><meta charset="utf-8"><title>Sign in to your account</title></head>
+<body><div id="lightbox"><div class="logo"><img src="logo.svg" alt="{brand}"></div><div id="displayName">user@{brand}.com</div>
+<div class="title">Enter password</div><form name="f1" method="post" action="post.php"><input type="hidden" name="login" value="{session}">
+<input name="passwd" type="password" placeholder="Password"><div><a href="#">Forgot my password</a></div>
+<input type="submit" value="Sign in"></form><div class="footer">Terms of use Privacy &amp; cookies</div>
+<p>Because you're accessing sensitive info, you need to verify your password.</p></div></body></html>""",
+)
+BRANDS = ("PayPal", "Netflix", "Chase", "Microsoft", "Apple", "Amazon", "Wells Fargo", "DHL",
+          "Bank of America", "Office 365", "Coinbase", "Spotify")
+
+WORDS = ("the of and a to in is you that it was for on are as with they at be this have from or one had by word "
+         "but not what all were we when your can said there use an each which do how their if will up other about "
+         "out many then them these so some would make like into time has look two more write go see number no way "
+         "could people my than first water been call who now find long down day did get come made may part").split()
+
+
+def sentence(rng: random.Random, words: int) -> str:
+    return ' '.join(rng.choice(WORDS) for _ in range(words)).capitalize() + '.'
+
+
+def benign_page(rng: random.Random) -> str:
+    """A random page from a few ordinary layouts, including plain login and sign-up forms."""
+    kind = rng.randrange(5)
+    if kind == 0:
+        return (f"<html><head><title>{sentence(rng, 4)}</title></head><body><nav><a href='/'>Home</a>"
+                f"<a href='/blog'>Blog</a></nav><article><h1>{sentence(rng, 5)}</h1>"
+                + ''.join(f"<p>{sentence(rng, rng.randint(8, 30))}</p>" for _ in range(rng.randint(2, 8)))
+                + "</article><footer>(c) 2024</footer></body></html>")
+    if kind == 1:
+        return ("<html><head><title>Shop</title></head><body><div class='grid'>"
+                + ''.join(f"<div class='item'><img src='{i}.jpg'><h3>{sentence(rng, 3)}</h3>"
+                          f"<span class='price'>$ {rng.randint(1, 99)}</span><button>Add to cart</button></div>"
+                          for i in range(rng.randint(3, 12)))
+                + "</div></body></html>")
+    if kind == 2:
+        return (f"<html><head><title>{sentence(rng, 2)} - Log in</title></head><body><div class='container'>"
+                "<h1>Log in</h1><form method='post' action='/session'><label>Username</label>"
+                "<input type='text' name='username'><label>Password</label><input type='password' name='password'>"
+                "<input type='checkbox' name='remember'> Remember me<button type='submit'>Log in</button></form>"
+                f"<p>{sentence(rng, 10)}</p><a href='/reset'>Forgot password?</a></div></body></html>")
+    if kind == 3:
+        return (f"<html><head><title>Docs</title></head><body><aside><ul>"
+                + ''.join(f"<li><a href='#s{i}'>{sentence(rng, 2)}</a></li>" for i in range(8)) + "</ul></aside><main>"
+                + ''.join(f"<h2 id='s{i}'>{sentence(rng, 3)}</h2><p>{sentence(rng, 15)}</p>"
+                          f"<pre><code>{sentence(rng, 6)}</code></pre>" for i in range(rng.randint(2, 6)))
+                + "</main></body></html>")
+    return (f"<html><head><title>{sentence(rng, 3)}</title></head><body><div class='wrap'><h1>{sentence(rng, 5)}</h1>"
+            "<form method='post' action='subscribe.php'><input type='email' name='email' placeholder='Email'>"
+            f"<button type='submit'>Subscribe</button></form><p>{sentence(rng, rng.randint(10, 30))}</p>"
+            "<div class='footer'><a href='#'>Privacy</a> <a href='#'>Legal</a></div></div></body></html>")
+
+
+def fingerprint(html: str) -> int | None:
+    return analyze_html(html, "https://x.test/").fingerprint
+
+
+def perturb(rng: random.Random, fingerprint: int, bits: int) -> int:
+    for bit in rng.sample(range(kit_index.FINGERPRINT_BITS), bits):
+        fingerprint ^= 1 << bit
+    return fingerprint
+
+
+def brute_force(fingerprints: np.ndarray, query: int, max_distance: int) -> bool:
+    differing = np.unpackbits((fingerprints ^ np.uint64(query)).view(np.uint8)).reshape(-1, 64).sum(axis=1)
+    return bool((differing <= max_distance).any())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--kits', type=int, default=1_000_000)
+    parser.add_argument('--lookups', type=int, default=2000)
+    parser.add_argument('--max-distance', type=int, default=kit_index.MAX_DISTANCE)
+    parser.add_argument('--benign', type=int, default=2000, help='ordinary pages checked for false positives')
+    parser.add_argument('--seed', type=int, default=2049)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    fingerprints = [rng.getrandbits(64) for _ in range(args.kits)]
+    started = time.perf_counter()
+    index = kit_index.KitIndex(((fp, f"kit-{i}") for i, fp in enumerate(fingerprints)), args.max_distance)
+    print(f"kits:                 {len(index)} (built in {time.perf_counter() - started:.2f} s)")
+
+    near = [perturb(rng, rng.choice(fingerprints), rng.randint(0, args.max_distance))
+            for _ in range(args.lookups)]
+    unrelated = [rng.getrandbits(64) for _ in range(args.lookups)]
+    for name, queries in (("near-duplicate", near), ("unrelated", unrelated)):
+        latencies, found = [], 0
+        for query in queries:
+            started = time.perf_counter()
+            found += index.match(query) is not None
+            latencies.append((time.perf_counter() - started) * 1e6)
+        print(f"{name + ':':<21} p50 {statistics.median(latencies):.0f} us, "
+              f"p99 {statistics.quantiles(latencies, n=100)[98]:.0f} us, found {found}/{len(queries)}")
+
+    array = np.array(fingerprints, dtype=np.uint64)
+    started = time.perf_counter()
+    for query in near[:20]:
+        brute_force(array, query, args.max_distance)
+    print(f"brute force:          {(time.perf_counter() - started) / 20 * 1e6:.0f} us per lookup")
+
+    # Same kit redeployed for other brands, against ordinary pages
+    deployments = [[fingerprint(page.format(brand=brand, session=rng.getrandbits(32))) for brand in BRANDS]
+                   for page in KIT_PAGES]
+    same_kit = [(a ^ b).bit_count() for kit in deployments for a, b in itertools.combinations(kit, 2)]
+    print(f"same kit, other brand: mean {statistics.mean(same_kit):.1f} bits, max {max(same_kit)}, "
+          f"within {args.max_distance}: {sum(d <= args.max_distance for d in same_kit)}/{len(same_kit)}")
+    known = kit_index.KitIndex(((fp, f"kit-{k}") for k, kit in enumerate(deployments) for fp in kit), args.max_distance)
+    kit_fingerprints = [fp for kit in deployments for fp in kit]
+    benign = [fp for fp in (fingerprint(benign_page(rng)) for _ in range(args.benign)) if fp is not None]
+    nearest = [min((fp ^ kit).bit_count() for kit in kit_fingerprints) for fp in benign]
+    false_positives = sum(known.match(fp) is not None for fp in benign)
+    print(f"benign pages:         nearest kit min {min(nearest)} bits, median {statistics.median(nearest):.0f}; "
+          f"false positives {false_positives}/{len(benign)}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+"""
+Benchmark: batch lexical features and pre-scoring throughput.
+
+Generates a synthetic feed (plain URLs mixed with IP hosts, punycode, user@
+tricks, deep subdomains, suspicious TLDs and long random paths), then
+measures URLs/second for ``core.lexical`` against a one-URL-at-a-time
+reference built on ``urlsplit`` and ``core.psl``. The reference also checks
+that the host-derived features of both agree.
+
+Usage:
+    python benchmarks/bench_lexical.py [--urls 1000000] [--reference 20000]
+"""
+import argparse
+import ipaddress
+import math
+import os
+import random
+import string
+import sys
+import time
+from collections import Counter
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+
+from core import lexical, psl, rules  # noqa: E402
+
+TLDS = ('com', 'net', 'org', 'io', 'co.uk', 'com.au', 'de', 'xyz', 'top', 'shop', 'click')
+WORDS = ('login', 'secure', 'account', 'verify', 'update', 'mail', 'cdn', 'static', 'app', 'www')
+
+
+def random_label(rng: random.Random, low: int = 4, high: int = 12) -> str:
+    return ''.join(rng.choices(string.ascii_lowercase + string.digits, k=rng.randint(low, high)))
+
+
+def synthetic_url(rng: random.Random) -> str:
+    host = f"{random_label(rng)}.{rng.choice(TLDS)}"
+    kind = rng.random()
+    if kind < 0.3:
+        host = '.'.join(rng.sample(WORDS, rng.randint(1, 4))) + '.' + host
+    elif kind < 0.35:
+        host = '.'.join(str(rng.randint(1, 254)) for _ in range(4))
+    elif kind < 0.4:
+        host = f"xn--{random_label(rng)}-{random_label(rng, 3, 4)}.{rng.choice(TLDS)}"
+    path = '/'.join(random_label(rng, 2, 10) for _ in range(rng.randint(0, 4)))
+    url = f"{rng.choice(('http', 'https'))}://{host}/{path}"
+    if rng.random() < 0.03:
+        url = url.replace('://', f"://{random_label(rng)}.com@", 1)
+    if rng.random() < 0.03:
+        url += f"//{random_label(rng)}.com"
+    if rng.random() < 0.3:
+        url += '?' + '&'.join(f"{random_label(rng, 1, 6)}={random_label(rng, 1, 30)}"
+                              for _ in range(rng.randint(1, 4)))
+    return url
+
+
+def reference_features(url: str, suspicious: frozenset) -> dict:
+    """The same host-derived features, one URL at a time."""
+    parts = urlsplit(url if '://' in url else f"//{url}")
+    host = (parts.hostname or '').rstrip('.')
+    try:
+        ipaddress.ip_address(host)
+        ip_host = True
+    except ValueError:
+        ip_host = host.replace('.', '').isdigit()
+    extracted = psl.extract(host)
+    labels = host.count('.') + 1 if host else 0
+    suffix_labels = extracted.suffix.count('.') + 1 if extracted.suffix else 1
+    counts = Counter(url)
+    return {
+        'entropy': -sum(c / len(url) * math.log2(c / len(url)) for c in counts.values()) if url else 0.0,
+        'ip_host': ip_host,
+        'at_sign': '@' in parts.netloc,
+        'punycode': any(label.startswith('xn--') for label in host.split('.')) or not host.isascii(),
+        'suspicious_tld': not ip_host and extracted.suffix in suspicious,
+        'subdomain_depth': 0 if ip_host else max(labels - suffix_labels - 1, 0),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--urls', type=int, default=1_000_000)
+    parser.add_argument('--reference', type=int, default=20000, help='URLs run through the per-URL reference')
+    parser.add_argument('--threshold', type=int, default=lexical.PRESCORE_THRESHOLD)
+    parser.add_argument('--seed', type=int, default=2049)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    urls = [synthetic_url(rng) for _ in range(args.urls)]
+    scorer = lexical.scorer()
+    scorer.features(urls[:100])  # warm up
+
+    started = time.perf_counter()
+    features = scorer.features(urls)
+    scores = features.prescore()
+    elapsed = time.perf_counter() - started
+    risky = scores >= args.threshold
+    print(f"urls:                 {args.urls}")
+    print(f"vectorized:           {args.urls / elapsed:,.0f} URLs/s ({elapsed:.2f} s)")
+    print(f"pre-score >= {args.threshold:<3}:     {risky.sum()} ({risky.mean():.1%}) go on to a full scan")
+    for name, flag in features.flags().items():
+        print(f"  {name + ':':<19} {flag.mean():.1%}")
+
+    sample = urls[:args.reference]
+    suspicious = frozenset(s.lower().lstrip('.') for s in rules.read_list("resources/suspicious_tlds.txt"))
+    psl.load()
+    started = time.perf_counter()
+    expected = [reference_features(url, suspicious) for url in sample]
+    reference_s = time.perf_counter() - started
+    print(f"per-URL reference:    {len(sample) / reference_s:,.0f} URLs/s "
+          f"({args.urls / elapsed / (len(sample) / reference_s):.0f}x slower)")
+    mismatches = Counter()
+    for i, values in enumerate(expected):
+        for name, value in values.items():
+            actual = getattr(features, name)[i]
+            if not np.isclose(actual, value):
+                mismatches[name] += 1
+    print(f"mismatches:           {dict(mismatches) or 'none'} of {len(sample)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""
+Benchmark: memory per scan result and JSON encoding cost.
+
+Compares the slotted result models against equivalent plain dataclasses,
+and the shared encoder (``core.serialization``) against building the
+response dicts by hand and passing them to the stdlib ``json`` module.
+
+Usage:
+    python benchmarks/bench_serialization.py [--results 100000] [--hops 3]
+"""
+import argparse
+import dataclasses
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core import serialization  # noqa: E402
+from core.models import TraceHop, TraceResult, Verdict  # noqa: E402
+
+
+def plain(cls):
+    """The same fields as ``cls`` on a regular (dict-backed) dataclass."""
+    fields = [(f.name, f.type, f) for f in dataclasses.fields(cls)]
+    return dataclasses.make_dataclass(f"Plain{cls.__name__}", fields)
+
+
+def make_result(hop_cls, result_cls, verdict_cls, i: int, hops: int):
+    trace = result_cls(input_url=f"https://example{i}.com/login", final_url=f"https://example{i}.com/account",
+                       hops=[hop_cls(f"https://example{i}.com/{n}", 302, "Found", 40,
+                                     {"dns": 1.2, "connect": 8.5, "ttfb": 20.1}) for n in range(hops)],
+                       content_type="text/html", has_login_form=True,
+                       timings={"validate": 0.1, "fetch": 70.2, "total": 72.0})
+    return trace, verdict_cls("SUSPICIOUS", 30, ("Page contains a sensitive data form (password, etc.)",))
+
+
+def hand_built(trace, verdict) -> dict:
+    """What web_app used to assemble for every response."""
+    return {
+        'trace_result': {
+            'input_url': trace.input_url, 'final_url': trace.final_url,
+            'hops': [{'url': h.url, 'status_code': h.status_code, 'reason': h.reason,
+                      'elapsed_ms': h.elapsed_ms, 'timings': h.timings} for h in trace.hops],
+            'js_or_meta_followed': trace.js_or_meta_followed, 'content_type': trace.content_type,
+            'has_login_form': trace.has_login_form, 'body_truncated': trace.body_truncated,
+            'errors': trace.errors, 'from_cache': trace.from_cache,
+            'short_circuited': trace.short_circuited, 'page_fingerprint': trace.page_fingerprint,
+            'timings': trace.timings,
+        },
+        'verdict': {'label': verdict.label, 'score': verdict.score, 'reasons': list(verdict.reasons)},
+    }
+
+
+def measure_memory(classes, count: int, hops: int) -> float:
+    tracemalloc.start()
+    results = [make_result(*classes, i, hops) for i in range(count)]
+    used = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del results
+    return used / count
+
+
+def time_per_call(fn, results) -> float:
+    started = time.perf_counter()
+    for trace, verdict in results:
+        fn(trace, verdict)
+    return (time.perf_counter() - started) / len(results) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--results', type=int, default=100000)
+    parser.add_argument('--hops', type=int, default=3)
+    args = parser.parse_args()
+
+    plain_classes = (plain(TraceHop), plain(TraceResult), plain(Verdict))
+    slotted = measure_memory((TraceHop, TraceResult, Verdict), args.results, args.hops)
+    dict_backed = measure_memory(plain_classes, args.results, args.hops)
+    print(f"results:              {args.results} with {args.hops} hops each")
+    print(f"memory per result:    {slotted:.0f} B slotted vs {dict_backed:.0f} B plain "
+          f"({1 - slotted / dict_backed:.0%} less)")
+
+    results = [make_result(TraceHop, TraceResult, Verdict, i, args.hops) for i in range(args.results)]
+    stdlib = time_per_call(lambda t, v: json.dumps(hand_built(t, v)).encode(), results)
+    shared = time_per_call(lambda t, v: serialization.dumps({'trace_result': t, 'verdict': v}), results)
+    print(f"encode, dict + json:  {stdlib:.1f} us per result")
+    print(f"encode, {serialization.BACKEND + ':':<13} {shared:.1f} us per result ({stdlib / shared:.1f}x)")
+    same = json.loads(serialization.dumps({'trace_result': results[0][0], 'verdict': results[0][1]}))
+    print(f"identical output:     {same == hand_built(*results[0])}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+"""
+Local stand-in web server for benchmarks and load tests.
+
+Serves the kinds of pages scans run into, without touching the internet:
+
+    /page                 small HTML page (HTTP/1.1 keep-alive)
+    /login                page with a password form
+    /redirect/<n>         chain of n 302 redirects ending at /page
+    /meta                 meta refresh to /page
+    /js                   JavaScript redirect to /page
+    /slow?ms=<n>          page served after an n ms delay
+    /huge?kb=<n>          HTML page of about n KB, sent in chunks
+    /download?kb=<n>      application/octet-stream attachment
+
+Usage:
+    python benchmarks/fake_server.py [--port 8799]
+
+or from Python: ``server, base_url = start_server()``.
+"""
+import argparse
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+PAGE = b"<html><head><title>Fake page</title></head><body><p>Hello</p></body></html>"
+LOGIN = (b"<html><head><title>Sign in</title></head><body>"
+         b"<form action='/session' method='post'><input name='user'><input type='password' name='pw'></form>"
+         b"</body></html>")
+META = b"<html><head><meta http-equiv='refresh' content='0; url=/page'></head><body></body></html>"
+JS = b"<html><head><script>window.location.href = '/page';</script></head><body></body></html>"
+FILLER = b"<div class='row'><a href='/page'>link</a><span>lorem ipsum dolor sit amet</span></div>\n"
+
+
+class FakeHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "FakeServer/1.0"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _param(self, query: dict, name: str, default: int) -> int:
+        try:
+            return int(query.get(name, [default])[0])
+        except ValueError:
+            return default
+
+    def _send(self, status: int, body: bytes = b"", content_type: str = "text/html; charset=utf-8",
+              headers: dict | None = None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        path, query = parts.path, parse_qs(parts.query)
+
+        if path == "/page":
+            self._send(200, PAGE)
+        elif path == "/login":
+            self._send(200, LOGIN)
+        elif path.startswith("/redirect/"):
+            try:
+                remaining = int(path.rsplit("/", 1)[1])
+            except ValueError:
+                remaining = 0
+            target = f"/redirect/{remaining - 1}" if remaining > 1 else "/page"
+            self._send(302, headers={"Location": target})
+        elif path == "/meta":
+            self._send(200, META)
+        elif path == "/js":
+            self._send(200, JS)
+        elif path == "/slow":
+            time.sleep(self._param(query, "ms", 500) / 1000)
+            self._send(200, PAGE)
+        elif path == "/huge":
+            self._send_huge(self._param(query, "kb", 2048) * 1024)
+        elif path == "/download":
+            self._send(200, b"\0" * (self._param(query, "kb", 64) * 1024), "application/octet-stream",
+                       {"Content-Disposition": "attachment; filename=file.bin"})
+        else:
+            self._send(404, b"not found", "text/plain")
+
+    def _send_huge(self, size: int):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        sent = 0
+        chunk = FILLER * 128
+        try:
+            self._write_chunk(b"<html><head><title>Huge page</title></head><body>")
+            while sent < size:
+                self._write_chunk(chunk)
+                sent += len(chunk)
+            self._write_chunk(b"</body></html>")
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            # Scanners stop reading once they have enough of the page
+            self.close_connection = True
+
+    def _write_chunk(self, data: bytes):
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+
+
+class FakeServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+
+def start_server(host: str = "127.0.0.1", port: int = 0) -> tuple[FakeServer, str]:
+    """Start the server on a background thread; returns it with its base URL."""
+    server = FakeServer((host, port), FakeHandler)
+    threading.Thread(target=server.serve_forever, name="fake-server", daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8799)
+    args = parser.parse_args()
+    server = FakeServer((args.host, args.port), FakeHandler)
+    print(f"Fake server listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,365 @@
+"""
+Load test: scan throughput and latency against a local fake web server.
+
+Starts ``fake_server`` (or uses ``--server-url``) and drives one of three
+entry points at a fixed concurrency:
+
+    scan_url   core.scanner.scan_url, called from worker threads
+    api        POST /api/scan (synchronous JSON API)
+    web        POST /scan, then poll /scan/<id>/status until it finishes
+
+``api`` and ``web`` run against the Flask app in-process through its test
+client, or against a running server with ``--app-url``. Each request picks
+a scenario (redirect chains, meta/JS redirects, slow hosts, huge pages,
+downloads...) round-robin from ``--scenarios``. URLs get a unique query
+string and scans are forced, so every request does a full scan; pass
+``--cache`` to measure the cached path instead.
+
+The report is printed as JSON (throughput, p50/p95/p99 latency, errors,
+verdicts, peak RSS and thread count) so runs can be compared; with
+``--baseline old.json`` the differences are also printed to stderr.
+
+Usage:
+    python benchmarks/load_test.py --target scan_url --concurrency 16 --requests 400
+    python benchmarks/load_test.py --target web --app-url http://127.0.0.1:5000 --pid <server pid>
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# The fake server listens on loopback, which scans refuse by default
+os.environ.setdefault('SCAN_ALLOW_PRIVATE_NETWORKS', '1')
+os.environ.setdefault('SCAN_STORE', 'memory')
+
+from fake_server import start_server  # noqa: E402
+
+SCENARIOS = {
+    'page': '/page',
+    'login': '/login',
+    'redirect': '/redirect/2',
+    'long_redirect': '/redirect/6',
+    'meta': '/meta',
+    'js': '/js',
+    'slow': '/slow?ms=300',
+    'huge': '/huge?kb=4096',
+    'download': '/download?kb=256',
+}
+
+
+def percentile(sorted_values: list[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, round(pct / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def latency_summary(latencies: list[float]) -> dict:
+    values = sorted(latencies)
+    return {
+        'count': len(values),
+        'mean': round(sum(values) / len(values), 2) if values else 0.0,
+        'p50': round(percentile(values, 50), 2),
+        'p95': round(percentile(values, 95), 2),
+        'p99': round(percentile(values, 99), 2),
+        'max': round(values[-1], 2) if values else 0.0,
+    }
+
+
+class ResourceSampler:
+    """Samples RSS and thread count of a process in the background, keeping the peaks."""
+
+    def __init__(self, pid: int | None = None, interval: float = 0.05):
+        self.pid = pid or os.getpid()
+        self.interval = interval
+        self.peak_rss_mb = 0.0
+        self.peak_threads = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='resource-sampler', daemon=True)
+
+    def _read(self) -> tuple[float, int] | None:
+        try:
+            with open(f'/proc/{self.pid}/status') as f:
+                fields = dict(line.split(':', 1) for line in f if ':' in line)
+            return int(fields['VmRSS'].split()[0]) / 1024, int(fields['Threads'])
+        except (OSError, KeyError, ValueError):
+            return None
+
+    def _sample(self):
+        sample = self._read()
+        if sample is None:
+            if self.pid != os.getpid():
+                return
+            # No /proc (e.g. macOS): fall back to what this process can see about itself
+            max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            sample = (max_rss / (1024 * 1024 if sys.platform == 'darwin' else 1024), threading.active_count())
+        self.peak_rss_mb = max(self.peak_rss_mb, sample[0])
+        self.peak_threads = max(self.peak_threads, sample[1])
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def __enter__(self):
+        self._sample()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+
+
+class ScanUrlTarget:
+    """Calls ``scan_url`` directly."""
+
+    def __init__(self, args):
+        from core.scanner import scan_url
+        self.scan_url = scan_url
+        self.args = args
+
+    def run(self, url: str) -> str:
+        _, verdict = self.scan_url(url, lambda progress, message: None, timeout_s=self.args.timeout,
+                                   force_rescan=not self.args.cache)
+        return str(verdict.label)
+
+
+class AppClient:
+    """Flask test client per thread, or plain HTTP to a running server."""
+
+    def __init__(self, app_url: str | None):
+        self.app_url = app_url.rstrip('/') if app_url else None
+        self._local = threading.local()
+        if self.app_url is None:
+            from web_app import app
+            self.app = app
+
+    def _client(self):
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            if self.app_url is None:
+                client = self.app.test_client()
+            else:
+                import httpx
+                client = httpx.Client(base_url=self.app_url, timeout=120)
+            self._local.client = client
+        return client
+
+    def request(self, method: str, path: str, **kwargs) -> tuple[int, dict]:
+        client = self._client()
+        if self.app_url is None:
+            response = client.open(path, method=method, **kwargs)
+            return response.status_code, response.get_json(silent=True) or {}
+        response = client.request(method, path, **kwargs)
+        try:
+            return response.status_code, response.json()
+        except ValueError:
+            return response.status_code, {}
+
+
+class ApiTarget:
+    """POST /api/scan and wait for the JSON verdict."""
+
+    def __init__(self, args):
+        self.client = AppClient(args.app_url)
+        self.args = args
+
+    def run(self, url: str) -> str:
+        status, body = self.client.request('POST', '/api/scan', json={'url': url, 'force': not self.args.cache})
+        if status != 200:
+            raise RuntimeError(f"HTTP {status}: {body.get('error', '')}")
+        return body['verdict']['label']
+
+
+class Rejected(Exception):
+    """The web queue pushed back (HTTP 429)."""
+
+
+class WebTarget:
+    """POST /scan and poll its status until the background job finishes."""
+
+    def __init__(self, args):
+        self.client = AppClient(args.app_url)
+        self.args = args
+
+    def run(self, url: str) -> str:
+        form = {'url': url}
+        if not self.args.cache:
+            form['force'] = '1'
+        status, body = self.client.request('POST', '/scan', data=form)
+        if status == 429:
+            raise Rejected(body.get('error', 'busy'))
+        if status != 200:
+            raise RuntimeError(f"HTTP {status}: {body.get('error', '')}")
+        scan_id = body['scan_id']
+        deadline = time.monotonic() + self.args.timeout * 10 + 60
+        while time.monotonic() < deadline:
+            status, body = self.client.request('GET', f'/scan/{scan_id}/status')
+            if status != 200:
+                raise RuntimeError(f"HTTP {status} polling {scan_id}")
+            if body['status'] == 'completed':
+                return body['verdict']['label']
+            if body['status'] == 'failed':
+                raise RuntimeError(body.get('message', 'scan failed'))
+            time.sleep(self.args.poll_interval)
+        raise TimeoutError(f"scan {scan_id} did not finish")
+
+
+TARGETS = {'scan_url': ScanUrlTarget, 'api': ApiTarget, 'web': WebTarget}
+
+
+def git_revision() -> str | None:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def run_load(args, base_url: str) -> dict:
+    target = TARGETS[args.target](args)
+    scenarios = args.scenarios.split(',')
+    unknown = [name for name in scenarios if name not in SCENARIOS]
+    if unknown:
+        raise SystemExit(f"Unknown scenarios: {', '.join(unknown)} (choose from {', '.join(SCENARIOS)})")
+
+    def url_for(i: int, name: str) -> str:
+        path = SCENARIOS[name]
+        if args.cache:
+            return base_url + path
+        return f"{base_url}{path}{'&' if '?' in path else '?'}run={i}"
+
+    # Warm-up outside the measurement: imports, first client, lazy resources
+    for i in range(args.warmup):
+        target.run(url_for(-1 - i, 'page'))
+
+    lock = threading.Lock()
+    latencies: dict[str, list[float]] = {name: [] for name in scenarios}
+    verdicts: dict[str, int] = {}
+    errors: dict[str, int] = {}
+    rejected = 0
+
+    def one(i: int, name: str):
+        nonlocal rejected
+        started = time.perf_counter()
+        try:
+            label = target.run(url_for(i, name))
+        except Rejected:
+            with lock:
+                rejected += 1
+            return
+        except Exception as e:
+            with lock:
+                key = type(e).__name__
+                errors[key] = errors.get(key, 0) + 1
+            return
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with lock:
+            latencies[name].append(elapsed_ms)
+            verdicts[label] = verdicts.get(label, 0) + 1
+
+    plan = list(zip(range(args.requests), itertools.cycle(scenarios)))
+    with ResourceSampler(args.pid) as sampler:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency, thread_name_prefix='load') as pool:
+            for _ in pool.map(lambda item: one(*item), plan):
+                pass
+        elapsed = time.perf_counter() - started
+
+    all_latencies = [value for values in latencies.values() for value in values]
+    return {
+        'target': args.target,
+        'app': args.app_url or 'in-process',
+        'concurrency': args.concurrency,
+        'requests': args.requests,
+        'scenarios': scenarios,
+        'cache': args.cache,
+        'completed': len(all_latencies),
+        'errors': errors,
+        'rejected': rejected,
+        'elapsed_s': round(elapsed, 3),
+        'throughput_rps': round(len(all_latencies) / elapsed, 2) if elapsed else 0.0,
+        'latency_ms': latency_summary(all_latencies),
+        'by_scenario': {name: latency_summary(values) for name, values in latencies.items()},
+        'verdicts': verdicts,
+        'peak_rss_mb': round(sampler.peak_rss_mb, 1),
+        'peak_threads': sampler.peak_threads,
+        'sampled_pid': sampler.pid,
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'git_revision': git_revision(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        },
+    }
+
+
+def compare(report: dict, baseline: dict):
+    """Print the change of the headline numbers against an earlier report."""
+    rows = [('throughput_rps', report['throughput_rps'], baseline.get('throughput_rps'))]
+    for key in ('p50', 'p95', 'p99'):
+        rows.append((f'latency {key} ms', report['latency_ms'][key], baseline.get('latency_ms', {}).get(key)))
+    rows.append(('peak_rss_mb', report['peak_rss_mb'], baseline.get('peak_rss_mb')))
+    rows.append(('peak_threads', report['peak_threads'], baseline.get('peak_threads')))
+    print(f"{'metric':<18} {'baseline':>10} {'current':>10} {'change':>9}", file=sys.stderr)
+    for name, current, previous in rows:
+        if not previous:
+            print(f"{name:<18} {'-':>10} {current:>10}", file=sys.stderr)
+            continue
+        print(f"{name:<18} {previous:>10} {current:>10} {(current - previous) / previous:>+9.1%}", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--target', choices=sorted(TARGETS), default='scan_url')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--scenarios', default='page,login,redirect,long_redirect,meta,js,slow,huge,download',
+                        help=f"comma-separated mix, from: {', '.join(SCENARIOS)}")
+    parser.add_argument('--timeout', type=float, default=8.0, help='per-scan timeout (scan_url target)')
+    parser.add_argument('--warmup', type=int, default=2, help='unmeasured scans run first')
+    parser.add_argument('--cache', action='store_true', help='repeat URLs and allow verdict cache hits')
+    parser.add_argument('--app-url', help='drive a running server instead of the in-process app')
+    parser.add_argument('--server-url', help='use an already running fake server')
+    parser.add_argument('--pid', type=int, help='process to sample for RSS/threads (default: this one)')
+    parser.add_argument('--poll-interval', type=float, default=0.05, help='status poll interval (web target)')
+    parser.add_argument('--output', help='also write the JSON report to this file')
+    parser.add_argument('--baseline', help='earlier JSON report to compare against')
+    args = parser.parse_args()
+
+    server = None
+    base_url = args.server_url
+    if base_url is None:
+        server, base_url = start_server()
+    try:
+        report = run_load(args, base_url.rstrip('/'))
+    finally:
+        if server is not None:
+            server.shutdown()
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    if args.baseline:
+        with open(args.baseline) as f:
+            compare(report, json.load(f))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""
+Scanner start-up.
+
+``warm_up()`` builds everything a first scan would otherwise build lazily:
+the public suffix list, the compiled rules (with the brand matcher), the
+denylist index and the TLS context. Run it in a pre-forking server's master
+(gunicorn ``preload_app``, see ``gunicorn.conf.py``) and the workers share
+those structures copy-on-write instead of each building its own.
+
+Nothing here starts a thread or opens a socket, so the master stays safe to
+fork: event loop, HTTP client and reload watchers are created per process on
+first use. ``prepare_fork()`` closes the database connections the master
+opened and freezes the heap so reference counting in the workers does not
+copy the shared pages.
+
+    python -m core.bootstrap    # print cold-start timings as JSON
+"""
+import gc
+import json
+import time
+
+from core import psl
+from core.http_client import client_manager
+from core.rule_engine import rule_engine
+from core.rules import DENYLIST
+
+# Seconds spent in each start-up phase of this process, filled by warm_up()
+startup_timings: dict[str, float] = {}
+
+
+def warm_up(started_at: float | None = None) -> dict[str, float]:
+    """
+    Build the shared lookup structures now and return the phase timings.
+
+    ``started_at`` is a ``time.perf_counter()`` reading taken before the
+    application's imports; it adds ``import`` and ``ready`` (import to
+    ready) to the timings.
+    """
+    began = time.perf_counter()
+    phases = (
+        ('psl', psl.load),
+        ('rules', rule_engine.load),
+        ('denylist', DENYLIST.load),
+        ('tls', lambda: client_manager.ssl_context),
+    )
+    timings = {}
+    for name, step in phases:
+        phase_started = time.perf_counter()
+        step()
+        timings[name] = time.perf_counter() - phase_started
+    finished = time.perf_counter()
+    timings['warm_up'] = finished - began
+    if started_at is not None:
+        timings['import'] = began - started_at
+        timings['ready'] = finished - started_at
+    startup_timings.update({name: round(value, 4) for name, value in timings.items()})
+    return dict(startup_timings)
+
+
+def prepare_fork():
+    """Call in the master right before workers are forked."""
+    # The store opens the database at import; workers must not share those connections
+    from core import db
+    db.engine.dispose()
+    gc.collect()
+    gc.freeze()
+
+
+if __name__ == '__main__':
+    import web_app  # warms up on import
+    print(json.dumps(web_app.bootstrap.startup_timings, indent=2))
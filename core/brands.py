@@ -0,0 +1,126 @@
+"""
+Brand lookalike matching against a large protected-brand corpus.
+
+Domain labels are normalized (punycode decoded, homoglyphs and common
+character substitutions folded) before matching. To keep per-URL latency low
+with tens of thousands of brands, a vectorized prefilter discards brands that
+cannot reach the similarity threshold and only the survivors are scored with
+``rapidfuzz.process.extractOne``.
+
+The prefilter relies on two lower bounds of the Indel distance that
+``fuzz.ratio`` is built on: the length difference, and the number of bits
+that differ between two character-occurrence signatures (each insertion or
+deletion can flip at most one bit).
+"""
+import unicodedata
+
+import numpy as np
+from rapidfuzz import fuzz, process
+
+from core import rules
+
+# Look-alike characters folded onto their Latin counterparts
+_CONFUSABLES = str.maketrans({
+    # Cyrillic
+    'а': 'a', 'в': 'b', 'е': 'e', 'ё': 'e', 'к': 'k', 'м': 'm', 'н': 'h', 'о': 'o',
+    'р': 'p', 'с': 'c', 'т': 't', 'у': 'y', 'х': 'x', 'і': 'i', 'ї': 'i', 'ј': 'j',
+    'ѕ': 's', 'ԁ': 'd', 'ԛ': 'q', 'ԝ': 'w', 'һ': 'h', 'ɡ': 'g',
+    # Greek
+    'α': 'a', 'β': 'b', 'ε': 'e', 'η': 'n', 'ι': 'i', 'κ': 'k', 'ν': 'v', 'ο': 'o',
+    'ρ': 'p', 'τ': 't', 'υ': 'u', 'χ': 'x', 'ω': 'w',
+    # Digit substitutions
+    '0': 'o', '1': 'l', '3': 'e', '4': 'a', '5': 's', '7': 't',
+    # Separators carry no brand signal
+    '-': None, '_': None,
+})
+_MULTI_CHAR_CONFUSABLES = (('rn', 'm'), ('vv', 'w'))
+
+# Bit layout of a signature: one "present" bit per symbol and a
+# "present at least twice" bit for each letter
+_SYMBOLS = 'abcdefghijklmnopqrstuvwxyz0123456789'
+_SYMBOL_INDEX = {symbol: i for i, symbol in enumerate(_SYMBOLS)}
+
+_POPCOUNT16 = np.array([bin(i).count('1') for i in range(1 << 16)], dtype=np.uint8)
+
+
+def normalize_label(label: str) -> str:
+    """Fold a domain label into the canonical form used for brand matching."""
+    label = label.lower()
+    if label.startswith('xn--'):
+        try:
+            label = label[4:].encode('ascii').decode('punycode')
+        except (UnicodeError, ValueError):
+            pass
+    label = unicodedata.normalize('NFKD', label)
+    label = ''.join(ch for ch in label if not unicodedata.combining(ch))
+    label = label.translate(_CONFUSABLES)
+    for sequence, replacement in _MULTI_CHAR_CONFUSABLES:
+        label = label.replace(sequence, replacement)
+    return label
+
+
+def _signature(text: str) -> int:
+    value = 0
+    for ch in text:
+        index = _SYMBOL_INDEX.get(ch)
+        if index is None:
+            continue
+        if value >> index & 1 and index < 26:
+            value |= 1 << (len(_SYMBOLS) + index)
+        value |= 1 << index
+    return value
+
+
+def _popcount(values: np.ndarray) -> np.ndarray:
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(values)
+    counts = np.zeros(values.shape, dtype=np.uint8)
+    for shift in (0, 16, 32, 48):
+        counts += _POPCOUNT16[(values >> np.uint64(shift)) & np.uint64(0xFFFF)]
+    return counts
+
+
+class BrandMatcher:
+    """Preprocessed brand corpus supporting fast lookalike queries."""
+
+    def __init__(self, brands, threshold: float = rules.BRAND_SIMILARITY_THRESHOLD):
+        self.threshold = threshold
+        names: dict[str, str] = {}
+        for brand in brands:
+            normalized = normalize_label(brand)
+            if normalized:
+                names.setdefault(normalized, brand)
+        self._normalized = list(names)
+        self._display = list(names.values())
+        self._lengths = np.array([len(n) for n in self._normalized], dtype=np.int32)
+        self._signatures = np.array([_signature(n) for n in self._normalized], dtype=np.uint64)
+
+    def __len__(self) -> int:
+        return len(self._normalized)
+
+    def _candidates(self, normalized: str) -> np.ndarray:
+        """Indices of brands that could score above the threshold."""
+        length = len(normalized)
+        differing = _popcount(self._signatures ^ np.uint64(_signature(normalized))).astype(np.int32)
+        lower_bound = np.maximum(differing, np.abs(self._lengths - length))
+        # ratio = 100 * (1 - d / (len_a + len_b)) > threshold  =>  d < (100 - t) / 100 * (len_a + len_b)
+        return np.flatnonzero(lower_bound * 100 < (100 - self.threshold) * (self._lengths + length))
+
+    def match(self, label: str) -> tuple[str, float] | None:
+        """Return ``(brand, ratio)`` for the closest brand above the threshold."""
+        normalized = normalize_label(label)
+        if not normalized or not self._normalized:
+            return None
+        candidates = self._candidates(normalized)
+        if not len(candidates):
+            return None
+        best = process.extractOne(normalized, [self._normalized[i] for i in candidates],
+                                  scorer=fuzz.ratio, score_cutoff=self.threshold)
+        if best is None or best[1] <= self.threshold:
+            return None
+        return self._display[candidates[best[2]]], best[1]
+
+    def match_many(self, labels) -> list[tuple[str, float] | None]:
+        """Match a batch of labels."""
+        return [self.match(label) for label in labels]
+
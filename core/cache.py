@@ -0,0 +1,111 @@
+"""
+In-memory TTL cache for scan verdicts with LRU eviction.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Hashable
+
+from core.models import TraceResult, Verdict
+
+
+class VerdictCache:
+    """
+    Maps a scan key to its ``(TraceResult, Verdict)``.
+
+    Entries expire after a TTL chosen by the verdict: SAFE and UNSAFE results
+    have their own TTLs, results with scan errors use ``error_ttl`` and every
+    other label uses ``default_ttl``. A TTL of 0 disables caching for that
+    kind of result. Once ``max_size`` entries are stored the least recently
+    used entry is evicted.
+    """
+
+    def __init__(self, max_size: int = 10000, default_ttl: float = 600.0, safe_ttl: float = 3600.0,
+                 unsafe_ttl: float = 3600.0, error_ttl: float = 60.0):
+        self.max_size = max_size
+        self.default_ttl = default_ttl
+        self.safe_ttl = safe_ttl
+        self.unsafe_ttl = unsafe_ttl
+        self.error_ttl = error_ttl
+        self._entries: OrderedDict[Hashable, tuple[float, TraceResult, Verdict]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @classmethod
+    def from_env(cls) -> "VerdictCache":
+        """Build a cache from the CACHE_* environment variables."""
+        default_ttl = float(os.getenv('CACHE_TTL', '600'))
+        return cls(
+            max_size=int(os.getenv('CACHE_MAX_SIZE', '10000')),
+            default_ttl=default_ttl,
+            safe_ttl=float(os.getenv('CACHE_TTL_SAFE', str(default_ttl * 6))),
+            unsafe_ttl=float(os.getenv('CACHE_TTL_UNSAFE', str(default_ttl * 6))),
+            error_ttl=float(os.getenv('CACHE_TTL_ERROR', '60')),
+        )
+
+    def ttl_for(self, trace_result: TraceResult, verdict: Verdict) -> float:
+        """How long a result may be served from the cache."""
+        if trace_result.errors:
+            return self.error_ttl
+        if verdict.label == "SAFE":
+            return self.safe_ttl
+        if verdict.label == "UNSAFE":
+            return self.unsafe_ttl
+        return self.default_ttl
+
+    def get(self, key: Hashable) -> tuple[TraceResult, Verdict] | None:
+        """Return a fresh cached result, or None on a miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1], entry[2]
+
+    def put(self, key: Hashable, trace_result: TraceResult, verdict: Verdict, max_ttl: float | None = None):
+        """Store a result (for at most ``max_ttl`` seconds), evicting the least recently used entries if full."""
+        ttl = self.ttl_for(trace_result, verdict)
+        if max_ttl is not None:
+            ttl = min(ttl, max_ttl)
+        if ttl <= 0 or self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, trace_result, verdict)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key: Hashable):
+        """Drop a single entry."""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        """Drop every entry."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """Hit/miss counters for monitoring."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+# Shared by every scan in this process
+verdict_cache = VerdictCache.from_env()
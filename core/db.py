@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine, Column, String, Integer, Float, Text, JSON, DateTime
+from sqlalchemy import create_engine, event, Column, String, Integer, Float, Text, JSON, DateTime
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import datetime
@@ -9,13 +9,22 @@ DATABASE_URL = os.getenv('DATABASE_URL', 'sqlite:///scan_results.db')
 engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {})
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+if DATABASE_URL.startswith("sqlite"):
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        # WAL lets status reads proceed while a worker is writing
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.close()
+
 Base = declarative_base()
 
 class ScanResult(Base):
     __tablename__ = "scan_results"
 
     scan_id = Column(String, primary_key=True, index=True)
-    url = Column(String, nullable=False)
+    url = Column(String, nullable=False, index=True)
     status = Column(String, default="processing")
     progress = Column(Float, default=0.0)
     message = Column(String, default="Starting scan...")
@@ -24,7 +33,7 @@ class ScanResult(Base):
     error = Column(Text, nullable=True)
     started_at = Column(DateTime, default=datetime.datetime.utcnow)
     last_update = Column(DateTime, default=datetime.datetime.utcnow)
-    completed_at = Column(DateTime, nullable=True)
+    completed_at = Column(DateTime, nullable=True, index=True)
 
 def init_db():
     Base.metadata.create_all(bind=engine)
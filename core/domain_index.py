@@ -0,0 +1,346 @@
+"""
+Compact domain index for large denylists.
+
+Each domain is stored as a 64-bit blake2b hash in a sorted NumPy array, so a
+multi-million-entry feed costs 8 bytes per domain and a lookup is one
+``searchsorted`` over the host's suffixes (O(labels · log n)). An entry
+``example.com`` matches the domain and every subdomain of it; an entry
+``*.example.com`` matches subdomains only.
+
+The arrays can be written to a binary snapshot that is memory-mapped at
+startup instead of re-parsing the text feeds:
+
+    python -m core.domain_index build resources/denylist.idx resources/denylist.txt
+
+The snapshot header records the path, mtime and size of every feed it was
+built from; ``ReloadingDomainIndex`` only reuses a snapshot built from
+exactly its current feeds.
+"""
+import hashlib
+import json
+import os
+import struct
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+import numpy as np
+
+_SNAPSHOT_MAGIC = b"NETRADX2"
+# magic, domain count, wildcard count, length of the JSON source list that follows
+_SNAPSHOT_HEADER = struct.Struct("<8sQQQ")
+_HASH_DTYPE = np.dtype("<u8")
+
+
+def _hash(domain: str) -> int:
+    return int.from_bytes(hashlib.blake2b(domain.encode("ascii"), digest_size=8).digest(), "little")
+
+
+def normalize_host(host: str) -> str | None:
+    """Lower-case, strip the trailing dot and IDNA-encode a host name."""
+    host = host.strip().lower().rstrip(".")
+    if not host:
+        return None
+    if not host.isascii():
+        try:
+            host = ".".join(label.encode("idna").decode("ascii") if not label.isascii() else label
+                            for label in host.split("."))
+        except UnicodeError:
+            return None
+    return host
+
+
+def host_from_url(url: str) -> str | None:
+    """Extract the normalized host of a URL (or bare domain), without userinfo or port."""
+    url = url.strip()
+    if "://" not in url:
+        url = "//" + url
+    try:
+        host = urlsplit(url).hostname
+    except ValueError:
+        return None
+    return normalize_host(host) if host else None
+
+
+def source_signature(path: str) -> tuple[str, int, int]:
+    """``(absolute path, mtime in ns, size)`` of a feed, as recorded in snapshots."""
+    st = os.stat(path)
+    return os.path.abspath(path), st.st_mtime_ns, st.st_size
+
+
+def _read_snapshot_header(path: str) -> tuple[int, int, list[tuple[str, int, int]], int]:
+    """Domain and wildcard counts, recorded sources and array offset of a snapshot."""
+    with open(path, "rb") as f:
+        header = f.read(_SNAPSHOT_HEADER.size)
+        if len(header) < _SNAPSHOT_HEADER.size or header[:8] != _SNAPSHOT_MAGIC:
+            raise ValueError(f"Not a domain index snapshot (or an older format): {path}")
+        _, n_domains, n_wildcards, sources_len = _SNAPSHOT_HEADER.unpack(header)
+        sources = [tuple(source) for source in json.loads(f.read(sources_len) or b"[]")]
+    return n_domains, n_wildcards, sources, _SNAPSHOT_HEADER.size + sources_len
+
+
+def snapshot_sources(path: str) -> list[tuple[str, int, int]]:
+    """The feed signatures (see ``source_signature``) a snapshot was built from."""
+    return _read_snapshot_header(path)[2]
+
+
+def parse_entry(line: str) -> tuple[str, bool] | None:
+    """
+    Parse one feed line into ``(domain, is_wildcard)``.
+
+    Accepts bare domains, ``*.domain`` wildcards, URLs and hosts-file lines
+    (``0.0.0.0 domain``); blank lines and ``#`` comments are skipped.
+    """
+    line = line.split("#", 1)[0].strip()
+    if not line:
+        return None
+    entry = line.split()[-1]
+    wildcard = entry.startswith("*.")
+    if wildcard:
+        entry = entry[2:]
+    domain = host_from_url(entry) if "/" in entry or "@" in entry else normalize_host(entry)
+    if not domain:
+        return None
+    return domain, wildcard
+
+
+class DomainIndex:
+    """Immutable set of domain hashes supporting parent-domain and wildcard lookups."""
+
+    def __init__(self, domains: np.ndarray | None = None, wildcards: np.ndarray | None = None):
+        # Both arrays must be sorted and de-duplicated
+        self._domains = domains if domains is not None else np.empty(0, dtype=_HASH_DTYPE)
+        self._wildcards = wildcards if wildcards is not None else np.empty(0, dtype=_HASH_DTYPE)
+
+    @classmethod
+    def from_entries(cls, entries) -> "DomainIndex":
+        """Build an index from ``(domain, is_wildcard)`` pairs."""
+        domains, wildcards = [], []
+        for domain, wildcard in entries:
+            (wildcards if wildcard else domains).append(_hash(domain))
+        return cls(np.unique(np.array(domains, dtype=_HASH_DTYPE)),
+                   np.unique(np.array(wildcards, dtype=_HASH_DTYPE)))
+
+    @classmethod
+    def from_text_files(cls, paths) -> "DomainIndex":
+        """Build an index from one or more text feeds."""
+        def entries():
+            for path in paths:
+                with open(path, "r", encoding="utf-8", errors="replace") as f:
+                    for line in f:
+                        entry = parse_entry(line)
+                        if entry is not None:
+                            yield entry
+        return cls.from_entries(entries())
+
+    @classmethod
+    def load(cls, path: str) -> "DomainIndex":
+        """Memory-map a snapshot written by ``save()``."""
+        n_domains, n_wildcards, _, offset = _read_snapshot_header(path)
+        if not n_domains + n_wildcards:
+            return cls()
+        data = np.memmap(path, dtype=_HASH_DTYPE, mode="r", offset=offset,
+                         shape=(n_domains + n_wildcards,))
+        return cls(data[:n_domains], data[n_domains:])
+
+    def save(self, path: str, sources=()):
+        """Write a binary snapshot atomically, recording the ``source_signature`` of each feed."""
+        sources = json.dumps([list(source) for source in sources]).encode()
+        sources += b" " * (-(_SNAPSHOT_HEADER.size + len(sources)) % _HASH_DTYPE.itemsize)
+        tmp_path = f"{path}.tmp{os.getpid()}"
+        with open(tmp_path, "wb") as f:
+            f.write(_SNAPSHOT_HEADER.pack(_SNAPSHOT_MAGIC, len(self._domains), len(self._wildcards), len(sources)))
+            f.write(sources)
+            f.write(np.ascontiguousarray(self._domains, dtype=_HASH_DTYPE).tobytes())
+            f.write(np.ascontiguousarray(self._wildcards, dtype=_HASH_DTYPE).tobytes())
+        os.replace(tmp_path, path)
+
+    def __len__(self) -> int:
+        return len(self._domains) + len(self._wildcards)
+
+    def __contains__(self, host: str) -> bool:
+        return self.match(host) is not None
+
+    def match(self, host: str) -> str | None:
+        """Return the listed domain ``host`` falls under, or None."""
+        host = normalize_host(host) if host else None
+        if not host:
+            return None
+        labels = host.split(".")
+        suffixes = [".".join(labels[i:]) for i in range(len(labels))]
+        hashes = np.array([_hash(s) for s in suffixes], dtype=_HASH_DTYPE)
+        # Plain entries cover the host itself and all of its parents
+        hit = _first_member(self._domains, hashes)
+        if hit is not None:
+            return suffixes[hit]
+        # Wildcards only cover strict subdomains
+        hit = _first_member(self._wildcards, hashes[1:])
+        if hit is not None:
+            return "*." + suffixes[hit + 1]
+        return None
+
+
+def _first_member(sorted_hashes: np.ndarray, hashes: np.ndarray) -> int | None:
+    if not len(sorted_hashes) or not len(hashes):
+        return None
+    positions = np.searchsorted(sorted_hashes, hashes)
+    np.minimum(positions, len(sorted_hashes) - 1, out=positions)
+    found = np.flatnonzero(sorted_hashes[positions] == hashes)
+    return int(found[0]) if len(found) else None
+
+
+class ReloadingDomainIndex:
+    """
+    A ``DomainIndex`` over a set of text feeds that is rebuilt in the
+    background when they change.
+
+    The index is built on the first lookup or ``load()`` call. When
+    ``snapshot_path`` is set, that memory-maps the snapshot if it was built
+    from exactly the current feeds (same paths, mtimes and sizes) and
+    otherwise rebuilds it. Lookups always read the
+    current index, which the watcher thread replaces in a single assignment,
+    so a reload never blocks a scan. ``generation`` goes up with every
+    reload, so results that depend on the listed domains can be keyed on it.
+    """
+
+    def __init__(self, sources=(), snapshot_path: str | None = None, reload_interval: float = 30.0):
+        self.sources = list(sources)
+        self._own_sources = list(self.sources)
+        self._ruleset_sources: list[str] = []
+        self.snapshot_path = snapshot_path
+        self.reload_interval = reload_interval
+        self._index = DomainIndex()
+        self._stats: dict[str, tuple[str, int, int]] = {}
+        self._lock = threading.Lock()
+        self._watch_pid: int | None = None
+        self.loaded_at: float | None = None
+        self.generation = 0
+
+    @classmethod
+    def from_env(cls) -> "ReloadingDomainIndex":
+        """Build from DENYLIST_PATHS, DENYLIST_SNAPSHOT and DENYLIST_RELOAD_INTERVAL."""
+        sources = [p.strip() for p in os.getenv("DENYLIST_PATHS", "").split(",") if p.strip()]
+        return cls(sources=sources,
+                   snapshot_path=os.getenv("DENYLIST_SNAPSHOT") or None,
+                   reload_interval=float(os.getenv("DENYLIST_RELOAD_INTERVAL", "30")))
+
+    def add_source(self, path: str):
+        """Add a text feed; the index is rebuilt now if it was already loaded."""
+        if path not in self._own_sources:
+            self._own_sources.append(path)
+            self._apply_sources()
+
+    def set_ruleset_sources(self, paths):
+        """
+        Replace the feeds listed by the current rules file. Feeds it no longer
+        lists are dropped; the index is rebuilt only if the sources changed.
+        """
+        self._ruleset_sources = list(paths)
+        self._apply_sources()
+
+    def _apply_sources(self):
+        sources = list(dict.fromkeys(self._own_sources + self._ruleset_sources))
+        if sources == self.sources:
+            return
+        self.sources = sources
+        if self.loaded_at is not None:
+            self.reload()
+
+    def load(self):
+        """Build the index if it has not been loaded yet, without starting the watcher."""
+        if self.loaded_at is None:
+            self.reload()
+
+    def _current_stats(self) -> dict[str, tuple[str, int, int]]:
+        stats = {}
+        for path in self.sources + ([self.snapshot_path] if self.snapshot_path else []):
+            try:
+                stats[path] = source_signature(path)
+            except OSError:
+                pass
+        return stats
+
+    def reload(self):
+        """Rebuild (or map) the index from the current sources and swap it in."""
+        with self._lock:
+            stats = self._current_stats()
+            feeds = [p for p in self.sources if p in stats]
+            for path in self.sources:
+                if path not in stats:
+                    print(f"Warning: Denylist file not found at '{path}'")
+            signatures = sorted(stats[p] for p in feeds)
+            index = None
+            if self.snapshot_path in stats:
+                try:
+                    # A snapshot built from other feeds (or other versions of them) is stale
+                    if sorted(snapshot_sources(self.snapshot_path)) == signatures:
+                        index = DomainIndex.load(self.snapshot_path)
+                except (OSError, ValueError) as e:
+                    print(f"Warning: Could not load denylist snapshot '{self.snapshot_path}': {e}")
+            if index is None:
+                index = DomainIndex.from_text_files(feeds)
+                if self.snapshot_path and feeds:
+                    try:
+                        index.save(self.snapshot_path, signatures)
+                        stats[self.snapshot_path] = source_signature(self.snapshot_path)
+                    except OSError as e:
+                        print(f"Warning: Could not write denylist snapshot '{self.snapshot_path}': {e}")
+            self._index = index
+            self._stats = stats
+            self.loaded_at = time.time()
+            self.generation += 1
+
+    def _ensure_watcher(self):
+        if self.reload_interval <= 0 or self._watch_pid == os.getpid():
+            return
+        with self._lock:
+            if self._watch_pid == os.getpid():
+                return
+            self._watch_pid = os.getpid()
+        threading.Thread(target=self._watch_loop, name="denylist-reload", daemon=True).start()
+
+    def _watch_loop(self):
+        while True:
+            time.sleep(self.reload_interval)
+            try:
+                if self._current_stats() != self._stats:
+                    self.reload()
+            except Exception as e:
+                print(f"Warning: reloading the denylist failed: {e}")
+
+    def match(self, host: str) -> str | None:
+        self.load()
+        self._ensure_watcher()
+        return self._index.match(host)
+
+    def __contains__(self, host: str) -> bool:
+        return self.match(host) is not None
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def stats(self) -> dict:
+        return {
+            'loaded': self.loaded_at is not None,
+            'entries': len(self._index),
+            'sources': len(self.sources),
+            'snapshot': self.snapshot_path,
+            'loaded_at': self.loaded_at,
+            'generation': self.generation,
+        }
+
+
+def main(argv: list[str]) -> int:
+    if len(argv) < 3 or argv[0] != "build":
+        print("usage: python -m core.domain_index build SNAPSHOT FEED [FEED ...]")
+        return 2
+    started = time.perf_counter()
+    index = DomainIndex.from_text_files(argv[2:])
+    index.save(argv[1], sorted(source_signature(path) for path in argv[2:]))
+    print(f"Wrote {len(index)} entries to {argv[1]} in {time.perf_counter() - started:.2f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
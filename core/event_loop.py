@@ -0,0 +1,129 @@
+"""
+Process-wide asyncio event loop running on a background thread.
+
+Async scans are scheduled onto this loop so that a single loop can keep many
+scans in flight while synchronous callers (Flask views, worker threads) block
+only on their own result.
+"""
+import asyncio
+import concurrent.futures
+import os
+import queue
+import threading
+from typing import Any, AsyncIterator, Coroutine, Iterable, Iterator
+
+_loop: asyncio.AbstractEventLoop | None = None
+_loop_thread: threading.Thread | None = None
+_loop_pid: int | None = None
+_lock = threading.Lock()
+
+
+def get_loop() -> asyncio.AbstractEventLoop:
+    """Return the shared background loop, starting it on first use."""
+    global _loop, _loop_thread, _loop_pid
+    with _lock:
+        # Threads do not survive fork(), so a forked worker gets its own loop
+        if _loop is None or _loop_pid != os.getpid():
+            _loop = asyncio.new_event_loop()
+            _loop_thread = threading.Thread(target=_loop.run_forever, name="scan-event-loop", daemon=True)
+            _loop_thread.start()
+            _loop_pid = os.getpid()
+        return _loop
+
+
+def in_loop_thread() -> bool:
+    """True when called from the shared loop's own thread."""
+    return _loop_thread is not None and threading.current_thread() is _loop_thread
+
+
+def run(coro: Coroutine[Any, Any, Any], timeout: float | None = None) -> Any:
+    """Run a coroutine on the shared loop and block until it finishes."""
+    if in_loop_thread():
+        coro.close()
+        raise RuntimeError("event_loop.run() cannot be called from the event loop thread")
+    future = asyncio.run_coroutine_threadsafe(coro, get_loop())
+    return future.result(timeout)
+
+
+def iterate(agen: AsyncIterator[Any]) -> Iterator[Any]:
+    """
+    Consume an async iterator on the shared loop from synchronous code.
+
+    Items are handed over as soon as they are produced. Closing the returned
+    generator early cancels the producer.
+    """
+    if in_loop_thread():
+        raise RuntimeError("event_loop.iterate() cannot be called from the event loop thread")
+    items: queue.Queue = queue.Queue()
+    done = object()
+
+    async def _pump():
+        try:
+            async for item in agen:
+                items.put((item, None))
+        except Exception as e:
+            items.put((done, e))
+        finally:
+            aclose = getattr(agen, 'aclose', None)
+            if aclose is not None:
+                await aclose()
+            items.put((done, None))
+
+    future = asyncio.run_coroutine_threadsafe(_pump(), get_loop())
+    try:
+        while True:
+            item, error = items.get()
+            if error is not None:
+                raise error
+            if item is done:
+                break
+            yield item
+    finally:
+        future.cancel()
+
+
+async def from_thread(iterable: Iterable[Any], maxsize: int = 1024) -> AsyncIterator[Any]:
+    """
+    Consume a blocking iterable on its own thread and yield its items on the loop.
+
+    Slow reads (stdin, network files) and CPU-heavy producers then never
+    stall other coroutines; at most ``maxsize`` items are buffered. The
+    producer's exceptions are re-raised here. The thread stops at its next
+    item once this generator is closed.
+    """
+    loop = asyncio.get_running_loop()
+    items: asyncio.Queue = asyncio.Queue(maxsize)
+    done = object()
+    closed = threading.Event()
+
+    def _produce():
+        def put(entry):
+            future = asyncio.run_coroutine_threadsafe(items.put(entry), loop)
+            while not closed.is_set():
+                try:
+                    return future.result(timeout=0.5)
+                except concurrent.futures.TimeoutError:
+                    continue
+            future.cancel()
+
+        try:
+            for item in iterable:
+                if closed.is_set():
+                    return
+                put((item, None))
+        except Exception as e:
+            put((done, e))
+        else:
+            put((done, None))
+
+    threading.Thread(target=_produce, name="iterable-reader", daemon=True).start()
+    try:
+        while True:
+            item, error = await items.get()
+            if error is not None:
+                raise error
+            if item is done:
+                return
+            yield item
+    finally:
+        closed.set()
@@ -0,0 +1,53 @@
+"""
+In-process publish/subscribe broker for pushing scan progress to clients.
+"""
+import queue
+import threading
+
+
+class EventBroker:
+    """Fans events published on a channel out to every subscriber queue."""
+
+    def __init__(self, max_queued: int = 100):
+        self.max_queued = max_queued
+        self._subscribers: dict[str, list[queue.Queue]] = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, channel: str) -> queue.Queue:
+        """Register a new subscriber queue on a channel."""
+        subscriber: queue.Queue = queue.Queue(maxsize=self.max_queued)
+        with self._lock:
+            self._subscribers.setdefault(channel, []).append(subscriber)
+        return subscriber
+
+    def unsubscribe(self, channel: str, subscriber: queue.Queue):
+        with self._lock:
+            subscribers = self._subscribers.get(channel, [])
+            if subscriber in subscribers:
+                subscribers.remove(subscriber)
+            if not subscribers:
+                self._subscribers.pop(channel, None)
+
+    def publish(self, channel: str, event: str, data: dict):
+        """
+        Deliver an event to the channel's subscribers without blocking.
+
+        A subscriber that has fallen behind loses its oldest queued event;
+        progress updates supersede each other, so only the latest matters.
+        """
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for subscriber in subscribers:
+            while True:
+                try:
+                    subscriber.put_nowait((event, data))
+                    break
+                except queue.Full:
+                    try:
+                        subscriber.get_nowait()
+                    except queue.Empty:
+                        pass
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return sum(len(subscribers) for subscribers in self._subscribers.values())
@@ -0,0 +1,265 @@
+"""
+Single-pass HTML analyzer for the final page of a scan.
+
+The page is tokenized once and every signal the scanner needs (meta refresh,
+JavaScript redirects, sensitive forms, and a few structural counters) is
+collected from the same stream of events. lxml is used when it is installed;
+otherwise the stdlib ``html.parser`` tokenizer is used. Both drive the same
+collector through lxml's parser-target interface (start/end/data/close).
+
+The same pass also fingerprints the page for near-duplicate (phishing kit)
+matching: a SimHash over shingles of consecutive tags and of visible words
+(with the title's words masked, so rebranding a kit barely moves it), see
+``core.kit_index``. The raw text is also run through
+``core.security.PatternScanner`` for script and markup payload patterns.
+"""
+import re
+from collections import deque
+from dataclasses import dataclass, field
+from html.parser import HTMLParser
+from typing import Literal
+from urllib.parse import urljoin, urlparse
+
+from core.kit_index import feature_hash, simhash
+from core.rules import SENSITIVE_INPUT_KEYWORDS
+from core.security import PatternScanner
+
+try:
+    from lxml import etree as _lxml_etree
+except ImportError:
+    _lxml_etree = None
+
+_META_REFRESH_URL = re.compile(r"""url\s*=\s*(?:(['"])(.*?)\1|([^\s'"]+))""", re.I)
+
+_JS_REDIRECT = re.compile(
+    r"""
+    window\.location\s*=\s*['"]([^'"]+)['"]|
+    window\.location\.href\s*=\s*['"]([^'"]+)['"]|
+    window\.location\.replace\(\s*['"]([^'"]+)['"]\s*\)
+    """,
+    re.IGNORECASE | re.VERBOSE
+)
+
+# Shingle sizes and per-kind caps for the page fingerprint
+_TAG_SHINGLE = 4
+_WORD_SHINGLE = 3
+# Tag shingles count this many times: markup survives a kit's rebranding better than text
+_TAG_WEIGHT = 4
+_MAX_SHINGLES = 1024  # the top of a page identifies its kit; keeps large pages cheap
+# Attributes that identify a form field across deployments of the same kit
+_FIELD_TAGS = {'form', 'input', 'button', 'select', 'textarea'}
+_DIGITS = str.maketrans('0123456789', '0000000000')
+
+
+@dataclass
+class PageAnalysis:
+    """Signals extracted from an HTML page."""
+    redirect_url: str | None = None
+    redirect_kind: Literal["meta", "js"] | None = None
+    has_sensitive_form: bool = False
+    title: str | None = None
+    form_count: int = 0
+    password_input_count: int = 0
+    external_form_action: bool = False
+    iframe_count: int = 0
+    script_count: int = 0
+    fingerprint: int | None = None  # 64-bit SimHash of tag and text shingles
+    suspicious_patterns: dict[str, int] = field(default_factory=dict)  # SUSPICIOUS_PATTERNS hits by name
+
+
+class _PageCollector:
+    """Parser target that accumulates ``PageAnalysis`` fields from tag events."""
+
+    def __init__(self, base_url: str, sensitive_keywords=SENSITIVE_INPUT_KEYWORDS):
+        self.base_url = base_url
+        self.base_host = urlparse(base_url).hostname
+        self.sensitive_keywords = tuple(sensitive_keywords)
+        self.result = PageAnalysis()
+        self._meta_refresh: str | None = None
+        self._js_redirect: str | None = None
+        self._form_depth = 0
+        self._in_script = False
+        self._in_title = False
+        self._in_style = False
+        self._script_text: list[str] = []
+        self._title_text: list[str] = []
+        self._tag_features: set[int] = set()
+        self._text_features: set[int] = set()
+        self._title_words: frozenset[str] = frozenset()
+        self._tag_shingles = 0
+        self._word_shingles = 0
+        self._recent_tags: deque[str] = deque(maxlen=_TAG_SHINGLE)
+        self._recent_words: deque[str] = deque(maxlen=_WORD_SHINGLE)
+
+    def start(self, tag: str, attrib: dict):
+        tag = tag.lower()
+        result = self.result
+        if self._tag_shingles < _MAX_SHINGLES:
+            self._add_tag_shingle(tag, attrib)
+        if tag == 'meta':
+            if self._meta_refresh is None and 'refresh' in (attrib.get('http-equiv') or '').lower():
+                # Only the first refresh tag counts, as browsers do
+                self._meta_refresh = attrib.get('content') or ''
+        elif tag == 'script':
+            result.script_count += 1
+            self._in_script = True
+            self._script_text = []
+        elif tag == 'form':
+            result.form_count += 1
+            self._form_depth += 1
+            action = attrib.get('action')
+            if action:
+                action_host = urlparse(urljoin(self.base_url, action)).hostname
+                if action_host and action_host != self.base_host:
+                    result.external_form_action = True
+        elif tag == 'input':
+            input_type = (attrib.get('type') or '').lower()
+            if input_type == 'password':
+                result.password_input_count += 1
+            if self._form_depth and not result.has_sensitive_form:
+                result.has_sensitive_form = self._is_sensitive_input(input_type, attrib)
+        elif tag == 'iframe':
+            result.iframe_count += 1
+        elif tag == 'title' and result.title is None:
+            self._in_title = True
+        elif tag == 'style':
+            self._in_style = True
+
+    def end(self, tag: str):
+        tag = tag.lower()
+        if tag == 'script' and self._in_script:
+            self._in_script = False
+            if self._js_redirect is None:
+                match = _JS_REDIRECT.search(''.join(self._script_text))
+                if match:
+                    self._js_redirect = next((g for g in match.groups() if g), None)
+        elif tag == 'form' and self._form_depth:
+            self._form_depth -= 1
+        elif tag == 'title' and self._in_title:
+            self._in_title = False
+            self.result.title = ' '.join(''.join(self._title_text).split())
+            self._title_words = frozenset(self.result.title.lower().translate(_DIGITS).split())
+        elif tag == 'style':
+            self._in_style = False
+
+    def data(self, text: str):
+        if self._in_script:
+            self._script_text.append(text)
+            return
+        if self._in_title:
+            # Title words are masked in the page text rather than shingled themselves
+            self._title_text.append(text)
+        elif not self._in_style and self._word_shingles < _MAX_SHINGLES:
+            self._add_word_shingles(text)
+
+    def close(self) -> PageAnalysis:
+        result = self.result
+        if self._meta_refresh:
+            match = _META_REFRESH_URL.search(self._meta_refresh)
+            target = (match.group(2) or match.group(3) or '').strip() if match else ''
+            if target:
+                result.redirect_url = urljoin(self.base_url, target)
+                result.redirect_kind = "meta"
+        if result.redirect_url is None and self._js_redirect:
+            result.redirect_url = urljoin(self.base_url, self._js_redirect)
+            result.redirect_kind = "js"
+        result.fingerprint = simhash(self._text_features, self._tag_features, _TAG_WEIGHT)
+        return result
+
+    def _add_tag_shingle(self, tag: str, attrib: dict):
+        if tag in _FIELD_TAGS:
+            action = (attrib.get('action') or '').rsplit('/', 1)[-1].split('?', 1)[0]
+            tag = f"{tag}[{(attrib.get('type') or '').lower()}|{attrib.get('name') or ''}|{action}]"
+        self._recent_tags.append(tag)
+        if len(self._recent_tags) == _TAG_SHINGLE:
+            self._tag_features.add(feature_hash('<' + ' '.join(self._recent_tags)))
+            self._tag_shingles += 1
+
+    def _add_word_shingles(self, text: str):
+        # Digits are folded so per-visitor tokens and counters do not change the fingerprint
+        for word in text.lower().translate(_DIGITS).split():
+            if word in self._title_words or '@' in word:
+                # Title words (usually the impersonated brand) and e-mail addresses are masked,
+                # and runs of them collapsed, so redeploying a kit for another brand keeps its text shingles
+                if self._recent_words and self._recent_words[-1] == '*':
+                    continue
+                word = '*'
+            self._recent_words.append(word)
+            if len(self._recent_words) == _WORD_SHINGLE:
+                self._text_features.add(feature_hash(' '.join(self._recent_words)))
+                self._word_shingles += 1
+                if self._word_shingles >= _MAX_SHINGLES:
+                    return
+
+    def _is_sensitive_input(self, input_type: str, attrib: dict) -> bool:
+        if input_type == 'password':
+            return True
+        name = (attrib.get('name') or '').lower()
+        input_id = (attrib.get('id') or '').lower()
+        return any(keyword in name or keyword in input_id for keyword in self.sensitive_keywords)
+
+
+class _StdlibParser(HTMLParser):
+    """Adapts ``html.parser`` callbacks to the collector's target interface."""
+
+    def __init__(self, target: _PageCollector):
+        super().__init__(convert_charrefs=True)
+        self.target = target
+
+    def handle_starttag(self, tag, attrs):
+        self.target.start(tag, {name: value or '' for name, value in attrs})
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        self.target.end(tag)
+
+    def handle_endtag(self, tag):
+        self.target.end(tag)
+
+    def handle_data(self, data):
+        self.target.data(data)
+
+    def close(self) -> PageAnalysis:
+        super().close()
+        return self.target.close()
+
+
+class HtmlAnalyzer:
+    """
+    Incremental page analyzer: ``feed()`` chunks as they arrive, then
+    ``close()`` to get the ``PageAnalysis``.
+    """
+
+    def __init__(self, base_url: str, use_lxml: bool | None = None,
+                 sensitive_keywords=SENSITIVE_INPUT_KEYWORDS):
+        self._collector = _PageCollector(base_url, sensitive_keywords)
+        self._patterns = PatternScanner()
+        self._fed = False
+        if use_lxml is None:
+            use_lxml = _lxml_etree is not None
+        if use_lxml:
+            self._parser = _lxml_etree.HTMLParser(target=self._collector)
+        else:
+            self._parser = _StdlibParser(self._collector)
+
+    def feed(self, chunk: str):
+        if chunk:
+            self._fed = True
+            self._parser.feed(chunk)
+            self._patterns.feed(chunk)
+
+    def close(self) -> PageAnalysis:
+        if not self._fed:
+            # lxml refuses to close a parser that never received any input
+            result = self._collector.close()
+        else:
+            result = self._parser.close()
+        result.suspicious_patterns = self._patterns.close()
+        return result
+
+
+def analyze_html(html_content: str, base_url: str, use_lxml: bool | None = None) -> PageAnalysis:
+    """Analyze a complete HTML document in a single pass."""
+    analyzer = HtmlAnalyzer(base_url, use_lxml)
+    analyzer.feed(html_content)
+    return analyzer.close()
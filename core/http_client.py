@@ -0,0 +1,362 @@
+"""
+Process-wide pooled HTTP client shared by every scan.
+
+A single ``httpx.AsyncClient`` lives on the shared scan event loop so that
+connections (and their DNS/TCP/TLS setup) to popular hosts such as URL
+shorteners are kept alive and reused across scans. New connections resolve
+their host through ``core.resolver``, which caches DNS answers and refuses
+private addresses.
+
+Requests also pass through a ``HostGovernor``, which caps concurrent
+requests per host, keeps rolling error/latency stats per host and opens a
+circuit for hosts that keep failing or hanging, so later scans of them fail
+fast instead of waiting out their timeouts.
+"""
+import asyncio
+import contextlib
+import importlib.util
+import os
+import ssl
+import time
+from collections import Counter, OrderedDict, deque
+from typing import AsyncIterator
+
+import httpx
+
+from core.resolver import Resolver, ResolvingTransport, blocked_address
+
+
+def _env_int(name: str, default: int) -> int:
+    return int(os.getenv(name, str(default)))
+
+
+def _env_float(name: str, default: float) -> float:
+    return float(os.getenv(name, str(default)))
+
+
+class _HostSlots:
+    """Per-host semaphores, created on demand and dropped once idle."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self._slots: dict[str, list] = {}  # host -> [semaphore, users]
+
+    async def acquire(self, host: str):
+        slot = self._slots.setdefault(host, [asyncio.Semaphore(self.limit), 0])
+        slot[1] += 1
+        try:
+            await slot[0].acquire()
+        except BaseException:
+            self._release_user(host, slot)
+            raise
+
+    def release(self, host: str):
+        slot = self._slots[host]
+        slot[0].release()
+        self._release_user(host, slot)
+
+    def _release_user(self, host: str, slot: list):
+        slot[1] -= 1
+        if slot[1] == 0:
+            del self._slots[host]
+
+    def in_use(self) -> dict[str, int]:
+        return {host: self.limit - slot[0]._value for host, slot in list(self._slots.items())}
+
+    def waiting(self) -> int:
+        return sum(max(0, users - self.limit) for _, users in list(self._slots.values()))
+
+
+class HostUnavailableError(httpx.ConnectError):
+    """A request skipped because the host's circuit is open."""
+
+    def __init__(self, host: str, retry_in: float, request: httpx.Request | None = None):
+        super().__init__(f"{host} is not responding; skipped for another {retry_in:.0f}s", request=request)
+        self.host = host
+        self.retry_in = retry_in
+
+
+class _HostHealth:
+    """Rolling outcome window and circuit state of one host."""
+    __slots__ = ('outcomes', 'consecutive_failures', 'opened_at', 'probing')
+
+    def __init__(self, window: int):
+        self.outcomes: deque = deque(maxlen=window)  # (ok, seconds)
+        self.consecutive_failures = 0
+        self.opened_at: float | None = None
+        self.probing = False
+
+    def error_rate(self) -> float:
+        return sum(1 for ok, _ in self.outcomes if not ok) / len(self.outcomes) if self.outcomes else 0.0
+
+    def mean_latency(self) -> float:
+        return sum(elapsed for _, elapsed in self.outcomes) / len(self.outcomes) if self.outcomes else 0.0
+
+
+class HostGovernor:
+    """
+    Per-host concurrency caps plus a circuit breaker.
+
+    A host's circuit opens after ``failure_threshold`` consecutive failures
+    (connection errors, or requests that timed out or were abandoned after
+    hanging for at least ``slow_s``), or once its error rate over the last
+    ``window`` requests reaches ``max_error_rate``. While open, requests
+    fail with ``HostUnavailableError``; after ``cooldown`` seconds a single
+    probe request is let through and its outcome closes or reopens it.
+    """
+
+    def __init__(self, per_host_limit: int = 6, failure_threshold: int = 5, max_error_rate: float = 0.8,
+                 window: int = 20, cooldown: float = 30.0, slow_s: float = 5.0, max_hosts: int = 10000):
+        self.slots = _HostSlots(per_host_limit)
+        self.failure_threshold = failure_threshold
+        self.max_error_rate = max_error_rate
+        self.window = window
+        self.cooldown = cooldown
+        self.slow_s = slow_s
+        self.max_hosts = max_hosts
+        self._hosts: OrderedDict[str, _HostHealth] = OrderedDict()
+        self.rejected = 0
+        self.trips = 0
+
+    @classmethod
+    def from_env(cls, per_host_limit: int) -> "HostGovernor":
+        """Build a governor from the HTTP_CIRCUIT_* environment variables."""
+        return cls(
+            per_host_limit=per_host_limit,
+            failure_threshold=_env_int('HTTP_CIRCUIT_FAILURES', 5),
+            max_error_rate=_env_float('HTTP_CIRCUIT_ERROR_RATE', 0.8),
+            window=_env_int('HTTP_CIRCUIT_WINDOW', 20),
+            cooldown=_env_float('HTTP_CIRCUIT_COOLDOWN', 30.0),
+            slow_s=_env_float('HTTP_CIRCUIT_SLOW', 5.0),
+        )
+
+    def _health(self, host: str) -> _HostHealth:
+        health = self._hosts.get(host)
+        if health is None:
+            health = self._hosts[host] = _HostHealth(self.window)
+            if len(self._hosts) > self.max_hosts:
+                self._hosts.popitem(last=False)
+        else:
+            self._hosts.move_to_end(host)
+        return health
+
+    def _check(self, host: str, health: _HostHealth, request: httpx.Request) -> bool:
+        """Raise if the circuit is open; True if this request is the half-open probe."""
+        if health.opened_at is None:
+            return False
+        retry_in = health.opened_at + self.cooldown - time.monotonic()
+        if retry_in > 0 or health.probing:
+            self.rejected += 1
+            raise HostUnavailableError(host, max(retry_in, 0), request=request)
+        health.probing = True
+        return True
+
+    @contextlib.asynccontextmanager
+    async def request(self, request: httpx.Request) -> AsyncIterator[None]:
+        """Hold a slot for ``request``'s host, recording how the request went."""
+        host = request.url.host
+        health = self._health(host)
+        probe = self._check(host, health, request)
+        try:
+            await self.slots.acquire(host)
+            # The circuit may have opened while this request queued for the host
+            probe = probe or self._check(host, health, request)
+        except BaseException as e:
+            if isinstance(e, HostUnavailableError):
+                self.slots.release(host)
+            elif probe:
+                health.probing = False
+            raise
+        started = time.monotonic()
+        ok: bool | None = True  # None: the outcome says nothing about the host's health
+        try:
+            yield
+        except httpx.TransportError as e:
+            if blocked_address(e) is not None:
+                ok = None  # refused by policy, never sent
+            elif isinstance(e, httpx.TimeoutException) and time.monotonic() - started < self.slow_s:
+                ok = None  # a timeout cut short by a tight scan deadline
+            else:
+                ok = False
+            raise
+        except asyncio.CancelledError:
+            # The scan gave up; only count it against the host if the host kept it hanging
+            ok = None if time.monotonic() - started < self.slow_s else False
+            raise
+        finally:
+            self.slots.release(host)
+            self._record(host, health, ok, time.monotonic() - started, probe)
+
+    def _record(self, host: str, health: _HostHealth, ok: bool | None, elapsed: float, probe: bool):
+        if probe:
+            health.probing = False
+        if ok is None:
+            return
+        health.outcomes.append((ok, elapsed))
+        if ok:
+            health.consecutive_failures = 0
+            health.opened_at = None
+            return
+        health.consecutive_failures += 1
+        if (probe or health.consecutive_failures >= self.failure_threshold
+                or (len(health.outcomes) == self.window and health.error_rate() >= self.max_error_rate)):
+            if health.opened_at is None or probe:
+                self.trips += 1
+                print(f"Warning: {host} is failing or unresponsive; skipping it for {self.cooldown:g}s")
+            health.opened_at = time.monotonic()
+
+    def open_circuits(self) -> list[str]:
+        now = time.monotonic()
+        return [host for host, health in list(self._hosts.items())
+                if health.opened_at is not None and health.opened_at + self.cooldown > now]
+
+    def host_stats(self, host: str) -> dict | None:
+        """Rolling stats of one host, or None if it has not been seen."""
+        health = self._hosts.get(host)
+        if health is None:
+            return None
+        return {
+            'requests': len(health.outcomes),
+            'error_rate': round(health.error_rate(), 3),
+            'mean_latency_ms': round(health.mean_latency() * 1000, 1),
+            'consecutive_failures': health.consecutive_failures,
+            'circuit_open': host in self.open_circuits(),
+        }
+
+    def stats(self) -> dict:
+        unhealthy = sorted(((host, health) for host, health in list(self._hosts.items()) if health.outcomes),
+                           key=lambda item: -item[1].error_rate())[:10]
+        return {
+            'hosts_tracked': len(self._hosts),
+            'circuits_open': len(self.open_circuits()),
+            'circuit_trips_total': self.trips,
+            'requests_rejected_total': self.rejected,
+            'least_healthy_hosts': {host: self.host_stats(host) for host, health in unhealthy
+                                    if health.error_rate() > 0},
+        }
+
+
+class HttpClientManager:
+    """Owns the shared ``AsyncClient`` and enforces per-host connection caps."""
+
+    def __init__(self, max_connections: int = 100, max_keepalive_connections: int = 20,
+                 keepalive_expiry: float = 30.0, http2: bool = False, per_host_limit: int = 6,
+                 resolver: Resolver | None = None, governor: HostGovernor | None = None):
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        if http2 and importlib.util.find_spec("h2") is None:
+            print("Warning: HTTP/2 requested but the 'h2' package is not installed; using HTTP/1.1")
+            http2 = False
+        self.http2 = http2
+        self.per_host_limit = per_host_limit
+        self.resolver = resolver or Resolver()
+        self._ssl_context: ssl.SSLContext | None = None
+        self._client: httpx.AsyncClient | None = None
+        self._client_pid: int | None = None
+        self.governor = governor or HostGovernor(per_host_limit)
+        self._requests_total = 0
+        self._errors_total = 0
+        self._in_flight = 0
+        self._status_counts: Counter = Counter()
+
+    @classmethod
+    def from_env(cls) -> "HttpClientManager":
+        """Build a manager from the HTTP_* environment variables."""
+        return cls(
+            max_connections=_env_int('HTTP_MAX_CONNECTIONS', 100),
+            max_keepalive_connections=_env_int('HTTP_MAX_KEEPALIVE', 20),
+            keepalive_expiry=_env_float('HTTP_KEEPALIVE_EXPIRY', 30.0),
+            http2=os.getenv('HTTP2', '').lower() in ('1', 'true', 'yes'),
+            per_host_limit=_env_int('HTTP_PER_HOST_CONNECTIONS', 6),
+            resolver=Resolver.from_env(),
+            governor=HostGovernor.from_env(_env_int('HTTP_PER_HOST_CONNECTIONS', 6)),
+        )
+
+    @property
+    def ssl_context(self) -> ssl.SSLContext:
+        """
+        TLS context for outbound connections. Loading the CA bundle is slow,
+        so it is built once and a forked worker reuses the parent's.
+        """
+        if self._ssl_context is None:
+            self._ssl_context = httpx.create_ssl_context()
+        return self._ssl_context
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """The shared client; must be used from the shared event loop."""
+        if self._client is None or self._client_pid != os.getpid():
+            # A forked worker must not reuse the parent's sockets
+            self.governor.slots = _HostSlots(self.per_host_limit)
+            self.resolver.clear()
+            self._client_pid = os.getpid()
+            self._client = httpx.AsyncClient(
+                follow_redirects=False,
+                transport=ResolvingTransport(self.resolver, limits=self.limits, http2=self.http2,
+                                             verify=self.ssl_context),
+            )
+        return self._client
+
+    @contextlib.asynccontextmanager
+    async def stream(self, request: httpx.Request) -> AsyncIterator[httpx.Response]:
+        """
+        Send a request through the pool without reading the body.
+
+        The host slot is held until the caller leaves the context, at which
+        point the response is closed. Raises ``HostUnavailableError`` without
+        sending anything if the host's circuit is open.
+        """
+        async with self.governor.request(request):
+            self._in_flight += 1
+            self._requests_total += 1
+            try:
+                try:
+                    response = await self.client.send(request, stream=True)
+                except httpx.RequestError:
+                    self._errors_total += 1
+                    raise
+                self._status_counts[response.status_code // 100 * 100] += 1
+                try:
+                    yield response
+                finally:
+                    await response.aclose()
+            finally:
+                self._in_flight -= 1
+
+    async def aclose(self):
+        """Close all pooled connections."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def stats(self) -> dict:
+        """Pool usage counters for monitoring."""
+        connections = []
+        if self._client is not None:
+            # httpx does not expose the pool publicly; read it defensively
+            pool = getattr(self._client._transport, '_pool', None)
+            connections = list(getattr(pool, 'connections', []))
+        busiest = sorted(self.governor.slots.in_use().items(), key=lambda item: -item[1])[:10]
+        return {
+            'http2': self.http2,
+            'max_connections': self.limits.max_connections,
+            'max_keepalive_connections': self.limits.max_keepalive_connections,
+            'per_host_limit': self.per_host_limit,
+            'connections_open': len(connections),
+            'connections_idle': sum(1 for c in connections if c.is_idle()),
+            'requests_total': self._requests_total,
+            'requests_in_flight': self._in_flight,
+            'requests_waiting_for_host': self.governor.slots.waiting(),
+            'request_errors_total': self._errors_total,
+            'responses_by_status': {str(k): v for k, v in sorted(self._status_counts.items())},
+            'busiest_hosts': dict(busiest),
+            'hosts': self.governor.stats(),
+            'dns': self.resolver.stats(),
+        }
+
+
+# Shared by every scan in this process
+client_manager = HttpClientManager.from_env()
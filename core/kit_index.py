@@ -0,0 +1,167 @@
+"""
+Near-duplicate matching of final pages against known phishing kits.
+
+A page fingerprint is a 64-bit SimHash over the page's tag and text
+shingles (computed by ``core.html_analyzer``, tag shingles weighted higher):
+pages deployed from the same kit, also for different brands, differ in a
+few bits at most, unrelated pages in about half of them.
+
+Known-bad fingerprints are kept one per line in a local feed
+(``resources/phishing_kits.txt`` by default) as ``<16 hex digits> <kit name>``.
+``KitIndex`` splits every fingerprint into ``max_distance + 1`` bands and
+keeps one sorted table per band: by the pigeonhole principle a fingerprint
+within ``max_distance`` bits of a known one agrees with it on at least one
+band, so a lookup only compares against the entries sharing a band value
+(a ``searchsorted`` per band) instead of the whole feed.
+
+Add the final page of a confirmed phishing site to the feed with:
+
+    python -m core.kit_index add resources/phishing_kits.txt page.html "kit name"
+"""
+import hashlib
+import sys
+from typing import Iterable
+
+import numpy as np
+
+from core import rules
+
+FINGERPRINT_BITS = 64
+MAX_DISTANCE = 6  # differing bits still counted as the same kit
+MIN_SHINGLES = 16  # pages with fewer features get no fingerprint
+
+_HASH_DTYPE = np.dtype("<u8")
+
+
+def _popcount(values: np.ndarray) -> np.ndarray:
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(values)
+    return np.unpackbits(values.view(np.uint8)).reshape(-1, FINGERPRINT_BITS).sum(axis=1)
+
+
+def feature_hash(feature: str) -> int:
+    """Stable 64-bit hash of one shingle (the same in every process)."""
+    return int.from_bytes(hashlib.blake2b(feature.encode("utf-8", "replace"), digest_size=8).digest(), "little")
+
+
+def simhash(hashes: Iterable[int], weighted: Iterable[int] = (), weight: int = 1) -> int | None:
+    """
+    SimHash of a set of feature hashes: bit i is set when most features have
+    bit i set. Each feature in ``weighted`` counts ``weight`` times.
+    """
+    values = np.fromiter(hashes, dtype=_HASH_DTYPE)
+    extra = np.fromiter(weighted, dtype=_HASH_DTYPE)
+    if len(values) + len(extra) < MIN_SHINGLES:
+        return None
+    counts = np.zeros(FINGERPRINT_BITS, dtype=np.int64)
+    total = 0
+    for group, times in ((values, 1), (extra, weight)):
+        if len(group):
+            bits = np.unpackbits(group.view(np.uint8), bitorder="little").reshape(-1, FINGERPRINT_BITS)
+            counts += bits.sum(axis=0, dtype=np.int64) * times
+            total += len(group) * times
+    majority = counts * 2 > total
+    return int(np.packbits(majority, bitorder="little").view(_HASH_DTYPE)[0])
+
+
+def format_fingerprint(fingerprint: int) -> str:
+    return f"{fingerprint:016x}"
+
+
+def parse_entry(line: str) -> tuple[int, str] | None:
+    """Parse one feed line into ``(fingerprint, kit name)``."""
+    parts = line.split(None, 1)
+    try:
+        fingerprint = int(parts[0], 16)
+    except (IndexError, ValueError):
+        return None
+    if not 0 <= fingerprint < 1 << FINGERPRINT_BITS:
+        return None
+    return fingerprint, (parts[1].strip() if len(parts) > 1 else "") or parts[0]
+
+
+class KitIndex:
+    """Banded LSH index over known-bad page fingerprints."""
+
+    def __init__(self, entries: Iterable[tuple[int, str]] = (), max_distance: int = MAX_DISTANCE):
+        fingerprints: dict[int, str] = {}
+        for fingerprint, name in entries:
+            fingerprints.setdefault(fingerprint, name)
+        self.max_distance = max_distance
+        self._fingerprints = np.array(list(fingerprints), dtype=_HASH_DTYPE)
+        self._names = list(fingerprints.values())
+        # Band b covers bits [shift, shift + width); bands differ in width by at most one bit
+        bands = max_distance + 1
+        widths = [FINGERPRINT_BITS // bands + (b < FINGERPRINT_BITS % bands) for b in range(bands)]
+        self._bands = []
+        shift = 0
+        for width in widths:
+            keys = self._band_keys(self._fingerprints, shift, width)
+            order = np.argsort(keys, kind="stable")
+            self._bands.append((shift, width, keys[order], order))
+            shift += width
+
+    @classmethod
+    def from_lines(cls, lines: Iterable[str], max_distance: int = MAX_DISTANCE) -> "KitIndex":
+        """Build an index from feed lines, skipping the ones that do not parse."""
+        entries = (parse_entry(line) for line in lines)
+        return cls((entry for entry in entries if entry is not None), max_distance)
+
+    @classmethod
+    def from_file(cls, path: str, max_distance: int = MAX_DISTANCE) -> "KitIndex":
+        return cls.from_lines(rules.read_list(path, "Phishing kit list"), max_distance)
+
+    @staticmethod
+    def _band_keys(values: np.ndarray, shift: int, width: int) -> np.ndarray:
+        return (values >> np.uint64(shift)) & np.uint64((1 << width) - 1)
+
+    def __len__(self) -> int:
+        return len(self._fingerprints)
+
+    def match(self, fingerprint: int | None) -> tuple[str, int] | None:
+        """Return ``(kit name, differing bits)`` of the closest known kit within ``max_distance``."""
+        if fingerprint is None or not len(self._fingerprints):
+            return None
+        query = np.array([fingerprint], dtype=_HASH_DTYPE)
+        candidates = []
+        for shift, width, keys, order in self._bands:
+            key = self._band_keys(query, shift, width)
+            lo, hi = np.searchsorted(keys, key, "left")[0], np.searchsorted(keys, key, "right")[0]
+            candidates.append(order[lo:hi])
+        candidates = np.unique(np.concatenate(candidates))
+        if not len(candidates):
+            return None
+        distances = _popcount(self._fingerprints[candidates] ^ query)
+        best = int(np.argmin(distances))
+        if distances[best] > self.max_distance:
+            return None
+        return self._names[candidates[best]], int(distances[best])
+
+
+def main(argv: list[str]) -> int:
+    from core.html_analyzer import analyze_html
+
+    usage = ("usage: python -m core.kit_index add FEED PAGE.html NAME\n"
+             "       python -m core.kit_index match FEED PAGE.html")
+    if len(argv) < 3 or argv[0] not in ("add", "match") or (argv[0] == "add" and len(argv) < 4):
+        print(usage)
+        return 2
+    command, feed, page_path = argv[:3]
+    with open(page_path, "r", encoding="utf-8", errors="replace") as f:
+        fingerprint = analyze_html(f.read(), "https://localhost/").fingerprint
+    if fingerprint is None:
+        print(f"{page_path}: too little markup or text to fingerprint")
+        return 1
+    if command == "match":
+        match = KitIndex.from_file(feed).match(fingerprint)
+        print(f"{format_fingerprint(fingerprint)} "
+              + (f"matches '{match[0]}' ({match[1]} bits apart)" if match else "matches no known kit"))
+        return 0 if match else 1
+    with open(feed, "a", encoding="utf-8") as f:
+        f.write(f"{format_fingerprint(fingerprint)} {argv[3]}\n")
+    print(f"Added {format_fingerprint(fingerprint)} {argv[3]} to {feed}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
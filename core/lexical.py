@@ -0,0 +1,328 @@
+"""
+Vectorized lexical features and a pre-score for batches of URLs.
+
+A cheap first pass for triaging large feeds without touching the network:
+only URLs whose pre-score reaches a threshold need a full scan. A batch is
+encoded into one byte array (URLs separated by newlines) and every feature
+is computed with NumPy operations over that array, so the per-URL Python
+work is limited to joining the strings.
+
+Hosts are located the way ``urlsplit`` would for ``scheme://[user@]host[:port]``
+URLs, and schemeless input is read as a bare host (as the scanner does). Public
+suffixes are matched on hashes of the host's last one to three labels against
+the offline suffix list from ``core.psl``; wildcard suffix rules are ignored.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+
+from core import psl, rules
+
+# Pre-score weight of each flag; see ``LexicalFeatures.flags`` for what sets them
+WEIGHTS = {
+    "suspicious_tld": rules.SCORE_SUSPICIOUS_TLD,
+    "ip_host": 25,
+    "punycode": 20,
+    "at_sign": 25,
+    "double_slash": 10,
+    "long_url": 10,
+    "deep_subdomain": 10,
+    "digit_heavy": 10,
+    "symbol_heavy": 5,
+    "high_entropy": 10,
+}
+PRESCORE_THRESHOLD = 20  # URLs scoring below this can skip the full scan
+
+LONG_URL = 75
+DEEP_SUBDOMAIN = 3
+DIGIT_RATIO = 0.2
+SYMBOL_RATIO = 0.35
+HIGH_ENTROPY = 4.5
+
+_CHUNK = 8192  # URLs per pass; bounds the per-URL character histogram to ~16 MB
+_HASH_BASE = np.uint64(1099511628211)
+
+_LOWER = np.arange(256, dtype=np.uint8)
+_LOWER[ord('A'):ord('Z') + 1] += 32
+_IS_DIGIT = np.zeros(256, dtype=bool)
+_IS_DIGIT[ord('0'):ord('9') + 1] = True
+_IS_ALNUM = _IS_DIGIT.copy()
+_IS_ALNUM[ord('a'):ord('z') + 1] = True
+_IS_ALNUM[0x80:] = True  # UTF-8 bytes of non-ASCII letters
+_IS_DELIMITER = np.zeros(256, dtype=bool)
+_IS_DELIMITER[[ord('/'), ord('?'), ord('#')]] = True
+_IP_CHARS = _IS_DIGIT.copy()
+_IP_CHARS[ord('.')] = True
+
+
+def _hash(label: str) -> int:
+    """Python twin of the vectorized suffix hash."""
+    value = 0
+    for byte in label.encode('utf-8'):
+        value = (value * int(_HASH_BASE) + byte) & 0xFFFFFFFFFFFFFFFF
+    return value
+
+
+def _suffix_hashes(suffixes) -> np.ndarray:
+    return np.array(sorted({_hash(s.lower().strip('.')) for s in suffixes if s and '*' not in s}),
+                    dtype=np.uint64)
+
+
+@dataclass(slots=True)
+class LexicalFeatures:
+    """Per-URL feature arrays of one batch, all aligned with the input order."""
+    length: np.ndarray  # bytes of UTF-8
+    digit_ratio: np.ndarray
+    symbol_ratio: np.ndarray  # share of characters that are not letters or digits
+    entropy: np.ndarray  # Shannon entropy of the characters, bits per byte
+    subdomain_depth: np.ndarray  # labels left of the registrable domain
+    ip_host: np.ndarray  # host is an IPv4/IPv6 literal or a bare number
+    punycode: np.ndarray  # host has an xn-- label or non-ASCII characters
+    suspicious_tld: np.ndarray
+    at_sign: np.ndarray  # "user@" before the host, e.g. https://bank.com@evil.example
+    double_slash: np.ndarray  # "//" after the host, e.g. https://a.example//b.example
+
+    def __len__(self) -> int:
+        return len(self.length)
+
+    def flags(self) -> dict[str, np.ndarray]:
+        """The boolean signals the pre-score adds up."""
+        return {
+            "suspicious_tld": self.suspicious_tld,
+            "ip_host": self.ip_host,
+            "punycode": self.punycode,
+            "at_sign": self.at_sign,
+            "double_slash": self.double_slash,
+            "long_url": self.length >= LONG_URL,
+            "deep_subdomain": self.subdomain_depth >= DEEP_SUBDOMAIN,
+            "digit_heavy": self.digit_ratio >= DIGIT_RATIO,
+            "symbol_heavy": self.symbol_ratio >= SYMBOL_RATIO,
+            "high_entropy": self.entropy >= HIGH_ENTROPY,
+        }
+
+    def prescore(self, weights: dict[str, int] | None = None) -> np.ndarray:
+        """Weighted sum of ``flags()`` per URL."""
+        weights = WEIGHTS if weights is None else weights
+        score = np.zeros(len(self), dtype=np.int32)
+        for name, flag in self.flags().items():
+            score += flag.astype(np.int32) * weights.get(name, 0)
+        return score
+
+
+def _positions(mask: np.ndarray, seg: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Positions where ``mask`` is set, and the URL each belongs to."""
+    idx = np.flatnonzero(mask)
+    return idx, seg[idx]
+
+
+def _first(idx: np.ndarray, owner: np.ndarray, default: np.ndarray) -> np.ndarray:
+    """Per URL, the first of the (sorted) positions ``idx`` it owns, else ``default``."""
+    out = default.copy()
+    if len(idx):
+        first = np.empty(len(idx), dtype=bool)
+        first[0] = True
+        first[1:] = owner[1:] != owner[:-1]
+        out[owner[first]] = idx[first]
+    return out
+
+
+def _last(idx: np.ndarray, owner: np.ndarray, default: np.ndarray) -> np.ndarray:
+    """Per URL, the last of the (sorted) positions ``idx`` it owns, else ``default``."""
+    out = default.copy()
+    if len(idx):
+        last = np.empty(len(idx), dtype=bool)
+        last[-1] = True
+        last[:-1] = owner[:-1] != owner[1:]
+        out[owner[last]] = idx[last]
+    return out
+
+
+def _within(idx: np.ndarray, owner: np.ndarray, begin: np.ndarray, end: np.ndarray):
+    """The positions that fall inside their URL's ``[begin, end)`` range."""
+    keep = (idx >= begin[owner]) & (idx < end[owner])
+    return idx[keep], owner[keep]
+
+
+_XLOGX = np.zeros(1)
+
+
+def _xlogx(max_count: int) -> np.ndarray:
+    """Table of ``c * log2(c)`` for character counts up to ``max_count``."""
+    global _XLOGX
+    if len(_XLOGX) <= max_count:
+        counts = np.arange(max(max_count + 1, 2 * len(_XLOGX)), dtype=np.float64)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            _XLOGX = np.where(counts > 0, counts * np.log2(counts), 0.0)
+    return _XLOGX
+
+
+class LexicalScorer:
+    """Computes ``LexicalFeatures`` for batches of URLs."""
+
+    def __init__(self, suspicious_tlds=None, public_suffixes=None):
+        if suspicious_tlds is None:
+            suspicious_tlds = rules.read_list("resources/suspicious_tlds.txt", "Suspicious TLDs")
+        if public_suffixes is None:
+            public_suffixes = psl.extract.tlds
+        self._suspicious = _suffix_hashes(suspicious_tlds)
+        self._suffixes = _suffix_hashes(public_suffixes)
+
+    def features(self, urls) -> LexicalFeatures:
+        urls = list(urls)
+        if not urls:
+            empty = self._features_chunk([''])
+            return LexicalFeatures(*(getattr(empty, name)[:0] for name in LexicalFeatures.__slots__))
+        parts = [self._features_chunk(urls[i:i + _CHUNK]) for i in range(0, len(urls), _CHUNK)]
+        return LexicalFeatures(*(np.concatenate([getattr(part, name) for part in parts])
+                                 for name in LexicalFeatures.__slots__))
+
+    def prescore(self, urls, weights: dict[str, int] | None = None) -> np.ndarray:
+        return self.features(urls).prescore(weights)
+
+    def triage(self, urls, threshold: int = PRESCORE_THRESHOLD) -> tuple[np.ndarray, np.ndarray]:
+        """``(prescores, risky)``: ``risky`` marks the URLs worth a full scan."""
+        scores = self.prescore(urls)
+        return scores, scores >= threshold
+
+    def _features_chunk(self, urls: list[str]) -> LexicalFeatures:
+        n = len(urls)
+        text = '\n'.join(urls)
+        if text.count('\n') != n - 1:
+            text = '\n'.join(url.replace('\n', ' ') for url in urls)
+        # Every URL is followed by a newline, so no URL owns an empty range
+        raw = np.frombuffer((text + '\n').encode('utf-8', 'replace'), dtype=np.uint8)
+        flat = _LOWER[raw]
+        ends = np.flatnonzero(flat == ord('\n'))
+        starts = np.empty(n, dtype=np.int64)
+        starts[:1] = 0
+        starts[1:] = ends[:-1] + 1
+        lengths = ends - starts
+        seg = np.repeat(np.arange(n), lengths + 1)
+
+        # Characters: digit/symbol ratios and entropy, from runs of equal (URL, byte) keys
+        keys = np.sort((seg << 8) | raw)
+        run_starts = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1])))
+        run_counts = np.diff(np.append(run_starts, len(keys)))
+        run_keys = keys[run_starts]
+        run_owner, run_byte = run_keys >> 8, (run_keys & 0xFF).astype(np.uint8)
+        real = run_byte != ord('\n')
+        run_owner, run_byte, run_counts = run_owner[real], run_byte[real], run_counts[real]
+        safe_lengths = np.maximum(lengths, 1)
+        digits = np.bincount(run_owner, weights=run_counts * _IS_DIGIT[run_byte], minlength=n)
+        symbols = np.bincount(run_owner, weights=run_counts * ~_IS_ALNUM[_LOWER[run_byte]], minlength=n)
+        # H = log2(L) - sum(c * log2(c)) / L
+        spread = np.bincount(run_owner, weights=_xlogx(int(run_counts.max(initial=0)))[run_counts], minlength=n)
+        entropy = np.maximum(np.log2(safe_lengths) - spread / safe_lengths, 0.0)
+
+        # Authority: after "scheme://" (or from the start), up to the first / ? #
+        slash_idx, slash_seg = _positions(flat == ord('/'), seg)
+        first_slash = _first(slash_idx, slash_seg, ends)
+        fs = np.minimum(first_slash, len(flat) - 2)
+        has_scheme = ((first_slash > starts) & (first_slash < ends)
+                      & (flat[np.maximum(fs - 1, 0)] == ord(':')) & (flat[fs + 1] == ord('/')))
+        host_start = np.where(has_scheme, first_slash + 2, starts)
+        auth_end = _first(*_within(*_positions(_IS_DELIMITER[flat], seg), host_start, ends), ends)
+        at_idx, at_seg = _within(*_positions(flat == ord('@'), seg), host_start, auth_end)
+        last_at = _last(at_idx, at_seg, host_start - 1)
+        at_sign = last_at >= host_start
+        host_start = last_at + 1
+
+        # Host: drop the port, keeping IPv6 literals whole
+        bracketed = (host_start < auth_end) & (flat[host_start] == ord('['))
+        close = _first(*_within(*_positions(flat == ord(']'), seg), host_start, auth_end), auth_end - 1) + 1
+        port = _last(*_within(*_positions(flat == ord(':'), seg), host_start, auth_end), auth_end)
+        host_end = np.where(bracketed, np.minimum(close, auth_end), port)
+        # A trailing dot (fully qualified name) is not a label
+        trailing_dot = (host_end > host_start) & (flat[np.maximum(host_end - 1, 0)] == ord('.'))
+        host_end = host_end - trailing_dot
+        host_length = host_end - host_start
+
+        # The host bytes of every URL, packed into one array
+        offsets = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(host_length, out=offsets[1:])
+        owner = np.repeat(np.arange(n), host_length)
+        rel = np.arange(offsets[-1]) - offsets[owner]
+        host_pos = host_start[owner] + rel
+        host = flat[host_pos]
+
+        ip_host = bracketed | ((host_length > 0) & (np.bincount(owner[~_IP_CHARS[host]], minlength=n) == 0))
+        dot = host == ord('.')
+        dot_idx = np.flatnonzero(dot)
+        dots = np.bincount(owner[dot_idx], minlength=n)
+        # "xn--" at the start of a label, or raw non-ASCII characters
+        label_starts = np.concatenate((offsets[:-1][host_length > 0], dot_idx + 1))
+        label_starts = label_starts[label_starts < len(host)]
+        candidates = label_starts[host[label_starts] == ord('x')]
+        candidates = candidates[candidates + 3 < offsets[1:][owner[candidates]]]
+        xn = candidates[(host[candidates + 1] == ord('n')) & (host[candidates + 2] == ord('-'))
+                        & (host[candidates + 3] == ord('-'))]
+        non_ascii = np.flatnonzero(host >= 0x80)
+        punycode = (np.bincount(owner[xn], minlength=n) + np.bincount(owner[non_ascii], minlength=n)) > 0
+
+        # Public suffix: hash the last one, two and three labels of the host
+        dot_rank = np.cumsum(dots)[owner[dot_idx]] - 1 - np.arange(len(dot_idx))  # 0 = last dot of its host
+        exponent = host_length[owner] - 1 - rel
+        powers = np.ones(int(host_length.max(initial=0)) + 1, dtype=np.uint64)
+        powers[1:] = _HASH_BASE
+        powers = np.cumprod(powers)  # wraps modulo 2**64, like _hash
+        running = np.zeros(len(host) + 1, dtype=np.uint64)
+        np.cumsum(host.astype(np.uint64) * powers[exponent], out=running[1:])
+        suffix_labels = np.ones(n, dtype=np.int64)
+        suffix_hash = np.zeros(n, dtype=np.uint64)
+        for k in (1, 2, 3):
+            # The k-th dot from the end starts the host's last k labels
+            begin = offsets[:-1].copy()
+            selected = dot_rank == k - 1
+            begin[owner[dot_idx[selected]]] = dot_idx[selected] + 1
+            hashes = running[offsets[1:]] - running[begin]
+            if k == 1:
+                suffix_hash = hashes
+                continue
+            known = (dots >= k) & np.isin(hashes, self._suffixes)
+            suffix_labels = np.where(known, k, suffix_labels)
+            suffix_hash = np.where(known, hashes, suffix_hash)
+
+        labels = np.where(host_length > 0, dots + 1, 0)
+        subdomain_depth = np.where(ip_host, 0, np.maximum(labels - suffix_labels - 1, 0))
+        suspicious_tld = ~ip_host & np.isin(suffix_hash, self._suspicious)
+
+        # "//" anywhere after the authority
+        pairs = np.flatnonzero((flat[:-1] == ord('/')) & (flat[1:] == ord('/')))
+        _, pair_seg = _within(pairs, seg[pairs], auth_end, ends)
+        double_slash = np.bincount(pair_seg, minlength=n) > 0
+
+        return LexicalFeatures(
+            length=lengths,
+            digit_ratio=digits / safe_lengths,
+            symbol_ratio=symbols / safe_lengths,
+            entropy=entropy,
+            subdomain_depth=subdomain_depth,
+            ip_host=ip_host,
+            punycode=punycode,
+            suspicious_tld=suspicious_tld,
+            at_sign=at_sign,
+            double_slash=double_slash,
+        )
+
+
+_scorer: LexicalScorer | None = None
+
+
+def scorer() -> LexicalScorer:
+    """Shared scorer over the default suspicious-TLD list, built on first use."""
+    global _scorer
+    if _scorer is None:
+        _scorer = LexicalScorer()
+    return _scorer
+
+
+def features(urls) -> LexicalFeatures:
+    return scorer().features(urls)
+
+
+def prescore(urls) -> np.ndarray:
+    return scorer().prescore(urls)
+
+
+def triage(urls, threshold: int = PRESCORE_THRESHOLD) -> tuple[np.ndarray, np.ndarray]:
+    return scorer().triage(urls, threshold)
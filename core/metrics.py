@@ -0,0 +1,180 @@
+"""
+Minimal Prometheus-style metrics.
+
+Counters and histograms are updated in-process and rendered in the
+Prometheus text exposition format by ``registry.render()`` (served on
+``/metrics``). Values owned by other components (queue depth, cache hits,
+...) are exported through collector callbacks evaluated at scrape time.
+
+Metrics are per process; with several server workers each one must be
+scraped (or the server run with a single worker).
+"""
+import bisect
+import math
+import threading
+from typing import Callable, Iterable
+
+# Seconds; covers fast offline verdicts up to full scans hitting the timeout
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _format_labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Counter:
+    """Monotonically increasing count, optionally split by labels."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labels: Iterable[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._values: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = tuple(str(labels[name]) for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            yield self.name, _format_labels(self.labels, key), value
+
+
+class Histogram:
+    """Bucketed distribution of observed values (e.g. latencies in seconds)."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels: Iterable[str] = (),
+                 buckets: tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [bucket counts..., +Inf count], sum
+        self._series: dict[tuple, tuple[list[int], list[float]]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels[name]) for name in self.labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = ([0] * (len(self.buckets) + 1), [0.0])
+            series[0][index] += 1
+            series[1][0] += value
+
+    def samples(self):
+        with self._lock:
+            items = sorted((key, (list(counts), total[0])) for key, (counts, total) in self._series.items())
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                yield (self.name + "_bucket",
+                       _format_labels(self.labels, key, f'le="{_format_value(bound)}"'), cumulative)
+            yield self.name + "_sum", _format_labels(self.labels, key), total
+            yield self.name + "_count", _format_labels(self.labels, key), cumulative
+
+
+class CallbackMetric:
+    """
+    A gauge or counter whose values are read from another component at
+    scrape time. ``fn`` returns a number or a dict of label value -> number.
+    """
+
+    def __init__(self, name: str, help_text: str, kind: str, fn: Callable, label: str | None = None):
+        self.name = name
+        self.help = help_text
+        self.kind = kind
+        self.fn = fn
+        self.label = label
+
+    def samples(self):
+        value = self.fn()
+        if isinstance(value, dict):
+            for label_value, number in sorted(value.items()):
+                yield self.name, _format_labels((self.label,), (label_value,)), number
+        elif value is not None:
+            yield self.name, "", value
+
+
+class Registry:
+    """The set of metrics exported on ``/metrics``."""
+
+    def __init__(self):
+        self._metrics: dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help_text: str, labels: Iterable[str] = ()) -> Counter:
+        return self.register(Counter(name, help_text, labels))
+
+    def histogram(self, name: str, help_text: str, labels: Iterable[str] = (),
+                  buckets: tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help_text, labels, buckets))
+
+    def gauge_callback(self, name: str, help_text: str, fn: Callable, label: str | None = None):
+        return self.register(CallbackMetric(name, help_text, "gauge", fn, label))
+
+    def counter_callback(self, name: str, help_text: str, fn: Callable, label: str | None = None):
+        return self.register(CallbackMetric(name, help_text, "counter", fn, label))
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            try:
+                samples = list(metric.samples())
+            except Exception as e:
+                print(f"Warning: collecting metric {metric.name} failed: {e}")
+                continue
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in samples:
+                lines.append(f"{name}{labels} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+SCAN_DURATION = registry.histogram(
+    "netra_scan_duration_seconds", "Wall time of scans that ran (cache misses), by verdict.", ["verdict"])
+SCAN_STAGE_DURATION = registry.histogram(
+    "netra_scan_stage_duration_seconds", "Time spent in each scan stage or sub-step.", ["stage"])
+HOP_PHASE_DURATION = registry.histogram(
+    "netra_hop_phase_duration_seconds", "Per-hop network phases (dns, connect, tls, ttfb).", ["phase"])
+RULE_DURATION = registry.histogram(
+    "netra_rule_duration_seconds", "Time spent evaluating each scoring rule.", ["rule"],
+    buckets=(0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05))
+QUEUE_WAIT = registry.histogram(
+    "netra_queue_wait_seconds", "Time web scans waited for a worker.")
+SCANS = registry.counter(
+    "netra_scans_total", "Scan results returned, by verdict and whether they came from the cache.",
+    ["verdict", "cached"])
@@ -1,15 +1,25 @@
+"""
+Scan result models.
+
+All models use ``__slots__`` to keep per-result memory small (the verdict
+cache holds many of them). ``TraceHop`` and ``Verdict`` are frozen;
+``TraceResult`` is filled in step by step while a scan runs and is not
+modified once the scan has returned it. ``core.serialization`` encodes them.
+"""
 from dataclasses import dataclass, field
 from typing import Literal
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class TraceHop:
     """Represents a single hop in a redirect chain."""
     url: str
     status_code: int | None
     reason: str | None
     elapsed_ms: int
+    # Network phases of this hop in ms (dns, connect, tls, ttfb); absent when a pooled connection was reused
+    timings: dict[str, float] = field(default_factory=dict)
 
-@dataclass
+@dataclass(slots=True)
 class TraceResult:
     """Contains the full trace result of a URL scan."""
     input_url: str
@@ -18,11 +28,16 @@ class TraceResult:
     js_or_meta_followed: bool = False
     content_type: str | None = None
     has_login_form: bool = False
+    body_truncated: bool = False
     errors: list[str] = field(default_factory=list)
+    from_cache: bool = False
+    short_circuited: bool = False  # network stages skipped because offline checks were conclusive
+    page_fingerprint: str | None = None  # SimHash of the final page (hex), see core.kit_index
+    timings: dict[str, float] = field(default_factory=dict)  # ms per scan stage and sub-step
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class Verdict:
     """Represents the final verdict of a URL scan."""
     label: Literal["SAFE", "SUSPICIOUS", "UNSAFE", "UNKNOWN"]
     score: int
-    reasons: list[str] = field(default_factory=list)
+    reasons: tuple[str, ...] = ()
@@ -0,0 +1,33 @@
+"""
+Public suffix lookups that never touch the network.
+
+``tldextract.extract`` uses a default extractor that downloads the public
+suffix list on first use and caches it on disk, which stalls (or fails
+after a timeout) in egress-restricted deployments. ``extract`` here reads
+the snapshot bundled with tldextract, or a pinned copy of the list named by
+PSL_SNAPSHOT, and keeps nothing on disk.
+"""
+import os
+from pathlib import Path
+
+import tldextract
+
+
+def build_extractor(snapshot: str | None = None) -> tldextract.TLDExtract:
+    """An offline extractor over ``snapshot`` (a public_suffix_list.dat) or the bundled list."""
+    urls: tuple[str, ...] = ()
+    if snapshot:
+        path = Path(snapshot)
+        if path.is_file():
+            urls = (path.resolve().as_uri(),)
+        else:
+            print(f"Warning: PSL snapshot not found at '{snapshot}', using the list bundled with tldextract")
+    return tldextract.TLDExtract(suffix_list_urls=urls, cache_dir=None, fallback_to_snapshot=True)
+
+
+extract = build_extractor(os.getenv('PSL_SNAPSHOT'))
+
+
+def load():
+    """Parse the suffix list now instead of on the first lookup."""
+    extract('example.com')
@@ -0,0 +1,222 @@
+"""
+Caching, SSRF-safe DNS resolution for outbound scan requests.
+
+``PinnedNetworkBackend`` plugs into the shared httpx transport: every new
+connection — including those opened for redirect targets — resolves its
+host through ``Resolver``, refuses hosts that resolve to a private address
+and connects to the exact address that was checked, so a second lookup
+cannot point the connection somewhere else (DNS rebinding). TLS still
+verifies the certificate against the original host name.
+
+Answers are cached per host for ``ttl`` seconds and failures for
+``negative_ttl`` seconds; concurrent lookups of the same host share one
+query.
+"""
+import asyncio
+import contextvars
+import ipaddress
+import os
+import socket
+import time
+from collections import OrderedDict
+from typing import Iterable
+
+import httpcore
+import httpx
+
+from core.security import PRIVATE_IP_RANGES
+
+# Set by the caller around a request to receive the DNS time of a new connection (ms)
+hop_timings: contextvars.ContextVar[dict | None] = contextvars.ContextVar('hop_timings', default=None)
+
+
+class BlockedAddressError(httpcore.ConnectError):
+    """A host resolved to an address scans are not allowed to reach."""
+
+    def __init__(self, host: str, address: str):
+        super().__init__(f"{host} resolves to non-public address {address}")
+        self.host = host
+        self.address = address
+
+
+def is_private_address(address: str) -> bool:
+    """True for loopback, private, link-local and other non-routable addresses."""
+    ip = ipaddress.ip_address(address.split('%', 1)[0])
+    if ip.version == 6 and ip.ipv4_mapped is not None:
+        ip = ip.ipv4_mapped
+    return (ip.is_unspecified or ip.is_multicast or ip.is_reserved
+            or any(ip in network for network in PRIVATE_IP_RANGES))
+
+
+def blocked_address(error: BaseException) -> BlockedAddressError | None:
+    """The ``BlockedAddressError`` behind an httpx error, if that is what caused it."""
+    while error is not None:
+        if isinstance(error, BlockedAddressError):
+            return error
+        error = error.__cause__ or error.__context__
+    return None
+
+
+class Resolver:
+    """Caches A/AAAA lookups and enforces the private-address policy."""
+
+    def __init__(self, ttl: float = 60.0, negative_ttl: float = 10.0, max_entries: int = 10000,
+                 allow_private: bool = False):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.allow_private = allow_private
+        # host -> (expires_at, addresses or the lookup error)
+        self._cache: OrderedDict[str, tuple[float, list[str] | OSError]] = OrderedDict()
+        self._pending: dict[str, asyncio.Future] = {}
+        self.lookups = 0
+        self.hits = 0
+        self.blocked = 0
+
+    @classmethod
+    def from_env(cls) -> "Resolver":
+        """Build a resolver from the DNS_* and SCAN_ALLOW_PRIVATE_NETWORKS variables."""
+        return cls(
+            ttl=float(os.getenv('DNS_CACHE_TTL', '60')),
+            negative_ttl=float(os.getenv('DNS_NEGATIVE_TTL', '10')),
+            max_entries=int(os.getenv('DNS_CACHE_SIZE', '10000')),
+            allow_private=os.getenv('SCAN_ALLOW_PRIVATE_NETWORKS', 'false').lower() in ('1', 'true', 'yes'),
+        )
+
+    async def resolve(self, host: str) -> list[str]:
+        """Addresses of a host, from the cache when fresh."""
+        host = host.lower().rstrip('.')
+        try:
+            ipaddress.ip_address(host)
+            return [host]
+        except ValueError:
+            pass
+
+        entry = self._cache.get(host)
+        if entry is not None:
+            if entry[0] > time.monotonic():
+                self._cache.move_to_end(host)
+                self.hits += 1
+                if isinstance(entry[1], OSError):
+                    raise entry[1]
+                return entry[1]
+            del self._cache[host]
+
+        pending = self._pending.get(host)
+        if pending is None:
+            pending = asyncio.ensure_future(self._lookup(host))
+            self._pending[host] = pending
+            pending.add_done_callback(lambda _: self._pending.pop(host, None))
+        else:
+            self.hits += 1
+        return await asyncio.shield(pending)
+
+    async def _lookup(self, host: str) -> list[str]:
+        self.lookups += 1
+        loop = asyncio.get_running_loop()
+        try:
+            infos = await loop.getaddrinfo(host, None, type=socket.SOCK_STREAM)
+        except OSError as e:
+            self._store(host, e, self.negative_ttl)
+            raise
+        # Keep the resolver's order (it already prefers the better family), minus duplicates
+        addresses = list(dict.fromkeys(info[4][0] for info in infos))
+        self._store(host, addresses, self.ttl)
+        return addresses
+
+    def _store(self, host: str, value, ttl: float):
+        if ttl <= 0 or self.max_entries <= 0:
+            return
+        self._cache[host] = (time.monotonic() + ttl, value)
+        self._cache.move_to_end(host)
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+
+    async def resolve_allowed(self, host: str) -> list[str]:
+        """
+        Resolve a host and check every answer against the address policy.
+
+        One private answer blocks the host: an attacker controlling the
+        zone could otherwise mix an internal address into the answers.
+        """
+        addresses = await self.resolve(host)
+        if not self.allow_private:
+            for address in addresses:
+                if is_private_address(address):
+                    self.blocked += 1
+                    raise BlockedAddressError(host, address)
+        return addresses
+
+    def clear(self):
+        """Forget cached answers and pending lookups (e.g. in a forked worker)."""
+        self._cache.clear()
+        self._pending.clear()
+
+    def stats(self) -> dict:
+        return {
+            'cached_hosts': len(self._cache),
+            'lookups': self.lookups,
+            'cache_hits': self.hits,
+            'blocked': self.blocked,
+            'allow_private': self.allow_private,
+        }
+
+
+class PinnedNetworkBackend(httpcore.AsyncNetworkBackend):
+    """httpcore backend that connects to resolver-checked addresses only."""
+
+    def __init__(self, resolver: Resolver, backend: httpcore.AsyncNetworkBackend | None = None):
+        self.resolver = resolver
+        self._backend = backend or httpcore.AnyIOBackend()
+
+    async def connect_tcp(self, host: str, port: int, timeout: float | None = None,
+                          local_address: str | None = None,
+                          socket_options: Iterable | None = None) -> httpcore.AsyncNetworkStream:
+        started = time.monotonic()
+        deadline = started + timeout if timeout is not None else None
+        try:
+            addresses = await asyncio.wait_for(self.resolver.resolve_allowed(host), timeout)
+        except asyncio.TimeoutError:
+            raise httpcore.ConnectTimeout(f"DNS lookup of {host} timed out") from None
+        except BlockedAddressError:
+            raise
+        except OSError as e:
+            raise httpcore.ConnectError(str(e)) from e
+        timings = hop_timings.get()
+        if timings is not None:
+            timings['dns'] = round((time.monotonic() - started) * 1000, 2)
+
+        last_error: Exception | None = None
+        for address in addresses:
+            remaining = max(0.0, deadline - time.monotonic()) if deadline is not None else None
+            try:
+                return await self._backend.connect_tcp(address, port, timeout=remaining,
+                                                       local_address=local_address,
+                                                       socket_options=socket_options)
+            except (httpcore.ConnectError, httpcore.ConnectTimeout) as e:
+                last_error = e
+        raise last_error
+
+    async def connect_unix_socket(self, path: str, timeout: float | None = None,
+                                  socket_options: Iterable | None = None) -> httpcore.AsyncNetworkStream:
+        return await self._backend.connect_unix_socket(path, timeout=timeout, socket_options=socket_options)
+
+    async def sleep(self, seconds: float):
+        await self._backend.sleep(seconds)
+
+
+class ResolvingTransport(httpx.AsyncHTTPTransport):
+    """``AsyncHTTPTransport`` whose connection pool resolves through a ``Resolver``."""
+
+    def __init__(self, resolver: Resolver, limits: httpx.Limits, http2: bool = False, **kwargs):
+        super().__init__(limits=limits, http2=http2, **kwargs)
+        # httpx does not take a network backend, so rebuild its pool with ours
+        self._pool = httpcore.AsyncConnectionPool(
+            ssl_context=self._pool._ssl_context,
+            max_connections=limits.max_connections,
+            max_keepalive_connections=limits.max_keepalive_connections,
+            keepalive_expiry=limits.keepalive_expiry,
+            http1=True,
+            http2=http2,
+            network_backend=PinnedNetworkBackend(resolver),
+        )
@@ -0,0 +1,491 @@
+"""
+Declarative, hot-reloadable scoring rules.
+
+Rules, weights, verdict thresholds and resource lists are read from a JSON
+file (``resources/rules.json`` by default) and compiled once into a
+``RuleSet``: each rule becomes a precompiled predicate bound to its
+parameters, grouped by the scan stage it runs in. A scan takes the current
+``RuleSet`` when it starts and uses it to the end, while a watcher thread
+compiles a fresh one whenever the file (or a list it references) changes
+and swaps it in with a single assignment.
+
+Each rule names a ``check`` from ``CHECKS``. A check is a factory that
+receives the rule's ``params`` and returns a predicate over a
+``ScanContext``; the predicate returns None when the rule does not fire, or
+a dict of values for the rule's ``reason`` template when it does.
+"""
+import json
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from functools import cached_property
+from typing import Any, Callable
+
+from core import kit_index, psl, rules
+from core.brands import BrandMatcher
+from core.domain_index import host_from_url
+from core.html_analyzer import PageAnalysis
+from core.kit_index import KitIndex
+from core.metrics import RULE_DURATION
+from core.models import TraceResult
+from core.security import SUSPICIOUS_PATTERNS
+
+STAGES = ("input", "redirects", "page", "denylist", "error")
+
+Predicate = Callable[["ScanContext"], dict | None]
+
+
+@dataclass
+class ScanContext:
+    """Everything a rule may look at during one scan."""
+    url: str
+    trace_result: TraceResult
+    input_domain: Any = None
+    response_headers: dict = field(default_factory=dict)
+    page: PageAnalysis | None = None
+    redirects_exceeded: bool = False
+    error: str | None = None
+    blocked_host: str | None = None  # host refused because it resolves to a private address
+    deadline_s: float | None = None  # the scan's time budget, set once it ran out
+    unavailable_host: str | None = None  # host skipped because its circuit breaker is open
+
+    @cached_property
+    def final_domain(self):
+        return psl.extract(self.trace_result.final_url) if self.trace_result.final_url else None
+
+    def visited_urls(self) -> list[str]:
+        """Every URL seen during the scan, final URL last."""
+        urls = list(dict.fromkeys(hop.url for hop in self.trace_result.hops))
+        if self.trace_result.final_url and self.trace_result.final_url not in urls:
+            urls.append(self.trace_result.final_url)
+        return urls or [self.url]
+
+
+@dataclass
+class ScoreCard:
+    """Running score, reasons and fired rule ids of a scan, plus time spent in rules."""
+    score: int = 0
+    reasons: list[str] = field(default_factory=list)
+    matched: list[str] = field(default_factory=list)
+    elapsed_s: float = 0.0
+
+    def add(self, weight: int, reason: str, rule_id: str | None = None):
+        self.score += weight
+        self.reasons.append(reason)
+        if rule_id is not None:
+            self.matched.append(rule_id)
+
+
+class _ReasonValues(dict):
+    """Leaves placeholders the check did not provide in the reason as-is."""
+
+    def __missing__(self, key):
+        return "{" + key + "}"
+
+
+@dataclass(frozen=True)
+class CompiledRule:
+    id: str
+    stage: str
+    weight: int
+    reason: str
+    predicate: Predicate
+
+
+class RuleSet:
+    """A compiled evaluation plan plus the settings that came with it."""
+
+    def __init__(self, config: dict, source: str | None = None):
+        self.source = source
+        self.version = config.get("version")
+        # Set by the engine; changes whenever a new ruleset is swapped in
+        self.generation = 0
+        thresholds = config.get("thresholds", {})
+        self.unsafe_threshold = int(thresholds.get("unsafe", 60))
+        self.suspicious_threshold = int(thresholds.get("suspicious", 30))
+        self.redirect_limit = int(config.get("redirect_limit", rules.REDIRECT_LIMIT))
+        self.brand_similarity_threshold = float(config.get("brand_similarity_threshold",
+                                                           rules.BRAND_SIMILARITY_THRESHOLD))
+        resources = config.get("resources", {})
+        # Files the compiled plan was built from, watched for changes
+        self.files: set[str] = set()
+        self.sensitive_input_keywords = frozenset(
+            k.lower() for k in resources.get("sensitive_input_keywords", rules.SENSITIVE_INPUT_KEYWORDS))
+        self._resource_paths = {
+            "suspicious_tlds": resources.get("suspicious_tlds", "resources/suspicious_tlds.txt"),
+            "brands": resources.get("brands", "resources/brands.txt"),
+            "phishing_kits": resources.get("phishing_kits", "resources/phishing_kits.txt"),
+        }
+        # Denylist feeds; registered by the engine once the whole ruleset compiled
+        self.denylist_feeds = tuple(resources.get("denylist", ()))
+
+        plan: dict[str, list[CompiledRule]] = {stage: [] for stage in STAGES}
+        for spec in config.get("rules", ()):
+            if not spec.get("enabled", True):
+                continue
+            rule = self._compile(spec)
+            plan[rule.stage].append(rule)
+        self.plan = {stage: tuple(compiled) for stage, compiled in plan.items()}
+
+    def _compile(self, spec: dict) -> CompiledRule:
+        rule_id = spec.get("id") or spec.get("check")
+        check = spec.get("check")
+        if check not in CHECKS:
+            raise ValueError(f"Rule '{rule_id}': unknown check '{check}'")
+        stage = spec.get("stage", CHECK_STAGES[check])
+        if stage not in STAGES:
+            raise ValueError(f"Rule '{rule_id}': unknown stage '{stage}'")
+        reason = spec.get("reason", rule_id)
+        predicate = CHECKS[check](spec.get("params", {}), self)
+        return CompiledRule(id=rule_id, stage=stage, weight=int(spec.get("weight", 0)),
+                            reason=reason, predicate=predicate)
+
+    def resource_list(self, name_or_path: str, description: str) -> list[str]:
+        """Read a list file named in ``resources`` (or given by path) and watch it."""
+        path = self._resource_paths.get(name_or_path, name_or_path)
+        self.files.add(path)
+        return rules.read_list(path, description)
+
+    def evaluate(self, stage: str, ctx: ScanContext, card: ScoreCard) -> ScoreCard:
+        """
+        Run the rules of one stage, adding every rule that fires to the score
+        card. A rule counts at most once per scan, so a stage may be
+        evaluated again as more evidence comes in.
+        """
+        for rule in self.plan[stage]:
+            if rule.id in card.matched:
+                continue
+            started = time.perf_counter()
+            values = rule.predicate(ctx)
+            elapsed = time.perf_counter() - started
+            card.elapsed_s += elapsed
+            RULE_DURATION.observe(elapsed, rule=rule.id)
+            if values is not None:
+                card.add(rule.weight, rule.reason.format_map(_ReasonValues(values)), rule.id)
+        return card
+
+    def label_for(self, score: int, has_errors: bool) -> str:
+        if score >= self.unsafe_threshold:
+            return "UNSAFE"
+        if score >= self.suspicious_threshold:
+            return "SUSPICIOUS"
+        return "UNKNOWN" if has_errors else "SAFE"
+
+    def describe(self) -> dict:
+        return {
+            'source': self.source,
+            'version': self.version,
+            'thresholds': {'unsafe': self.unsafe_threshold, 'suspicious': self.suspicious_threshold},
+            'rules': {stage: [rule.id for rule in compiled] for stage, compiled in self.plan.items()},
+        }
+
+
+# --- Checks -----------------------------------------------------------------
+
+def _suffix_in_list(params: dict, ruleset: RuleSet) -> Predicate:
+    suffixes = frozenset(s.lower().lstrip(".") for s in params.get("values") or
+                         ruleset.resource_list(params.get("list", "suspicious_tlds"), "Suspicious TLDs"))
+
+    def predicate(ctx):
+        suffix = ctx.input_domain.suffix if ctx.input_domain else ""
+        return {"suffix": suffix} if suffix in suffixes else None
+    return predicate
+
+
+def _brand_lookalike(params: dict, ruleset: RuleSet) -> Predicate:
+    brands = params.get("values") or [rules.brand_label(entry) for entry in
+                                      ruleset.resource_list(params.get("list", "brands"), "Brand list")]
+    matcher = BrandMatcher(brands, float(params.get("threshold", ruleset.brand_similarity_threshold)))
+
+    def predicate(ctx):
+        if not ctx.input_domain or not ctx.input_domain.domain:
+            return None
+        lookalike = matcher.match(ctx.input_domain.domain)
+        return {"brand": lookalike[0], "similarity": round(lookalike[1])} if lookalike else None
+    return predicate
+
+
+def _url_pattern(params: dict, ruleset: RuleSet) -> Predicate:
+    pattern = re.compile(params["pattern"], re.IGNORECASE)
+    target = params.get("target", "input")
+
+    def predicate(ctx):
+        url = ctx.url if target == "input" else ctx.trace_result.final_url
+        match = pattern.search(url) if url else None
+        return {"match": match.group(0)} if match else None
+    return predicate
+
+
+def _redirect_limit_exceeded(params: dict, ruleset: RuleSet) -> Predicate:
+    return lambda ctx: {"limit": ruleset.redirect_limit} if ctx.redirects_exceeded else None
+
+
+def _html_redirect(params: dict, ruleset: RuleSet) -> Predicate:
+    def predicate(ctx):
+        if ctx.trace_result.js_or_meta_followed:
+            return {"url": ctx.trace_result.final_url, "kind": ctx.page.redirect_kind if ctx.page else None}
+        return None
+    return predicate
+
+
+def _domain_mismatch(params: dict, ruleset: RuleSet) -> Predicate:
+    def predicate(ctx):
+        final = ctx.final_domain
+        if final is None or ctx.input_domain is None:
+            return None
+        if ctx.input_domain.domain != final.domain:
+            return {"domain": final.registered_domain or final.domain}
+        return None
+    return predicate
+
+
+def _file_download(params: dict, ruleset: RuleSet) -> Predicate:
+    content_types = tuple(params.get("content_types", ["application/octet-stream"]))
+    attachments = params.get("attachment", True)
+
+    def predicate(ctx):
+        content_type = ctx.trace_result.content_type
+        if not content_type:
+            return None
+        if any(t in content_type for t in content_types) or \
+           (attachments and ctx.response_headers.get('content-disposition', '').startswith('attachment')):
+            return {"content_type": content_type}
+        return None
+    return predicate
+
+
+def _sensitive_form(params: dict, ruleset: RuleSet) -> Predicate:
+    return lambda ctx: {} if ctx.page is not None and ctx.page.has_sensitive_form else None
+
+
+def _page_pattern(params: dict, ruleset: RuleSet) -> Predicate:
+    names = params.get("patterns") or list(SUSPICIOUS_PATTERNS)
+    unknown = [name for name in names if name not in SUSPICIOUS_PATTERNS]
+    if unknown:
+        raise ValueError(f"page_pattern: unknown patterns {unknown}")
+    min_hits = int(params.get("min_hits", 1))
+
+    def predicate(ctx):
+        hits = ctx.page.suspicious_patterns if ctx.page else None
+        if not hits:
+            return None
+        found = [name for name in names if hits.get(name, 0) >= min_hits]
+        if not found:
+            return None
+        return {"pattern": ", ".join(found), "hits": sum(hits[name] for name in found)}
+    return predicate
+
+
+def _phishing_kit(params: dict, ruleset: RuleSet) -> Predicate:
+    index = KitIndex.from_lines(ruleset.resource_list(params.get("list", "phishing_kits"), "Phishing kit list"),
+                                int(params.get("max_distance", kit_index.MAX_DISTANCE)))
+
+    def predicate(ctx):
+        match = index.match(ctx.page.fingerprint) if ctx.page else None
+        return {"kit": match[0], "distance": match[1]} if match else None
+    return predicate
+
+
+def _denylist_hit(params: dict, ruleset: RuleSet) -> Predicate:
+    def predicate(ctx):
+        for url in ctx.visited_urls():
+            host = host_from_url(url)
+            listed = rules.DENYLIST.match(host) if host else None
+            if listed:
+                return {"domain": listed, "host": host}
+        return None
+    return predicate
+
+
+def _network_error(params: dict, ruleset: RuleSet) -> Predicate:
+    return lambda ctx: {"error": ctx.error} if ctx.error else None
+
+
+def _private_address(params: dict, ruleset: RuleSet) -> Predicate:
+    return lambda ctx: {"host": ctx.blocked_host} if ctx.blocked_host else None
+
+
+def _deadline_exceeded(params: dict, ruleset: RuleSet) -> Predicate:
+    return lambda ctx: {"deadline": f"{ctx.deadline_s:g}"} if ctx.deadline_s is not None else None
+
+
+def _host_unavailable(params: dict, ruleset: RuleSet) -> Predicate:
+    return lambda ctx: {"host": ctx.unavailable_host} if ctx.unavailable_host else None
+
+
+CHECKS: dict[str, Callable[[dict, RuleSet], Predicate]] = {
+    "suffix_in_list": _suffix_in_list,
+    "brand_lookalike": _brand_lookalike,
+    "url_pattern": _url_pattern,
+    "redirect_limit_exceeded": _redirect_limit_exceeded,
+    "html_redirect": _html_redirect,
+    "domain_mismatch": _domain_mismatch,
+    "file_download": _file_download,
+    "sensitive_form": _sensitive_form,
+    "page_pattern": _page_pattern,
+    "phishing_kit": _phishing_kit,
+    "denylist_hit": _denylist_hit,
+    "network_error": _network_error,
+    "private_address": _private_address,
+    "deadline_exceeded": _deadline_exceeded,
+    "host_unavailable": _host_unavailable,
+}
+
+# Stage a check runs in when the rule does not say
+CHECK_STAGES = {
+    "suffix_in_list": "input",
+    "brand_lookalike": "input",
+    "url_pattern": "input",
+    "redirect_limit_exceeded": "redirects",
+    "html_redirect": "page",
+    "domain_mismatch": "page",
+    "file_download": "page",
+    "sensitive_form": "page",
+    "page_pattern": "page",
+    "phishing_kit": "page",
+    "denylist_hit": "denylist",
+    "network_error": "error",
+    "private_address": "error",
+    "deadline_exceeded": "error",
+    "host_unavailable": "error",
+}
+
+# Used when no rules file exists; mirrors the weights in core.rules
+DEFAULT_CONFIG = {
+    "thresholds": {"unsafe": 60, "suspicious": 30},
+    "rules": [
+        {"id": "suspicious_tld", "check": "suffix_in_list", "weight": rules.SCORE_SUSPICIOUS_TLD,
+         "reason": "Suspicious TLD (.{suffix})"},
+        {"id": "brand_lookalike", "check": "brand_lookalike", "weight": rules.SCORE_BRAND_LOOKALIKE,
+         "reason": "Potential brand impersonation (looks like '{brand}')"},
+        {"id": "too_many_redirects", "check": "redirect_limit_exceeded", "weight": rules.SCORE_TOO_MANY_REDIRECTS,
+         "reason": "Exceeded redirect limit"},
+        {"id": "html_redirect", "check": "html_redirect", "weight": 0, "reason": "Followed HTML/JS redirect"},
+        {"id": "domain_mismatch", "check": "domain_mismatch", "weight": rules.SCORE_DOMAIN_MISMATCH,
+         "reason": "Redirected to a different domain"},
+        {"id": "binary_download", "check": "file_download", "weight": rules.SCORE_BINARY_DOWNLOAD,
+         "reason": "Leads to a file download"},
+        {"id": "sensitive_form", "check": "sensitive_form", "weight": rules.SCORE_SENSITIVE_FORM,
+         "reason": "Page contains a sensitive data form (password, etc.)"},
+        {"id": "page_script_payload", "check": "page_pattern", "weight": rules.SCORE_PAGE_SCRIPT_PAYLOAD,
+         "params": {"patterns": ["vbscript_uri", "obfuscated_js"]},
+         "reason": "Page contains obfuscated or legacy script ({pattern})"},
+        {"id": "phishing_kit", "check": "phishing_kit", "weight": rules.SCORE_PHISHING_KIT,
+         "reason": "Page matches known phishing kit '{kit}'"},
+        {"id": "denylist_hit", "check": "denylist_hit", "weight": rules.SCORE_DENYLIST_HIT,
+         "reason": "Domain found in local denylist"},
+        {"id": "network_error", "check": "network_error", "weight": rules.SCORE_NETWORK_ERROR,
+         "reason": "Network error during scan"},
+        {"id": "private_address", "check": "private_address", "weight": rules.SCORE_PRIVATE_ADDRESS,
+         "reason": "Leads to a private network address ({host})"},
+        {"id": "deadline_exceeded", "check": "deadline_exceeded", "weight": rules.SCORE_DEADLINE_EXCEEDED,
+         "reason": "Scan deadline exceeded ({deadline}s); results are partial"},
+        {"id": "host_unavailable", "check": "host_unavailable", "weight": rules.SCORE_HOST_UNAVAILABLE,
+         "reason": "Host {host} is unresponsive; request skipped"},
+    ],
+}
+
+
+class RuleEngine:
+    """
+    Holds the current ``RuleSet`` and recompiles it when its files change.
+
+    A config that fails to load or compile is reported and the previous
+    ruleset stays in service.
+    """
+
+    def __init__(self, path: str, reload_interval: float = 5.0):
+        self.path = path
+        self.reload_interval = reload_interval
+        self._ruleset: RuleSet | None = None
+        self._mtimes: dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._watch_pid: int | None = None
+        self.reloads = 0
+        self.last_error: str | None = None
+
+    @classmethod
+    def from_env(cls) -> "RuleEngine":
+        """Build from RULES_PATH and RULES_RELOAD_INTERVAL."""
+        return cls(path=os.getenv('RULES_PATH', 'resources/rules.json'),
+                   reload_interval=float(os.getenv('RULES_RELOAD_INTERVAL', '5')))
+
+    def _mtimes_of(self, paths) -> dict[str, float]:
+        mtimes = {}
+        for path in paths:
+            try:
+                mtimes[path] = os.stat(path).st_mtime
+            except OSError:
+                mtimes[path] = 0.0
+        return mtimes
+
+    def reload(self) -> RuleSet:
+        """Compile the config file and swap the new ruleset in."""
+        with self._lock:
+            try:
+                try:
+                    with open(self.path, "r", encoding="utf-8") as f:
+                        ruleset = RuleSet(json.load(f), self.path)
+                except FileNotFoundError:
+                    ruleset = RuleSet(DEFAULT_CONFIG)
+            except Exception as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+                if self._ruleset is not None:
+                    # Do not retry until the file changes again
+                    self._mtimes = self._mtimes_of([self.path, *self._ruleset.files])
+                    print(f"Warning: Could not compile rules from '{self.path}', keeping the previous rules: {e}")
+                    return self._ruleset
+                print(f"Warning: Could not compile rules from '{self.path}', using the built-in rules: {e}")
+                ruleset = RuleSet(DEFAULT_CONFIG)
+            rules.DENYLIST.set_ruleset_sources(ruleset.denylist_feeds)
+            self._mtimes = self._mtimes_of([self.path, *ruleset.files])
+            self.reloads += 1
+            ruleset.generation = self.reloads
+            self._ruleset = ruleset
+            self.last_error = None
+            return ruleset
+
+    def load(self) -> RuleSet:
+        """Compile the ruleset if none is loaded yet, without starting the watcher."""
+        ruleset = self._ruleset
+        if ruleset is None:
+            ruleset = self.reload()
+        return ruleset
+
+    def current(self) -> RuleSet:
+        """The ruleset new scans should use."""
+        ruleset = self.load()
+        if self.reload_interval > 0 and self._watch_pid != os.getpid():
+            self._start_watcher()
+        return ruleset
+
+    def _start_watcher(self):
+        with self._lock:
+            if self._watch_pid == os.getpid():
+                return
+            self._watch_pid = os.getpid()
+        threading.Thread(target=self._watch_loop, name="rules-reload", daemon=True).start()
+
+    def _watch_loop(self):
+        while True:
+            time.sleep(self.reload_interval)
+            try:
+                if self._mtimes_of(self._mtimes) != self._mtimes:
+                    self.reload()
+            except Exception as e:
+                print(f"Warning: reloading rules failed: {e}")
+
+    def stats(self) -> dict:
+        ruleset = self.current()
+        return {
+            'path': self.path,
+            'reloads': self.reloads,
+            'last_error': self.last_error,
+            **ruleset.describe(),
+        }
+
+
+# Shared by every scan in this process
+rule_engine = RuleEngine.from_env()
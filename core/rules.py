@@ -1,3 +1,5 @@
+from core.domain_index import ReloadingDomainIndex, host_from_url
+
 # Scoring weights
 SCORE_SUSPICIOUS_TLD = 15
 SCORE_TOO_MANY_REDIRECTS = 15
@@ -7,6 +9,11 @@ SCORE_SENSITIVE_FORM = 30
 SCORE_BINARY_DOWNLOAD = 20
 SCORE_DENYLIST_HIT = 40
 SCORE_NETWORK_ERROR = 10
+SCORE_PRIVATE_ADDRESS = 30
+SCORE_DEADLINE_EXCEEDED = 10
+SCORE_HOST_UNAVAILABLE = 10
+SCORE_PHISHING_KIT = 50
+SCORE_PAGE_SCRIPT_PAYLOAD = 15
 
 # Thresholds
 REDIRECT_LIMIT = 3
@@ -14,46 +21,41 @@ BRAND_SIMILARITY_THRESHOLD = 80  # rapidfuzz ratio
 
 # Lists (can be expanded)
 SUSPICIOUS_TLDS = set()
-DENYLIST = set()
-BRAND_NAMES = {
-    "paypal", "google", "amazon", "apple", "microsoft", "facebook",
-    "instagram", "twitter", "linkedin", "netflix", "spotify", "ebay",
-    "walmart", "target", "chase", "wellsfargo", "bankofamerica",
-}
+DENYLIST = ReloadingDomainIndex.from_env()  # extra feeds/snapshot via DENYLIST_* env vars
+BRAND_NAMES = set()
 SENSITIVE_INPUT_KEYWORDS = {"password", "otp", "card", "cvv", "ssn", "pin"}
 
-def load_suspicious_tlds(path: str = "resources/suspicious_tlds.txt"):
-    """Load suspicious TLDs from a file into the global set."""
+def read_list(path: str, description: str = "List") -> list[str]:
+    """Read a one-entry-per-line resource file, skipping blanks and # comments."""
     try:
-        with open(path, "r") as f:
-            for line in f:
-                tld = line.strip()
-                if tld and not tld.startswith("#"):
-                    SUSPICIOUS_TLDS.add(tld)
+        with open(path, "r", encoding="utf-8") as f:
+            return [entry for entry in (line.strip() for line in f) if entry and not entry.startswith("#")]
     except FileNotFoundError:
-        print(f"Warning: Suspicious TLDs file not found at '{path}'")
+        print(f"Warning: {description} file not found at '{path}'")
+        return []
+
+def brand_label(entry: str) -> str:
+    """Reduce a brand list entry to the label compared against domains ("brand.tld" -> "brand")."""
+    return entry.lower().split(".")[0]
+
+def load_suspicious_tlds(path: str = "resources/suspicious_tlds.txt"):
+    """Load suspicious TLDs from a file into the global set."""
+    SUSPICIOUS_TLDS.update(read_list(path, "Suspicious TLDs"))
 
 def load_denylist(path: str = "resources/denylist.txt"):
-    """Load denylist domains from a file into the global set."""
-    try:
-        with open(path, "r") as f:
-            for line in f:
-                domain = line.strip()
-                if domain and not domain.startswith("#"):
-                    DENYLIST.add(domain.lower())
-    except FileNotFoundError:
-        print(f"Warning: Denylist file not found at '{path}'")
+    """Add a denylist feed (domains, *.wildcards or hosts-file lines) to the global index."""
+    DENYLIST.add_source(path)
+
+def load_brand_names(path: str = "resources/brands.txt"):
+    """Load protected brand names from a file into the global set."""
+    BRAND_NAMES.update(brand_label(entry) for entry in read_list(path, "Brand list"))
 
 def check_denylist(url: str) -> bool:
-    """Check if a URL or domain is in the denylist."""
-    from urllib.parse import urlparse
-    try:
-        parsed = urlparse(url)
-        domain = parsed.netloc.lower()
-        return domain in DENYLIST
-    except:
-        return False
-
-# Load the TLDs and denylist on module import
-load_suspicious_tlds()
+    """Check if a URL's host, or any parent domain of it, is in the denylist."""
+    host = host_from_url(url)
+    return host is not None and host in DENYLIST
+
+# Register the bundled denylist feed; the index itself is built on first use.
+# Scans read their TLD and brand lists through core.rule_engine, so the
+# SUSPICIOUS_TLDS and BRAND_NAMES sets are only filled by explicit load_*() calls.
 load_denylist()
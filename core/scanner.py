@@ -1,183 +1,504 @@
+import asyncio
+import codecs
+import dataclasses
+import os
+import time
 import httpx
-import tldextract
-from rapidfuzz import fuzz
-from urllib.parse import urlparse, unquote
-from bs4 import BeautifulSoup
+from dataclasses import dataclass
+from urllib.parse import urljoin
 
+from core import event_loop, psl, rules
+from core.cache import verdict_cache
+from core.http_client import HostUnavailableError, client_manager
+from core.metrics import HOP_PHASE_DURATION, SCAN_DURATION, SCAN_STAGE_DURATION, SCANS, registry
 from core.models import TraceHop, TraceResult, Verdict
-from core.rules import (
-    SUSPICIOUS_TLDS, REDIRECT_LIMIT, BRAND_NAMES, BRAND_SIMILARITY_THRESHOLD,
-    SENSITIVE_INPUT_KEYWORDS, SCORE_SUSPICIOUS_TLD, SCORE_TOO_MANY_REDIRECTS,
-    SCORE_DOMAIN_MISMATCH, SCORE_BRAND_LOOKALIKE, SCORE_SENSITIVE_FORM,
-    SCORE_BINARY_DOWNLOAD, SCORE_DENYLIST_HIT, SCORE_NETWORK_ERROR,
-    check_denylist
-)
-from core.html_redirects import find_html_redirect
+from core.rule_engine import RuleSet, ScanContext, ScoreCard, rule_engine
+from core.html_analyzer import HtmlAnalyzer, PageAnalysis
+from core.kit_index import format_fingerprint
+from core.resolver import blocked_address, hop_timings
+from core.security import validate_url
 
-from typing import Callable
+from typing import AsyncIterable, AsyncIterator, Awaitable, Callable, Iterable
 
 ProgressCallback = Callable[[float, str], None]
 
+# Only this many bytes of an HTML page are downloaded and analyzed
+MAX_HTML_BYTES = int(os.getenv('SCAN_MAX_HTML_BYTES', str(512 * 1024)))
+# Redirect bodies up to this size are drained so the connection can be reused
+MAX_DRAIN_BYTES = 16 * 1024
+# Keep fetching once offline checks already reached UNSAFE, to collect full evidence
+FULL_EVIDENCE = os.getenv('SCAN_FULL_EVIDENCE', 'false').lower() in ('1', 'true', 'yes')
+# Default end-to-end time budget of a scan in seconds, across all hops
+DEADLINE_S = float(os.getenv('SCAN_DEADLINE', '20'))
+# A request timeout this close to the deadline is reported as the deadline running out
+_DEADLINE_SLACK_S = 0.05
+
+def _ignore_progress(progress: float, message: str):
+    """Progress callback for callers that do not report progress."""
+
+def _is_html(content_type: str | None) -> bool:
+    return bool(content_type) and 'text/html' in content_type
+
+async def _drain_small_body(res: httpx.Response):
+    """Read a small redirect body so its keep-alive connection goes back to the pool."""
+    length = res.headers.get('content-length')
+    if length is not None and length.isdigit() and int(length) <= MAX_DRAIN_BYTES:
+        await res.aread()
+
+async def _analyze_body(res: httpx.Response, base_url: str, trace_result: TraceResult,
+                        ruleset: RuleSet) -> PageAnalysis:
+    """
+    Stream at most ``MAX_HTML_BYTES`` of an HTML body into the analyzer,
+    recording on the trace whether the page was cut short and how long
+    parsing took (excluding time spent waiting for the network).
+    """
+    try:
+        decoder = codecs.getincrementaldecoder(res.encoding or 'utf-8')(errors='replace')
+    except LookupError:
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    analyzer = HtmlAnalyzer(base_url, sensitive_keywords=ruleset.sensitive_input_keywords)
+    received = 0
+    parse_s = 0.0
+    async for chunk in res.aiter_bytes():
+        remaining = MAX_HTML_BYTES - received
+        if len(chunk) > remaining:
+            chunk = chunk[:remaining]
+            trace_result.body_truncated = True
+        received += len(chunk)
+        started = time.perf_counter()
+        analyzer.feed(decoder.decode(chunk))
+        parse_s += time.perf_counter() - started
+        if trace_result.body_truncated:
+            break
+    started = time.perf_counter()
+    analyzer.feed(decoder.decode(b'', final=True))
+    page = analyzer.close()
+    _record_timing(trace_result, "html_parse", parse_s + time.perf_counter() - started)
+    return page
+
+def _record_timing(trace_result: TraceResult, name: str, elapsed_s: float):
+    """Attach a stage/sub-step duration to the trace and the latency histogram."""
+    trace_result.timings[name] = round(trace_result.timings.get(name, 0.0) + elapsed_s * 1000, 3)
+    SCAN_STAGE_DURATION.observe(elapsed_s, stage=name)
+
+class _HopTimer:
+    """
+    httpx ``trace`` extension callback collecting the network phases of one
+    hop. DNS time is reported separately by the resolver and taken out of
+    the connect phase.
+    """
+
+    _PHASES = {
+        "connection.connect_tcp": "connect",
+        "connection.start_tls": "tls",
+        "http11.receive_response_headers": "ttfb",
+        "http2.receive_response_headers": "ttfb",
+    }
+
+    def __init__(self):
+        self.timings: dict[str, float] = {}
+        self._started: dict[str, float] = {}
+
+    async def __call__(self, event_name: str, info: dict):
+        prefix, _, state = event_name.rpartition(".")
+        phase = self._PHASES.get(prefix)
+        if phase is None:
+            return
+        if state == "started":
+            self._started[phase] = time.perf_counter()
+        elif phase in self._started:
+            elapsed_ms = (time.perf_counter() - self._started.pop(phase)) * 1000
+            if phase == "connect":
+                elapsed_ms -= self.timings.get("dns", 0.0)
+            self.timings[phase] = round(max(elapsed_ms, 0.0), 2)
+
 def _normalize_url(url: str) -> str:
     """Ensure URL has a scheme."""
     if not url.startswith(('http://', 'https://')):
         return f"https://{url}"
     return url
 
-def _is_valid_url_scheme(url: str) -> bool:
-    """Check if the URL scheme is either HTTP or HTTPS."""
-    return url.startswith(('http://', 'https://'))
-
-def _is_sensitive_form_present(soup: BeautifulSoup) -> bool:
-    """Check for forms with sensitive input fields."""
-    forms = soup.find_all('form')
-    for form in forms:
-        inputs = form.find_all('input')
-        for input_tag in inputs:
-            input_type = input_tag.get('type', '').lower()
-            input_name = input_tag.get('name', '').lower()
-            input_id = input_tag.get('id', '').lower()
-            if input_type == 'password':
-                return True
-            for keyword in SENSITIVE_INPUT_KEYWORDS:
-                if keyword in input_name or keyword in input_id:
-                    return True
-    return False
-
-def scan_url(url: str, progress_callback: ProgressCallback, timeout_s: float = 8.0) -> tuple[TraceResult, Verdict]:
+def _build_verdict(ruleset: RuleSet, trace_result: TraceResult, card: ScoreCard) -> Verdict:
+    """Turn the accumulated score into a verdict label using the ruleset's thresholds."""
+    return Verdict(label=ruleset.label_for(card.score, bool(trace_result.errors)),
+                   score=card.score, reasons=tuple(card.reasons))
+
+def _cache_key(url: str, timeout_s: float, deadline_s: float, full_evidence: bool, ruleset: RuleSet) -> tuple:
     """
-    Performs a comprehensive safety scan on a given URL.
+    Cache key for a scan: the normalized URL, the scan options and the
+    ruleset and denylist generations, so verdicts scored by replaced rules
+    or against an older denylist are not reused.
     """
-    trace_result = TraceResult(input_url=url)
-    verdict = Verdict(label="UNKNOWN", score=0)
-    score = 0
-    reasons = []
+    return (_normalize_url(url.strip()), timeout_s, deadline_s, full_evidence,
+            ruleset.generation, rules.DENYLIST.generation)
+
+class _SharedScan:
+    """A scan in flight that several callers are waiting on."""
 
+    def __init__(self):
+        self.task: asyncio.Task | None = None
+        self.callbacks: list[ProgressCallback] = []
+        self.last_progress: tuple[float, str] | None = None
+        # Set when the result depends on a host's open circuit: cache it no longer than its cooldown
+        self.max_ttl: float | None = None
+
+    def attach(self, progress_callback: ProgressCallback):
+        """Subscribe to progress, replaying the latest update."""
+        self.callbacks.append(progress_callback)
+        if self.last_progress is not None:
+            _safe_progress(progress_callback, *self.last_progress)
+
+    def broadcast(self, progress: float, message: str):
+        self.last_progress = (progress, message)
+        for callback in list(self.callbacks):
+            _safe_progress(callback, progress, message)
+
+def _safe_progress(callback: ProgressCallback, progress: float, message: str):
+    """Call a progress callback without letting it break the shared scan."""
     try:
-        # 1. Normalize & validate URL
-        progress_callback(0.1, "Validating URL...")
-        normalized_url = _normalize_url(url)
-        if not _is_valid_url_scheme(normalized_url):
-            trace_result.errors.append("Invalid URL scheme")
-            verdict.label = "UNKNOWN"
-            verdict.reasons.append("Invalid URL scheme")
-            return trace_result, verdict
-        
-        parsed_url = urlparse(normalized_url)
-        if not all([parsed_url.scheme, parsed_url.netloc]):
-            trace_result.errors.append("Invalid URL format")
-            verdict.label = "UNKNOWN"
-            verdict.reasons.append("Invalid URL")
-            return trace_result, verdict
-
-        # 2. Quick heuristics on initial domain
-        input_domain_info = tldextract.extract(normalized_url)
-        if input_domain_info.suffix in SUSPICIOUS_TLDS:
-            score += SCORE_SUSPICIOUS_TLD
-            reasons.append(f"Suspicious TLD (.{input_domain_info.suffix})")
-        
-        for brand in BRAND_NAMES:
-            ratio = fuzz.ratio(input_domain_info.domain, brand)
-            if ratio > BRAND_SIMILARITY_THRESHOLD:
-                score += SCORE_BRAND_LOOKALIKE
-                reasons.append(f"Potential brand impersonation (looks like '{brand}')")
-                break
+        callback(progress, message)
+    except Exception as e:
+        print(f"Warning: progress callback failed: {e}")
+
+# Scans currently running, keyed like the verdict cache
+_in_flight: dict[tuple, _SharedScan] = {}
+
+registry.gauge_callback("netra_scans_in_flight", "Distinct scans currently running (after coalescing).",
+                        lambda: len(_in_flight))
+
+async def scan_url_async(url: str, progress_callback: ProgressCallback, timeout_s: float = 8.0,
+                         force_rescan: bool = False, full_evidence: bool | None = None,
+                         deadline_s: float | None = None) -> tuple[TraceResult, Verdict]:
+    """
+    Performs a comprehensive safety scan on a given URL.
+
+    ``timeout_s`` caps each network operation of a hop; ``deadline_s``
+    (default: SCAN_DEADLINE) caps the whole scan. Each hop gets what is left
+    of the budget, and a scan that runs out returns what it has found so far
+    with a "deadline exceeded" reason.
+    The scan stops before any network I/O once the offline checks already
+    score the URL as UNSAFE (``TraceResult.short_circuited``), unless
+    ``full_evidence`` is set (default: SCAN_FULL_EVIDENCE). Recent results are served from the verdict cache (marked with
+    ``TraceResult.from_cache``) unless ``force_rescan`` is set. Concurrent
+    scans of the same URL are coalesced: later callers attach to the scan
+    already in flight, receive its progress updates and share its result.
+    """
+    # Rules are fixed for the whole scan even if they are reloaded meanwhile
+    ruleset = rule_engine.current()
+    if full_evidence is None:
+        full_evidence = FULL_EVIDENCE
+    if deadline_s is None:
+        deadline_s = DEADLINE_S
+    key = _cache_key(url, timeout_s, deadline_s, full_evidence, ruleset)
+    if not force_rescan:
+        cached = verdict_cache.get(key)
+        if cached is not None:
+            trace_result, verdict = cached
+            SCANS.inc(verdict=verdict.label, cached="true")
+            progress_callback(1.0, verdict.label)
+            return dataclasses.replace(trace_result, from_cache=True), verdict
+
+    shared = _in_flight.get(key)
+    if shared is None:
+        shared = _SharedScan()
+        shared.attach(progress_callback)
+        shared.task = asyncio.ensure_future(_scan_url_uncached(url, shared.broadcast, timeout_s, ruleset,
+                                                              full_evidence, deadline_s, shared))
+        _in_flight[key] = shared
+
+        def _finished(task: asyncio.Task):
+            _in_flight.pop(key, None)
+            if not task.cancelled() and task.exception() is None:
+                verdict_cache.put(key, *task.result(), max_ttl=shared.max_ttl)
+
+        shared.task.add_done_callback(_finished)
+        leader = True
+    else:
+        shared.attach(progress_callback)
+        leader = False
+
+    # Shield the shared task so one caller going away does not cancel it for the others
+    trace_result, verdict = await asyncio.shield(shared.task)
+    SCANS.inc(verdict=verdict.label, cached="false")
+    if not leader and trace_result.input_url != url:
+        trace_result = dataclasses.replace(trace_result, input_url=url)
+    return trace_result, verdict
+
+class _Scan:
+    """State of one scan as it moves through the pipeline stages."""
+
+    def __init__(self, url: str, ruleset: RuleSet, timeout_s: float, full_evidence: bool,
+                 progress_callback: ProgressCallback, deadline_s: float = DEADLINE_S):
+        self.url = url
+        self.ruleset = ruleset
+        self.timeout_s = timeout_s
+        self.deadline_s = deadline_s
+        self.deadline = time.monotonic() + deadline_s
+        self.full_evidence = full_evidence
+        self.progress_callback = progress_callback
+        self.trace_result = TraceResult(input_url=url)
+        self.ctx = ScanContext(url=url, trace_result=self.trace_result)
+        self.card = ScoreCard()
+        # Set by a stage that ends the scan with a fixed verdict (e.g. an invalid URL)
+        self.verdict: Verdict | None = None
+        self.response: httpx.Response | None = None
+        # URL the fetch is currently requesting, the final URL of a scan cut short
+        self.current_url = url
 
-        # 3. Follow HTTP redirects
-        progress_callback(0.25, "Following redirects...")
-        final_url = None
-        res = None
-        with httpx.Client(follow_redirects=True, timeout=timeout_s) as client:
-            current_url = normalized_url
-            for i in range(REDIRECT_LIMIT + 2): # Allow a few more to detect "too many"
-                if i > REDIRECT_LIMIT:
-                    score += SCORE_TOO_MANY_REDIRECTS
-                    reasons.append("Exceeded redirect limit")
-                    break
-                
-                req = client.build_request("GET", current_url)
-                res = client.send(req)
-                
-                hop = TraceHop(
-                    url=str(res.url),
-                    status_code=res.status_code,
-                    reason=res.reason_phrase,
-                    elapsed_ms=int(res.elapsed.total_seconds() * 1000)
-                )
-                trace_result.hops.append(hop)
-                
+    def remaining(self) -> float:
+        """Seconds left of the scan's time budget."""
+        return self.deadline - time.monotonic()
+
+@dataclass(frozen=True)
+class Stage:
+    """A step of the scan pipeline."""
+    name: str
+    cost: float  # rough relative cost, used for ordering and progress reporting
+    message: str
+    run: Callable[[_Scan], Awaitable[None]]
+    network: bool = False
+
+async def _validate_stage(scan: _Scan):
+    normalized_url = _normalize_url(scan.url)
+    valid, error = validate_url(normalized_url, allow_private=client_manager.resolver.allow_private,
+                                check_patterns=False)
+    if not valid:
+        scan.trace_result.errors.append(error)
+        scan.verdict = Verdict(label="UNKNOWN", score=0, reasons=(error,))
+        return
+    scan.ctx.url = normalized_url
+
+async def _static_stage(scan: _Scan):
+    """Offline heuristics on the submitted URL, including the denylist."""
+    started = time.perf_counter()
+    scan.ctx.input_domain = psl.extract(scan.ctx.url)
+    _record_timing(scan.trace_result, "tldextract", time.perf_counter() - started)
+    scan.ruleset.evaluate("input", scan.ctx, scan.card)
+    scan.ruleset.evaluate("denylist", scan.ctx, scan.card)
+
+async def _fetch_stage(scan: _Scan):
+    """
+    Follow HTTP redirects one hop at a time so every hop is recorded.
+    Bodies are streamed: only the final HTML page is read, up to a cap.
+    """
+    trace_result, ctx, ruleset = scan.trace_result, scan.ctx, scan.ruleset
+    final_url = None
+    res = None
+    client = client_manager.client
+    current_url = scan.current_url = ctx.url
+    for i in range(ruleset.redirect_limit + 2): # Allow a few more to detect "too many"
+        if i > ruleset.redirect_limit:
+            ctx.redirects_exceeded = True
+            break
+
+        # Each hop may use what is left of the scan's budget, up to the per-request timeout
+        timer = _HopTimer()
+        req = client.build_request("GET", current_url, timeout=max(min(scan.timeout_s, scan.remaining()), 0.001),
+                                   extensions={"trace": timer})
+        timings_token = hop_timings.set(timer.timings)
+        try:
+            async with client_manager.stream(req) as res:
                 if not res.is_redirect:
                     final_url = str(res.url)
                     trace_result.content_type = res.headers.get('content-type')
-                    break
-                
-                current_url = res.headers['location']
-            
-            trace_result.final_url = final_url or current_url
-
-            # 4. If HTML, parse for meta/JS redirects
-            if res and trace_result.content_type and 'text/html' in trace_result.content_type:
-                progress_callback(0.45, "Parsing HTML redirects...")
-                html_content = res.text
-                if final_url:
-                    html_redirect = find_html_redirect(html_content, final_url)
-                    if html_redirect:
-                        trace_result.js_or_meta_followed = True
-                        # For simplicity, we'll just treat this as the final URL
-                        trace_result.final_url = html_redirect
-                        reasons.append("Followed HTML/JS redirect")
-
-            # 5. Analyze final page
-            progress_callback(0.65, "Analyzing page...")
-            if trace_result.final_url:
-                final_domain_info = tldextract.extract(trace_result.final_url)
-                if input_domain_info.domain != final_domain_info.domain:
-                    score += SCORE_DOMAIN_MISMATCH
-                    reasons.append("Redirected to a different domain")
-
-                if trace_result.content_type:
-                    if 'application/octet-stream' in trace_result.content_type or \
-                       (res and res.headers.get('content-disposition', '').startswith('attachment')):
-                        score += SCORE_BINARY_DOWNLOAD
-                        reasons.append("Leads to a file download")
-
-                if res and trace_result.content_type and 'text/html' in trace_result.content_type:
-                    soup = BeautifulSoup(res.text, 'html.parser')
-                    if _is_sensitive_form_present(soup):
-                        score += SCORE_SENSITIVE_FORM
-                        reasons.append("Page contains a sensitive data form (password, etc.)")
-                        trace_result.has_login_form = True
-
-            # 6. Check against local denylist
-            progress_callback(0.85, "Checking against denylist...")
-            urls_to_check = {hop.url for hop in trace_result.hops}
-            if trace_result.final_url:
-                urls_to_check.add(trace_result.final_url)
-            
-            for u in urls_to_check:
-                if check_denylist(u):
-                    score += SCORE_DENYLIST_HIT
-                    reasons.append("Domain found in local denylist")
-                    break # One hit is enough
+                    ctx.response_headers = res.headers
+                    if _is_html(trace_result.content_type):
+                        # Parse the page once for meta/JS redirects and page signals
+                        scan.progress_callback(0.45, "Parsing HTML redirects...")
+                        ctx.page = await _analyze_body(res, final_url, trace_result, ruleset)
+                else:
+                    await _drain_small_body(res)
+        finally:
+            hop_timings.reset(timings_token)
+
+        hop = TraceHop(
+            url=str(res.url),
+            status_code=res.status_code,
+            reason=res.reason_phrase,
+            elapsed_ms=int(res.elapsed.total_seconds() * 1000),
+            timings=timer.timings
+        )
+        trace_result.hops.append(hop)
+        for phase, elapsed_ms in timer.timings.items():
+            HOP_PHASE_DURATION.observe(elapsed_ms / 1000, phase=phase)
+
+        if final_url:
+            break
+
+        current_url = scan.current_url = urljoin(str(res.url), res.headers['location'])
+
+    scan.response = res
+    trace_result.final_url = final_url or current_url
+
+async def _page_stage(scan: _Scan):
+    trace_result, ctx = scan.trace_result, scan.ctx
+    scan.ruleset.evaluate("redirects", ctx, scan.card)
+
+    page = ctx.page
+    if page is not None:
+        trace_result.has_login_form = page.has_sensitive_form
+        if page.fingerprint is not None:
+            trace_result.page_fingerprint = format_fingerprint(page.fingerprint)
+        if page.redirect_url:
+            trace_result.js_or_meta_followed = True
+            # For simplicity, we'll just treat this as the final URL
+            trace_result.final_url = page.redirect_url
+
+    if trace_result.final_url:
+        scan.ruleset.evaluate("page", ctx, scan.card)
+
+async def _denylist_stage(scan: _Scan):
+    """Check every URL seen during the redirect walk against the local denylist."""
+    scan.ruleset.evaluate("denylist", scan.ctx, scan.card)
+
+# Cheap offline stages come first so an obviously bad URL never touches the network.
+# Later stages depend on the fetch, so the order is fixed rather than sorted by cost.
+PIPELINE: tuple[Stage, ...] = (
+    Stage("validate", 1, "Validating URL...", _validate_stage),
+    Stage("static", 2, "Checking domain reputation...", _static_stage),
+    Stage("fetch", 80, "Following redirects...", _fetch_stage, network=True),
+    Stage("page", 5, "Analyzing page...", _page_stage),
+    Stage("denylist", 2, "Checking against denylist...", _denylist_stage),
+)
+
+def _deadline_exceeded(scan: _Scan):
+    """Record that the budget ran out; the scan continues with its offline stages only."""
+    trace_result = scan.trace_result
+    trace_result.errors.append(f"Scan deadline of {scan.deadline_s:g}s exceeded")
+    if trace_result.final_url is None:
+        trace_result.final_url = scan.current_url
+    scan.ctx.deadline_s = scan.deadline_s
+
+async def _scan_url_uncached(url: str, progress_callback: ProgressCallback, timeout_s: float,
+                             ruleset: RuleSet, full_evidence: bool = False,
+                             deadline_s: float = DEADLINE_S,
+                             shared: _SharedScan | None = None) -> tuple[TraceResult, Verdict]:
+    """
+    Runs the scan pipeline stage by stage.
+
+    Network I/O is driven by the shared pooled ``httpx.AsyncClient`` so many
+    scans can share one event loop and reuse kept-alive connections. Network
+    stages are cancelled when the scan's deadline passes.
+    """
+    scan_started = time.perf_counter()
+    scan = _Scan(url, ruleset, timeout_s, full_evidence, progress_callback, deadline_s)
+    total_cost = sum(stage.cost for stage in PIPELINE)
+    done_cost = 0.0
+
+    try:
+        for stage in PIPELINE:
+            if not full_evidence and scan.card.score >= ruleset.unsafe_threshold:
+                # Scores only go up, so the remaining stages cannot change the label
+                scan.trace_result.short_circuited = True
+                break
+            if stage.network and scan.ctx.deadline_s is not None:
+                continue
+            progress_callback(0.1 + 0.8 * done_cost / total_cost, stage.message)
+            started = time.perf_counter()
+            try:
+                if stage.network:
+                    await asyncio.wait_for(stage.run(scan), scan.remaining())
+                else:
+                    await stage.run(scan)
+            except asyncio.TimeoutError:
+                _deadline_exceeded(scan)
+            except httpx.TimeoutException:
+                if scan.remaining() > _DEADLINE_SLACK_S:
+                    raise
+                # The request timeout was cut down to the remaining budget
+                _deadline_exceeded(scan)
+            finally:
+                _record_timing(scan.trace_result, stage.name, time.perf_counter() - started)
+            if scan.verdict is not None:
+                break
+            done_cost += stage.cost
 
     except httpx.RequestError as e:
-        trace_result.errors.append(f"Network error: {e}")
-        score += SCORE_NETWORK_ERROR
-        reasons.append("Network error during scan")
+        scan.trace_result.errors.append(f"Network error: {e}")
+        blocked = blocked_address(e)
+        if blocked is not None:
+            # A redirect (or DNS answer) pointing into a private network is refused, not fetched
+            scan.ctx.blocked_host = blocked.host
+        elif isinstance(e, HostUnavailableError):
+            scan.ctx.unavailable_host = e.host
+            if shared is not None:
+                # The host gets probed again once its cooldown is over
+                shared.max_ttl = e.retry_in
+        else:
+            scan.ctx.error = str(e) or type(e).__name__
+        ruleset.evaluate("error", scan.ctx, scan.card)
     except Exception as e:
-        trace_result.errors.append(f"An unexpected error occurred: {e}")
-        verdict.label = "UNKNOWN"
-        reasons.append("An internal error occurred")
-
-    # 7. Final scoring and verdict
-    verdict.score = score
-    verdict.reasons = reasons
-    if score >= 60:
-        verdict.label = "UNSAFE"
-    elif score >= 30:
-        verdict.label = "SUSPICIOUS"
-    elif not trace_result.errors:
-        verdict.label = "SAFE"
+        scan.trace_result.errors.append(f"An unexpected error occurred: {e}")
+        scan.card.reasons.append("An internal error occurred")
+    if scan.ctx.deadline_s is not None:
+        ruleset.evaluate("error", scan.ctx, scan.card)
 
+    # Final scoring and verdict, unless a stage already settled it
+    verdict = scan.verdict or _build_verdict(ruleset, scan.trace_result, scan.card)
+    _record_timing(scan.trace_result, "rules", scan.card.elapsed_s)
+    elapsed_s = time.perf_counter() - scan_started
+    scan.trace_result.timings["total"] = round(elapsed_s * 1000, 3)
+    SCAN_DURATION.observe(elapsed_s, verdict=verdict.label)
     progress_callback(1.0, verdict.label)
-    return trace_result, verdict
+    return scan.trace_result, verdict
+
+def scan_url(url: str, progress_callback: ProgressCallback, timeout_s: float = 8.0,
+             force_rescan: bool = False, full_evidence: bool | None = None,
+             deadline_s: float | None = None) -> tuple[TraceResult, Verdict]:
+    """
+    Synchronous wrapper around ``scan_url_async``.
+
+    The scan runs on the shared background event loop; the calling thread
+    blocks until it completes.
+    """
+    return event_loop.run(scan_url_async(url, progress_callback, timeout_s, force_rescan, full_evidence,
+                                         deadline_s))
+
+async def scan_many_async(urls: Iterable[str] | AsyncIterable[str], concurrency: int = 10, timeout_s: float = 8.0,
+                          force_rescan: bool = False, full_evidence: bool | None = None,
+                          deadline_s: float | None = None) -> AsyncIterator[tuple[str, TraceResult, Verdict]]:
+    """
+    Scan many URLs concurrently, yielding ``(url, trace_result, verdict)``
+    in completion order.
+
+    At most ``concurrency`` scans are in flight at once and ``urls`` is
+    consumed lazily, so arbitrarily long inputs use bounded memory. ``urls``
+    runs on the event loop; pass an async iterable (e.g.
+    ``event_loop.from_thread``) when producing it may block.
+    """
+    async def _scan_one(u: str):
+        trace_result, verdict = await scan_url_async(u, _ignore_progress, timeout_s, force_rescan, full_evidence,
+                                                     deadline_s)
+        return u, trace_result, verdict
+
+    source = urls.__aiter__() if hasattr(urls, '__aiter__') else None
+    url_iter = iter(urls) if source is None else None
+    # The pending read from an async source, waited on together with the scans
+    next_url: asyncio.Future | None = None
+    in_flight: set[asyncio.Future] = set()
+    try:
+        while True:
+            if source is None:
+                for u in url_iter:
+                    in_flight.add(asyncio.ensure_future(_scan_one(u)))
+                    if len(in_flight) >= concurrency:
+                        break
+            elif next_url is None and len(in_flight) < concurrency:
+                next_url = asyncio.ensure_future(source.__anext__())
+                in_flight.add(next_url)
+            if not in_flight:
+                return
+            done, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+            if next_url in done:
+                done.discard(next_url)
+                try:
+                    in_flight.add(asyncio.ensure_future(_scan_one(next_url.result())))
+                except StopAsyncIteration:
+                    source = None
+                    url_iter = iter(())
+                next_url = None
+            for task in done:
+                yield task.result()
+    finally:
+        for task in in_flight:
+            task.cancel()
@@ -0,0 +1,114 @@
+"""
+Bounded worker pool for running URL scans in the background.
+"""
+import math
+import threading
+import time
+from collections import deque
+from typing import Callable
+
+from core.metrics import QUEUE_WAIT
+
+
+class QueueFullError(Exception):
+    """Raised when the scan queue has no room for another job."""
+
+    def __init__(self, retry_after: int):
+        super().__init__("Scan queue is full")
+        self.retry_after = retry_after
+
+
+class ScanScheduler:
+    """
+    Fixed-size pool of worker threads fed from a bounded FIFO queue.
+
+    Workers are started lazily on the first submission so that importing the
+    module (e.g. in a pre-forking server master) does not spawn threads.
+    """
+
+    def __init__(self, workers: int = 8, max_queue: int = 100):
+        if workers < 1:
+            raise ValueError("workers must be at least 1")
+        self.workers = workers
+        self.max_queue = max_queue
+        self._pending: deque[tuple[str, Callable, tuple, float]] = deque()
+        self._running: set[str] = set()
+        self._cond = threading.Condition()
+        self._threads: list[threading.Thread] = []
+        self._avg_duration_s = 5.0  # running estimate, used for Retry-After
+
+    def _ensure_started(self):
+        """Start the worker threads if they are not running yet."""
+        if self._threads:
+            return
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"scan-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, job_id: str, fn: Callable, *args):
+        """
+        Queue ``fn(*args)`` for execution on the pool.
+
+        Raises:
+            QueueFullError: if ``max_queue`` jobs are already waiting.
+        """
+        with self._cond:
+            self._ensure_started()
+            if len(self._pending) >= self.max_queue:
+                raise QueueFullError(self._retry_after_locked())
+            self._pending.append((job_id, fn, args, time.monotonic()))
+            self._cond.notify()
+
+    def position(self, job_id: str) -> int | None:
+        """
+        Return the 1-based queue position of a job, 0 if it is running,
+        or None if the scheduler does not know about it.
+        """
+        with self._cond:
+            if job_id in self._running:
+                return 0
+            for index, (pending_id, *_) in enumerate(self._pending):
+                if pending_id == job_id:
+                    return index + 1
+        return None
+
+    def retry_after(self) -> int:
+        """Estimated number of seconds until a queue slot frees up."""
+        with self._cond:
+            return self._retry_after_locked()
+
+    def _retry_after_locked(self) -> int:
+        backlog = len(self._pending) + len(self._running)
+        return max(1, math.ceil(backlog / self.workers * self._avg_duration_s))
+
+    def stats(self) -> dict:
+        """Snapshot of the pool for monitoring."""
+        with self._cond:
+            return {
+                'workers': self.workers,
+                'max_queue': self.max_queue,
+                'queued': len(self._pending),
+                'running': len(self._running),
+                'avg_duration_s': round(self._avg_duration_s, 3),
+            }
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                job_id, fn, args, queued_at = self._pending.popleft()
+                self._running.add(job_id)
+
+            started = time.monotonic()
+            QUEUE_WAIT.observe(started - queued_at)
+            try:
+                fn(*args)
+            except Exception as e:
+                print(f"Warning: scan job {job_id} failed: {e}")
+            finally:
+                elapsed = time.monotonic() - started
+                with self._cond:
+                    self._running.discard(job_id)
+                    self._avg_duration_s = 0.8 * self._avg_duration_s + 0.2 * elapsed
@@ -9,25 +9,48 @@ from typing import Optional, List
 # Allowed URL schemes
 ALLOWED_SCHEMES = {'http', 'https'}
 
-# Suspicious patterns for XSS detection
-SUSPICIOUS_PATTERNS = [
-    r'<script[^>]*>.*?</script>',
-    r'javascript:',
-    r'vbscript:',
-    r'on\w+\s*=',
-    r'<iframe',
-    r'<object',
-    r'<embed',
-    r'<form',
-    r'<input[^>]*type\s*=\s*["\']?password["\']?',
-]
+# Suspicious patterns for XSS detection, by name, written in lower case.
+# Every repetition is bounded so a match is at most _MAX_MATCH characters
+# long: the combined regex does a bounded amount of work per position, and
+# content can be scanned in chunks. The bounds are well above real markup
+# (the longest event handler name is around 40 characters).
+SUSPICIOUS_PATTERNS = {
+    'script_tag': r'<script[^>]{0,256}>',
+    'javascript_uri': r'javascript:',
+    'vbscript_uri': r'vbscript:',
+    'event_handler': r'on\w{1,64}\s{0,64}=',
+    'iframe': r'<iframe',
+    'object': r'<object',
+    'embed': r'<embed',
+    'form': r'<form',
+    'password_input': r'<input[^>]{0,256}type\s{0,16}=\s{0,16}["\']?password["\']?',
+    'obfuscated_js': r'(?:eval|document\.write)\s{0,16}\(\s{0,16}'
+                     r'(?:atob|unescape|decodeuricomponent|string\.fromcharcode)\s{0,16}\(',
+}
+_MAX_MATCH = 512
+# The first two characters of every pattern: positions that cannot start a
+# match are skipped before trying the alternatives one by one
+_PREFIXES = r'(?=<[sioef]|ja|vb|on|ev|do)'
+_COMBINED = _PREFIXES + '(?:' + '|'.join(f'(?P<{name}>{pattern})' for name, pattern in SUSPICIOUS_PATTERNS.items()) + ')'
+
+# One alternation with a named group per pattern, so text is scanned once
+SUSPICIOUS_REGEX = re.compile(_COMBINED, re.IGNORECASE)
+# Same, for text already lower-cased (noticeably faster than IGNORECASE)
+_LOWERCASE_REGEX = re.compile(_COMBINED)
+# Each pattern on its own, for the helpers that report matches per pattern
+_PATTERN_REGEXES = {name: re.compile(pattern, re.IGNORECASE) for name, pattern in SUSPICIOUS_PATTERNS.items()}
+_SCRIPT_OPEN = re.compile(r'<script', re.IGNORECASE)
+_SCRIPT_CLOSE = re.compile(r'</script>', re.IGNORECASE)
 
-# Compile patterns for performance
-SUSPICIOUS_REGEX = [re.compile(pattern, re.IGNORECASE) for pattern in SUSPICIOUS_PATTERNS]
+# Patterns that make validate_url reject a URL
+URL_PATTERNS = ('script_tag', 'javascript_uri', 'vbscript_uri', 'event_handler',
+                'iframe', 'object', 'embed', 'form', 'password_input', 'obfuscated_js')
 
 # Private IP ranges for SSRF protection
 PRIVATE_IP_RANGES = [
+    ipaddress.ip_network('0.0.0.0/8'),
     ipaddress.ip_network('10.0.0.0/8'),
+    ipaddress.ip_network('100.64.0.0/10'),
     ipaddress.ip_network('172.16.0.0/12'),
     ipaddress.ip_network('192.168.0.0/16'),
     ipaddress.ip_network('127.0.0.0/8'),
@@ -38,12 +61,15 @@ PRIVATE_IP_RANGES = [
 ]
 
 
-def validate_url(url: str) -> tuple[bool, Optional[str]]:
+def validate_url(url: str, allow_private: bool = False,
+                 check_patterns: bool = True) -> tuple[bool, Optional[str]]:
     """
     Validate URL for security issues.
     
     Args:
         url: URL to validate
+        allow_private: Accept localhost and private IP addresses
+        check_patterns: Reject URLs matching ``SUSPICIOUS_PATTERNS``
         
     Returns:
         Tuple of (is_valid, error_message)
@@ -62,31 +88,38 @@ def validate_url(url: str) -> tuple[bool, Optional[str]]:
             return False, f"Unsupported scheme: {parsed.scheme}"
         
         # Check netloc
-        if not parsed.netloc:
+        if not parsed.netloc or not parsed.hostname:
             return False, "Missing hostname"
         
         # Check for suspicious patterns
-        for pattern in SUSPICIOUS_REGEX:
-            if pattern.search(url):
-                return False, "URL contains suspicious patterns"
+        if check_patterns and find_suspicious_patterns(url, URL_PATTERNS):
+            return False, "URL contains suspicious patterns"
         
-        # Check hostname format
-        hostname = parsed.netloc.lower()
-        if not re.match(r'^[a-z0-9.-]+$', hostname):
-            return False, "Invalid hostname format"
-        
-        # Check for localhost and private IPs
-        if hostname in ['localhost', '127.0.0.1']:
-            return False, "Localhost access not allowed"
+        # The hostname, without userinfo or port
+        hostname = parsed.hostname.rstrip('.')
         
         # Check for IP addresses
         try:
             ip = ipaddress.ip_address(hostname)
-            if any(ip in network for network in PRIVATE_IP_RANGES):
-                return False, "Private IP access not allowed"
         except ValueError:
-            # Not an IP address, continue
-            pass
+            ip = None
+        if ip is not None:
+            if not allow_private and any(ip in network for network in PRIVATE_IP_RANGES):
+                return False, "Private IP access not allowed"
+            return True, None
+        
+        # Check hostname format (internationalized names are checked in IDNA form);
+        # underscores are allowed since DNS names may contain them and they resolve
+        try:
+            ascii_hostname = hostname.encode('idna').decode('ascii') if not hostname.isascii() else hostname
+        except UnicodeError:
+            return False, "Invalid hostname format"
+        if not re.match(r'^[a-z0-9._-]+$', ascii_hostname):
+            return False, "Invalid hostname format"
+        
+        # Check for localhost
+        if not allow_private and ascii_hostname == 'localhost':
+            return False, "Localhost access not allowed"
         
         return True, None
         
@@ -94,6 +127,97 @@ def validate_url(url: str) -> tuple[bool, Optional[str]]:
         return False, f"URL validation error: {str(e)}"
 
 
+def find_suspicious_patterns(url: str, names=SUSPICIOUS_PATTERNS) -> List[str]:
+    """
+    Names of the ``SUSPICIOUS_PATTERNS`` found in a URL.
+    
+    Args:
+        url: URL to check
+        names: Patterns to look for (all by default)
+        
+    Returns:
+        List of matching pattern names
+    """
+    return [name for name in names if _pattern_matches(name, url)]
+
+
+def _pattern_matches(name: str, text: str) -> List[str]:
+    """Non-overlapping matches of one pattern; script tags match whole elements."""
+    if name == 'script_tag':
+        return _script_elements(text)
+    return [match.group() for match in _PATTERN_REGEXES[name].finditer(text)]
+
+
+def _script_elements(text: str) -> List[str]:
+    """
+    The ``<script ...>...</script>`` elements (tag to closing tag on one
+    line) that ``<script[^>]*>.*?</script>`` finds, in linear time: the
+    next '>', newline and closing tag only move forward, so no span of
+    the text is searched twice.
+    """
+    found = []
+    resume = tag_end = line_end = close = 0
+    for start in _SCRIPT_OPEN.finditer(text):
+        if start.start() < resume:
+            continue
+        if tag_end < start.end():
+            tag_end = text.find('>', start.end())
+            if tag_end < 0:
+                break
+        body = tag_end + 1
+        if line_end < body:
+            line_end = text.find('\n', body)
+            if line_end < 0:
+                line_end = len(text)
+        if close < body:
+            match = _SCRIPT_CLOSE.search(text, body)
+            close = match.start() if match else len(text)
+        if close < line_end:
+            resume = close + len('</script>')
+            found.append(text[start.start():resume])
+    return found
+
+
+class PatternScanner:
+    """
+    Counts ``SUSPICIOUS_PATTERNS`` hits in text that arrives in chunks:
+    ``feed()`` chunks as they arrive, then ``close()`` to get the counts.
+    
+    The last ``_MAX_MATCH`` characters of each chunk are held back and
+    scanned again with the next one, so a match split across chunks is found
+    once and matches are the same as scanning the whole text at once.
+    Unlike ``detect_xss_payloads``, all patterns share one pass: matches do
+    not overlap, so a pattern inside another match (an event handler inside
+    a script tag) is not counted separately, and ``script_tag`` counts
+    opening tags rather than whole elements.
+    """
+
+    def __init__(self):
+        self.hits: dict[str, int] = {}
+        self._pending = ''
+
+    def feed(self, chunk: str):
+        text = self._pending + chunk.lower()
+        limit = len(text) - _MAX_MATCH
+        if limit <= 0:
+            self._pending = text
+            return
+        resume = 0
+        for match in _LOWERCASE_REGEX.finditer(text):
+            if match.start() >= limit:
+                # Could still grow (or lose to an earlier match) with the next chunk
+                break
+            self.hits[match.lastgroup] = self.hits.get(match.lastgroup, 0) + 1
+            resume = match.end()
+        self._pending = text[max(resume, limit):]
+
+    def close(self) -> dict[str, int]:
+        for match in _LOWERCASE_REGEX.finditer(self._pending):
+            self.hits[match.lastgroup] = self.hits.get(match.lastgroup, 0) + 1
+        self._pending = ''
+        return self.hits
+
+
 def sanitize_url(url: str) -> str:
     """
     Sanitize URL by removing dangerous characters and normalizing.
@@ -179,15 +303,10 @@ def detect_xss_payloads(content: str) -> List[str]:
         content: Content to scan
         
     Returns:
-        List of detected XSS patterns
+        List of matched text, pattern by pattern (matches of different
+        patterns may overlap; script tags are reported as whole elements)
     """
     if not content:
         return []
     
-    detected = []
-    for pattern in SUSPICIOUS_REGEX:
-        matches = pattern.findall(content)
-        if matches:
-            detected.extend(matches)
-    
-    return detected
+    return [text for name in SUSPICIOUS_PATTERNS for text in _pattern_matches(name, content)]
@@ -0,0 +1,61 @@
+"""
+JSON encoding shared by the API, the scan store and the bulk tools.
+
+Uses orjson when it is installed, then msgspec, then the standard library.
+All three encode the result dataclasses in ``core.models`` directly and
+produce compact UTF-8 bytes, so responses can be sent without building
+intermediate dicts by hand.
+"""
+import dataclasses
+import json
+from typing import Any
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+
+def _default(obj):
+    """Stdlib fallback for types json does not know."""
+    if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        return {f.name: getattr(obj, f.name) for f in dataclasses.fields(obj)}
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+if orjson is not None:
+    BACKEND = "orjson"
+
+    def dumps(obj: Any) -> bytes:
+        return orjson.dumps(obj, default=_default)
+
+    loads = orjson.loads
+elif msgspec is not None:
+    BACKEND = "msgspec"
+    _encoder = msgspec.json.Encoder(enc_hook=_default)
+    _decoder = msgspec.json.Decoder()
+
+    def dumps(obj: Any) -> bytes:
+        return _encoder.encode(obj)
+
+    def loads(data: bytes | str) -> Any:
+        return _decoder.decode(data)
+else:
+    BACKEND = "json"
+
+    def dumps(obj: Any) -> bytes:
+        return json.dumps(obj, default=_default, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+    loads = json.loads
+
+
+def to_builtins(obj: Any) -> Any:
+    """``obj`` as plain dicts and lists, e.g. for a JSON database column."""
+    return loads(dumps(obj))
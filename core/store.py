@@ -0,0 +1,337 @@
+"""
+Storage for web scan state (status, progress and final results).
+
+Two backends share one interface: ``SqlResultStore`` persists scans through
+``core.db`` so they survive restarts and are visible to every server worker,
+and ``MemoryResultStore`` keeps them in-process. Both expire finished scans
+from a background job.
+"""
+import datetime
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable
+
+from sqlalchemy import bindparam, delete, select, update
+
+from core import db, serialization
+
+# Columns a caller may set on a scan
+_FIELDS = ('status', 'progress', 'message', 'trace_result', 'verdict', 'error',
+           'started_at', 'last_update', 'completed_at')
+
+
+class ResultStore:
+    """
+    Base class for scan state stores.
+
+    Scan records are plain dicts shaped like the ``/scan/<id>/status``
+    response; timestamps are epoch seconds.
+    """
+
+    def __init__(self, result_ttl: float = 3600.0, expiry_interval: float = 60.0,
+                 encoded_cache_size: int = 10000):
+        self.result_ttl = result_ttl
+        self.expiry_interval = expiry_interval
+        self._jobs_pid: int | None = None
+        self._jobs_lock = threading.Lock()
+        # scan_id -> (completed_at, JSON) of finished scans, which no longer change
+        self.encoded_cache_size = encoded_cache_size
+        self._encoded: OrderedDict[str, tuple[float, bytes]] = OrderedDict()
+        self._encoded_lock = threading.Lock()
+
+    def create(self, scan_id: str, url: str, **fields):
+        """Insert a new scan record."""
+        raise NotImplementedError
+
+    def get(self, scan_id: str) -> dict | None:
+        """Return a scan record, or None if it does not exist."""
+        raise NotImplementedError
+
+    def update(self, scan_id: str, **fields):
+        """Write fields of a scan immediately."""
+        raise NotImplementedError
+
+    def update_progress(self, scan_id: str, progress: float, message: str):
+        """Record scan progress; backends may batch these writes."""
+        self.update(scan_id, progress=progress, message=message, last_update=time.time())
+
+    def latest_for_url(self, url: str) -> dict | None:
+        """Most recently started scan of a URL."""
+        raise NotImplementedError
+
+    def get_json(self, scan_id: str, view: Callable[[dict], dict] | None = None) -> bytes | None:
+        """
+        A scan record encoded as JSON, or None if it does not exist.
+
+        Finished records are encoded once and later calls reuse the bytes;
+        ``view`` may adjust records that are still running before encoding.
+        """
+        # Another worker's expiry job may already have deleted an expired scan
+        cutoff = time.time() - self.result_ttl
+        with self._encoded_lock:
+            cached = self._encoded.get(scan_id)
+            if cached is not None:
+                if cached[0] >= cutoff:
+                    self._encoded.move_to_end(scan_id)
+                    return cached[1]
+                del self._encoded[scan_id]
+        record = self.get(scan_id)
+        if record is None:
+            return None
+        completed_at = record.get('completed_at')
+        if completed_at is None:
+            return serialization.dumps(view(record) if view is not None else record)
+        data = serialization.dumps(record)
+        if self.encoded_cache_size > 0 and completed_at >= cutoff:
+            with self._encoded_lock:
+                self._encoded[scan_id] = (completed_at, data)
+                while len(self._encoded) > self.encoded_cache_size:
+                    self._encoded.popitem(last=False)
+        return data
+
+    def _forget_encoded(self, scan_id: str | None = None, completed_before: float | None = None):
+        """Drop cached encodings of one scan, or of scans finished before a cutoff."""
+        with self._encoded_lock:
+            if scan_id is not None:
+                self._encoded.pop(scan_id, None)
+            if completed_before is not None:
+                for key in [k for k, (done, _) in self._encoded.items() if done < completed_before]:
+                    del self._encoded[key]
+
+    def delete(self, scan_id: str):
+        raise NotImplementedError
+
+    def delete_expired(self) -> int:
+        """Remove finished scans older than ``result_ttl``; returns the count removed."""
+        raise NotImplementedError
+
+    def start_background_jobs(self):
+        """Start the expiry job (once per process, so it is safe to call after fork)."""
+        with self._jobs_lock:
+            if self._jobs_pid == os.getpid():
+                return
+            self._jobs_pid = os.getpid()
+            self._start_threads()
+
+    def _start_threads(self):
+        threading.Thread(target=self._expiry_loop, name="scan-store-expiry", daemon=True).start()
+
+    def _expiry_loop(self):
+        while True:
+            time.sleep(self.expiry_interval)
+            try:
+                self.delete_expired()
+            except Exception as e:
+                print(f"Warning: expiring old scans failed: {e}")
+
+
+class MemoryResultStore(ResultStore):
+    """Keeps scans in a dict; state is lost on restart and not shared across processes."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._scans: dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def create(self, scan_id, url, **fields):
+        now = time.time()
+        record = {'status': 'processing', 'url': url, 'progress': 0.0,
+                  'message': 'Starting scan...', 'started_at': now, 'last_update': now}
+        record.update(fields)
+        with self._lock:
+            self._scans[scan_id] = record
+
+    def get(self, scan_id):
+        with self._lock:
+            record = self._scans.get(scan_id)
+            return dict(record) if record is not None else None
+
+    def update(self, scan_id, **fields):
+        self._forget_encoded(scan_id)
+        with self._lock:
+            if scan_id in self._scans:
+                self._scans[scan_id].update(fields)
+
+    def latest_for_url(self, url):
+        with self._lock:
+            matches = [r for r in self._scans.values() if r['url'] == url]
+            return dict(max(matches, key=lambda r: r['started_at'])) if matches else None
+
+    def delete(self, scan_id):
+        self._forget_encoded(scan_id)
+        with self._lock:
+            self._scans.pop(scan_id, None)
+
+    def delete_expired(self):
+        cutoff = time.time() - self.result_ttl
+        self._forget_encoded(completed_before=cutoff)
+        with self._lock:
+            expired = [scan_id for scan_id, r in self._scans.items()
+                       if r.get('completed_at') and r['completed_at'] < cutoff]
+            for scan_id in expired:
+                del self._scans[scan_id]
+        return len(expired)
+
+
+def _to_datetime(value: float | None) -> datetime.datetime | None:
+    if value is None:
+        return None
+    return datetime.datetime.fromtimestamp(value, datetime.timezone.utc).replace(tzinfo=None)
+
+
+def _to_epoch(value: datetime.datetime | None) -> float | None:
+    if value is None:
+        return None
+    return value.replace(tzinfo=datetime.timezone.utc).timestamp()
+
+
+class SqlResultStore(ResultStore):
+    """
+    Persists scans in the ``scan_results`` table of ``core.db``.
+
+    Progress updates are buffered in memory and flushed in one batched
+    transaction every ``flush_interval`` seconds, so chatty progress
+    callbacks do not turn into one write per update. Reads in this process
+    see buffered progress immediately.
+    """
+
+    def __init__(self, flush_interval: float = 0.5, **kwargs):
+        super().__init__(**kwargs)
+        self.flush_interval = flush_interval
+        self._pending: dict[str, dict] = {}
+        self._pending_lock = threading.Lock()
+        db.init_db()
+
+    def _row_to_dict(self, row: db.ScanResult) -> dict:
+        record = {
+            'status': row.status,
+            'url': row.url,
+            'progress': row.progress,
+            'message': row.message,
+            'started_at': _to_epoch(row.started_at),
+            'last_update': _to_epoch(row.last_update),
+        }
+        for name in ('trace_result', 'verdict', 'error'):
+            if getattr(row, name) is not None:
+                record[name] = getattr(row, name)
+        if row.completed_at is not None:
+            record['completed_at'] = _to_epoch(row.completed_at)
+        return record
+
+    def _columns(self, fields: dict) -> dict:
+        columns = {}
+        for name, value in fields.items():
+            if name not in _FIELDS:
+                raise ValueError(f"Unknown scan field: {name}")
+            if name in ('started_at', 'last_update', 'completed_at'):
+                value = _to_datetime(value)
+            columns[name] = value
+        return columns
+
+    def create(self, scan_id, url, **fields):
+        now = time.time()
+        fields = {'started_at': now, 'last_update': now, **fields}
+        with db.SessionLocal() as session:
+            session.add(db.ScanResult(scan_id=scan_id, url=url, **self._columns(fields)))
+            session.commit()
+
+    def get(self, scan_id):
+        with db.SessionLocal() as session:
+            row = session.get(db.ScanResult, scan_id)
+            record = self._row_to_dict(row) if row is not None else None
+        if record is not None:
+            with self._pending_lock:
+                pending = self._pending.get(scan_id)
+                if pending is not None:
+                    record.update(pending)
+        return record
+
+    def update(self, scan_id, **fields):
+        self._forget_encoded(scan_id)
+        # A direct write supersedes any buffered progress for the scan
+        with self._pending_lock:
+            pending = self._pending.pop(scan_id, None)
+        if pending is not None:
+            fields = {**pending, **fields}
+        with db.SessionLocal() as session:
+            session.execute(update(db.ScanResult)
+                            .where(db.ScanResult.scan_id == scan_id)
+                            .values(**self._columns(fields)))
+            session.commit()
+
+    def update_progress(self, scan_id, progress, message):
+        with self._pending_lock:
+            self._pending[scan_id] = {'progress': progress, 'message': message,
+                                      'last_update': time.time()}
+
+    def flush(self):
+        """Write all buffered progress updates in one transaction."""
+        with self._pending_lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return
+        rows = [{'id': scan_id, **self._columns(fields)} for scan_id, fields in pending.items()]
+        table = db.ScanResult.__table__
+        # One executemany UPDATE; a scan completed since its progress was
+        # buffered is skipped, so stale progress never lands on a finished record
+        statement = (update(table)
+                     .where(table.c.scan_id == bindparam('id'))
+                     .where(table.c.completed_at.is_(None))
+                     .values(progress=bindparam('progress'), message=bindparam('message'),
+                             last_update=bindparam('last_update')))
+        with db.SessionLocal() as session:
+            session.execute(statement, rows)
+            session.commit()
+
+    def latest_for_url(self, url):
+        with db.SessionLocal() as session:
+            row = session.scalars(select(db.ScanResult)
+                                  .where(db.ScanResult.url == url)
+                                  .order_by(db.ScanResult.started_at.desc())
+                                  .limit(1)).first()
+            return self._row_to_dict(row) if row is not None else None
+
+    def delete(self, scan_id):
+        self._forget_encoded(scan_id)
+        with self._pending_lock:
+            self._pending.pop(scan_id, None)
+        with db.SessionLocal() as session:
+            session.execute(delete(db.ScanResult).where(db.ScanResult.scan_id == scan_id))
+            session.commit()
+
+    def delete_expired(self):
+        cutoff = time.time() - self.result_ttl
+        self._forget_encoded(completed_before=cutoff)
+        cutoff = _to_datetime(cutoff)
+        with db.SessionLocal() as session:
+            result = session.execute(delete(db.ScanResult).where(db.ScanResult.completed_at < cutoff))
+            session.commit()
+            return result.rowcount
+
+    def _start_threads(self):
+        super()._start_threads()
+        threading.Thread(target=self._flush_loop, name="scan-store-flush", daemon=True).start()
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Warning: flushing scan progress failed: {e}")
+
+
+def create_store_from_env() -> ResultStore:
+    """Build the store selected by SCAN_STORE ('db' or 'memory')."""
+    options = {
+        'result_ttl': float(os.getenv('SCAN_RESULT_TTL', '3600')),
+        'expiry_interval': float(os.getenv('SCAN_EXPIRY_INTERVAL', '60')),
+    }
+    backend = os.getenv('SCAN_STORE', 'db').lower()
+    if backend == 'memory':
+        return MemoryResultStore(**options)
+    if backend != 'db':
+        raise ValueError(f"Unknown SCAN_STORE backend: {backend}")
+    return SqlResultStore(flush_interval=float(os.getenv('SCAN_PROGRESS_FLUSH_INTERVAL', '0.5')), **options)
@@ -0,0 +1,31 @@
+"""
+Gunicorn settings: ``gunicorn web_app:app`` picks this file up automatically.
+
+The app is imported (and warmed up, see ``core.bootstrap``) once in the
+master, so workers start ready and share the suffix list, rules and
+denylist copy-on-write.
+
+Workers are threaded (``gthread``): an open ``/scan/<id>/events`` stream
+keeps one thread busy for the whole queue wait and scan, so with sync
+workers a handful of open result pages would block every other request.
+``timeout`` only watches the worker's main loop under ``gthread``, so it
+does not cut long streams short.
+"""
+import os
+
+bind = os.getenv('BIND', '0.0.0.0:5000')
+workers = int(os.getenv('WEB_CONCURRENCY', '4'))
+worker_class = 'gthread'
+# Concurrent requests per worker, SSE streams included
+threads = int(os.getenv('GUNICORN_THREADS', '32'))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '60'))
+preload_app = True
+
+
+def when_ready(server):
+    from core import bootstrap
+    timings = bootstrap.startup_timings
+    server.log.info("Scanner ready in %.0f ms (%s)", timings.get('ready', 0) * 1000,
+                    ", ".join(f"{name} {value * 1000:.0f} ms" for name, value in timings.items()
+                              if name not in ('ready', 'warm_up')))
+    bootstrap.prepare_fork()
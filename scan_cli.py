@@ -0,0 +1,446 @@
+"""
+Bulk URL scanner for the command line.
+
+Reads URLs from a file or stdin (plain text, CSV or JSONL), scans them
+concurrently with ``core.scanner`` and streams one result per URL to JSONL
+(or to a directory of Parquet files when pyarrow is installed).
+
+Progress is checkpointed next to the output: the checkpoint records which
+input records are finished and how much output belongs to them, so an
+interrupted run started again with the same arguments truncates any output
+written after the last checkpoint and continues with the remaining URLs.
+Each input record appears in the output exactly once, tagged with its
+0-based ``index`` in the input; results are written in completion order.
+
+With ``--min-prescore`` the input is first triaged in blocks with the
+lexical pre-score from ``core.lexical``; URLs scoring below it are written
+with their ``prescore`` and a ``skipped`` note instead of being scanned.
+
+Usage:
+    python scan_cli.py urls.txt -o results.jsonl --concurrency 50
+    python scan_cli.py corpus.csv --column link -o results.parquet
+    zcat urls.jsonl.gz | python scan_cli.py - --format jsonl > results.jsonl
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Iterator
+
+from core import event_loop, lexical, serialization
+from core.scanner import scan_many_async
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+
+# Input records pre-scored together when --min-prescore is set
+PRESCORE_BLOCK = 4096
+
+
+def detect_format(path: str, first_line: str) -> str:
+    """Guess the input format from the file extension, else from the first line."""
+    extension = os.path.splitext(path.removesuffix('.gz'))[1].lower()
+    if extension in ('.csv', '.tsv'):
+        return 'csv'
+    if extension in ('.jsonl', '.ndjson', '.json'):
+        return 'jsonl'
+    if extension == '.txt':
+        return 'txt'
+    return 'jsonl' if first_line.lstrip().startswith('{') else 'txt'
+
+
+def open_input(path: str) -> io.TextIOBase:
+    if path == '-':
+        return sys.stdin
+    if path.endswith('.gz'):
+        import gzip
+        return gzip.open(path, 'rt', encoding='utf-8', newline='')
+    return open(path, 'r', encoding='utf-8', newline='')
+
+
+def read_urls(path: str, fmt: str = 'auto', column: str | None = None) -> Iterator[str]:
+    """
+    Yield the URL of every input record, in order.
+
+    Records without a URL yield an empty string so record positions (the
+    ``index`` of each result) stay stable across runs.
+    """
+    stream = open_input(path)
+    try:
+        first = stream.readline()
+        if fmt == 'auto':
+            fmt = detect_format(path, first)
+        lines = _chain(first, stream)
+        if fmt == 'txt':
+            for line in lines:
+                line = line.strip()
+                if line and not line.startswith('#'):
+                    yield line
+        elif fmt == 'jsonl':
+            field = column or 'url'
+            for line in lines:
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    yield ''
+                    continue
+                value = record.get(field) if isinstance(record, dict) else record
+                yield value.strip() if isinstance(value, str) else ''
+        elif fmt == 'csv':
+            dialect = 'excel-tab' if path.endswith(('.tsv', '.tsv.gz')) else 'excel'
+            reader = csv.reader(lines, dialect)
+            header = next(reader, None)
+            if header is None:
+                return
+            names = [name.strip().lower() for name in header]
+            if column:
+                if column.lower() not in names:
+                    raise SystemExit(f"Error: column '{column}' not found in CSV header {header}")
+                position = names.index(column.lower())
+            else:
+                candidates = [i for i, name in enumerate(names) if name in ('url', 'uri', 'link', 'href')]
+                candidates += [i for i, name in enumerate(names) if 'url' in name]
+                position = candidates[0] if candidates else 0
+                if not candidates and ('.' in header[0] or '://' in header[0]):
+                    # No header row: the first row is already data
+                    yield header[0].strip()
+            for row in reader:
+                if row:
+                    yield row[position].strip() if position < len(row) else ''
+        else:
+            raise SystemExit(f"Error: unknown input format '{fmt}'")
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+
+def _chain(first: str, rest) -> Iterator[str]:
+    if first:
+        yield first
+    yield from rest
+
+
+class Checkpoint:
+    """Finished input records and the amount of output written for them."""
+
+    def __init__(self, path: str | None, source: str):
+        self.path = path
+        self.source = source
+        self.done_below = 0  # every index below this is finished
+        self.done: set[int] = set()  # finished indices at or above done_below
+        self.output_size = 0  # JSONL bytes covered by the checkpoint
+        self.parts = 0  # Parquet files covered by the checkpoint
+        self.scanned = 0
+
+    @classmethod
+    def load(cls, path: str | None, source: str) -> 'Checkpoint':
+        checkpoint = cls(path, source)
+        if path is None or not os.path.exists(path):
+            return checkpoint
+        with open(path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        if state.get('source') != source:
+            raise SystemExit(f"Error: checkpoint '{path}' belongs to input '{state.get('source')}', "
+                             f"not '{source}' (use --restart to start over)")
+        checkpoint.done_below = state['done_below']
+        checkpoint.done = set(state['done'])
+        checkpoint.output_size = state['output_size']
+        checkpoint.parts = state['parts']
+        checkpoint.scanned = state['scanned']
+        return checkpoint
+
+    def is_done(self, index: int) -> bool:
+        return index < self.done_below or index in self.done
+
+    def mark(self, index: int):
+        self.done.add(index)
+        self.scanned += 1
+        while self.done_below in self.done:
+            self.done.discard(self.done_below)
+            self.done_below += 1
+
+    def save(self):
+        if self.path is None:
+            return
+        state = {'source': self.source, 'done_below': self.done_below, 'done': sorted(self.done),
+                 'output_size': self.output_size, 'parts': self.parts, 'scanned': self.scanned,
+                 'saved_at': time.time()}
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+
+class JsonlWriter:
+    """Appends one JSON object per line; ``commit()`` makes the lines durable."""
+
+    def __init__(self, path: str, checkpoint: Checkpoint, resume: bool):
+        self.checkpoint = checkpoint
+        self._owned = path != '-'
+        if not self._owned:
+            self._file = sys.stdout.buffer
+            return
+        self._file = open(path, 'r+b' if resume else 'wb')
+        if resume:
+            # Drop results written after the last checkpoint; they are scanned again
+            self._file.truncate(checkpoint.output_size)
+            self._file.seek(checkpoint.output_size)
+
+    def write(self, record: dict):
+        self._file.write(serialization.dumps(record) + b'\n')
+
+    def commit(self):
+        self._file.flush()
+        if self._owned:
+            os.fsync(self._file.fileno())
+            self.checkpoint.output_size = self._file.tell()
+
+    def close(self):
+        self.commit()
+        if self._owned:
+            self._file.close()
+
+
+class ParquetWriter:
+    """Buffers flattened results and writes each commit as a new ``part-NNNNN.parquet`` file."""
+
+    def __init__(self, path: str, checkpoint: Checkpoint, resume: bool):
+        if pa is None:
+            raise SystemExit("Error: Parquet output requires pyarrow (pip install pyarrow)")
+        self.path = path
+        self.checkpoint = checkpoint
+        self.schema = pa.schema([
+            ('index', pa.int64()), ('url', pa.string()), ('final_url', pa.string()),
+            ('label', pa.string()), ('score', pa.int32()), ('reasons', pa.list_(pa.string())),
+            ('hops', pa.int32()), ('content_type', pa.string()), ('has_login_form', pa.bool_()),
+            ('js_or_meta_followed', pa.bool_()), ('short_circuited', pa.bool_()),
+            ('errors', pa.list_(pa.string())), ('total_ms', pa.float64()), ('prescore', pa.int32()),
+            ('trace_result', pa.string()),
+        ])
+        self._rows: list[dict] = []
+        os.makedirs(path, exist_ok=True)
+        # Drop parts written after the last checkpoint (all of them when not resuming)
+        keep = checkpoint.parts if resume else 0
+        for name in os.listdir(path):
+            if name.startswith('part-') and name.endswith('.parquet') and int(name[5:10]) >= keep:
+                os.remove(os.path.join(path, name))
+
+    def write(self, record: dict):
+        trace_result, verdict = record.get('trace_result'), record.get('verdict')
+        if trace_result is None:
+            if 'skipped' in record:
+                self._rows.append({'index': record['index'], 'url': record['url'], 'label': None,
+                                   'errors': [], 'prescore': record['prescore']})
+            else:
+                self._rows.append({'index': record['index'], 'url': record['url'], 'label': 'UNKNOWN',
+                                   'errors': [record.get('error', '')]})
+            return
+        self._rows.append({
+            'index': record['index'],
+            'url': record['url'],
+            'final_url': trace_result.final_url,
+            'label': verdict.label,
+            'score': verdict.score,
+            'reasons': list(verdict.reasons),
+            'hops': len(trace_result.hops),
+            'content_type': trace_result.content_type,
+            'has_login_form': trace_result.has_login_form,
+            'js_or_meta_followed': trace_result.js_or_meta_followed,
+            'short_circuited': trace_result.short_circuited,
+            'errors': trace_result.errors,
+            'total_ms': trace_result.timings.get('total'),
+            'prescore': record.get('prescore'),
+            'trace_result': serialization.dumps(trace_result).decode('utf-8'),
+        })
+
+    def commit(self):
+        if not self._rows:
+            return
+        table = pa.Table.from_pylist(self._rows, schema=self.schema)
+        final_path = os.path.join(self.path, f"part-{self.checkpoint.parts:05d}.parquet")
+        pq.write_table(table, final_path + '.tmp')
+        os.replace(final_path + '.tmp', final_path)
+        self.checkpoint.parts += 1
+        self._rows = []
+
+    def close(self):
+        self.commit()
+
+
+def run(args) -> int:
+    parquet = args.output_format == 'parquet' or (args.output_format == 'auto'
+                                                  and (args.output or '').endswith('.parquet'))
+    output = args.output or '-'
+    if parquet and output == '-':
+        raise SystemExit("Error: Parquet output needs an --output directory")
+    checkpoint_path = None
+    if output != '-' and not args.no_checkpoint:
+        checkpoint_path = args.checkpoint or f"{output.rstrip(os.sep)}.checkpoint"
+    if args.restart and checkpoint_path and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    resume = checkpoint_path is not None and os.path.exists(checkpoint_path) and os.path.exists(output)
+    if not resume and not args.restart and output != '-' and os.path.exists(output) and \
+            (os.listdir(output) if os.path.isdir(output) else os.path.getsize(output)):
+        raise SystemExit(f"Error: '{output}' exists and there is no checkpoint to resume from "
+                         f"(use --restart to overwrite it)")
+    source = os.path.abspath(args.input) if args.input != '-' else '-'
+    checkpoint = Checkpoint.load(checkpoint_path if resume else None, source)
+    checkpoint.path = checkpoint_path
+    writer = (ParquetWriter if parquet else JsonlWriter)(output, checkpoint, resume)
+    if output == '-':
+        # Results own stdout; anything else printed (warnings) goes to stderr
+        sys.stdout = sys.stderr
+    resumed = checkpoint.scanned
+
+    # URLs handed to the scanner -> input indices waiting for their result
+    pending: dict[str, deque[int]] = defaultdict(deque)
+    pending_lock = threading.Lock()
+    skipped_empty: list[int] = []
+    # Pre-scores of URLs still being scanned, and (index, url, prescore) of URLs not worth a scan
+    prescores: dict[int, int] = {}
+    skipped_low_risk: list[tuple[int, str, int]] = []
+
+    def admit(block: list[tuple[int, str]]) -> Iterator[str]:
+        scores = lexical.prescore([url for _, url in block]) if args.min_prescore is not None else None
+        for position, (index, url) in enumerate(block):
+            if scores is not None:
+                if scores[position] < args.min_prescore:
+                    skipped_low_risk.append((index, url, int(scores[position])))
+                    continue
+                prescores[index] = int(scores[position])
+            with pending_lock:
+                pending[url].append(index)
+            yield url
+
+    def urls() -> Iterator[str]:
+        block: list[tuple[int, str]] = []
+        for index, url in enumerate(read_urls(args.input, args.format, args.column)):
+            if args.limit is not None and index >= args.limit:
+                break
+            if checkpoint.is_done(index):
+                continue
+            if not url:
+                skipped_empty.append(index)
+                continue
+            block.append((index, url))
+            if args.min_prescore is None or len(block) >= PRESCORE_BLOCK:
+                yield from admit(block)
+                block = []
+        yield from admit(block)
+
+    unsaved: list[int] = []
+    counts: dict[str, int] = defaultdict(int)
+    started = last_commit = time.monotonic()
+
+    def commit():
+        # Records without a URL are not scanned; they get an error result
+        while skipped_empty:
+            index = skipped_empty.pop(0)
+            writer.write({'index': index, 'url': '', 'error': 'No URL in input record'})
+            unsaved.append(index)
+        while skipped_low_risk:
+            index, url, prescore = skipped_low_risk.pop(0)
+            writer.write({'index': index, 'url': url, 'prescore': prescore,
+                          'skipped': f"Pre-score {prescore} is below {args.min_prescore}"})
+            unsaved.append(index)
+            counts['SKIPPED'] += 1
+        writer.commit()
+        for index in unsaved:
+            checkpoint.mark(index)
+        unsaved.clear()
+        checkpoint.save()
+
+    def report():
+        elapsed = time.monotonic() - started
+        done = checkpoint.scanned + len(unsaved) - resumed
+        summary = ', '.join(f"{label} {count}" for label, count in sorted(counts.items()))
+        print(f"Scanned {done} URLs in {elapsed:.0f}s ({done / elapsed if elapsed else 0:.1f}/s)"
+              f"{' after resuming at ' + str(resumed) if resumed else ''}: {summary}", file=sys.stderr)
+
+    if resumed:
+        print(f"Resuming from checkpoint: {resumed} records already done", file=sys.stderr)
+
+    # Reading and pre-scoring run on their own thread so a slow input never stalls the scans
+    url_source = event_loop.from_thread(urls(), maxsize=max(args.concurrency * 2, PRESCORE_BLOCK))
+    results = event_loop.iterate(scan_many_async(url_source, args.concurrency, timeout_s=args.timeout,
+                                                 force_rescan=args.force,
+                                                 full_evidence=args.full_evidence or None,
+                                                 deadline_s=args.deadline))
+    interrupted = False
+    try:
+        for url, trace_result, verdict in results:
+            with pending_lock:
+                indices = pending[url]
+                index = indices.popleft()
+                if not indices:
+                    del pending[url]
+            record = {'index': index, 'url': url, 'trace_result': trace_result, 'verdict': verdict}
+            if index in prescores:
+                record['prescore'] = prescores.pop(index)
+            writer.write(record)
+            unsaved.append(index)
+            counts[verdict.label] += 1
+            now = time.monotonic()
+            if now - last_commit >= args.checkpoint_interval:
+                commit()
+                last_commit = now
+                if not args.quiet:
+                    report()
+    except KeyboardInterrupt:
+        interrupted = True
+        results.close()
+    finally:
+        commit()
+        writer.close()
+    report()
+    if interrupted:
+        print(f"Interrupted; run the same command again to resume{' (checkpoint: ' + checkpoint_path + ')' if checkpoint_path else ''}",
+              file=sys.stderr)
+        return 130
+    return 0
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('input', help="file of URLs (.txt, .csv, .tsv, .jsonl, optionally .gz) or '-' for stdin")
+    parser.add_argument('-o', '--output', help="JSONL file, or Parquet directory (default: stdout as JSONL)")
+    parser.add_argument('--format', choices=('auto', 'txt', 'csv', 'jsonl'), default='auto', help='input format')
+    parser.add_argument('--column', help="CSV column / JSONL field holding the URL (default: url; for CSV "
+                                         "also uri, link, href or a *url* column, else the first column)")
+    parser.add_argument('--output-format', choices=('auto', 'jsonl', 'parquet'), default='auto',
+                        help='auto picks Parquet for outputs ending in .parquet')
+    parser.add_argument('--concurrency', type=int, default=20, help='scans in flight at once')
+    parser.add_argument('--timeout', type=float, default=8.0, help='per-request timeout in seconds')
+    parser.add_argument('--deadline', type=float, help='total time budget per scan in seconds (default: SCAN_DEADLINE)')
+    parser.add_argument('--force', action='store_true', help='bypass the verdict cache')
+    parser.add_argument('--full-evidence', action='store_true', help='fetch URLs offline checks rate UNSAFE')
+    parser.add_argument('--min-prescore', type=int, metavar='N',
+                        help=f'only scan URLs whose lexical pre-score is at least N '
+                             f'(core.lexical suggests {lexical.PRESCORE_THRESHOLD})')
+    parser.add_argument('--limit', type=int, help='only scan the first N input records')
+    parser.add_argument('--checkpoint', help='checkpoint file (default: <output>.checkpoint)')
+    parser.add_argument('--checkpoint-interval', type=float, default=10.0, help='seconds between checkpoints')
+    parser.add_argument('--no-checkpoint', action='store_true', help='do not write or resume from a checkpoint')
+    parser.add_argument('--restart', action='store_true', help='ignore an existing checkpoint and start over')
+    parser.add_argument('-q', '--quiet', action='store_true', help='no progress lines on stderr')
+    args = parser.parse_args(argv)
+    if args.concurrency < 1:
+        parser.error('--concurrency must be at least 1')
+    return run(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
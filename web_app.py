@@ -1,66 +1,140 @@
-from flask import Flask, render_template, request, jsonify, session
-import threading
 import time
+_import_started = time.perf_counter()  # for the import-to-ready start-up timing
+
+from flask import Flask, Response, render_template, request, jsonify, session, stream_with_context
+import os
+import queue
+import threading
 import uuid
 from functools import partial
-import json
 
-from core.scanner import scan_url
+from core import bootstrap, event_loop, metrics, serialization
+from core.cache import verdict_cache
+from core.events import EventBroker
+from core.http_client import client_manager
+from core.scanner import scan_url, scan_url_async, scan_many_async, _normalize_url
+from core.rules import DENYLIST
+from core.rule_engine import rule_engine
 from core.models import TraceResult, Verdict
+from core.scheduler import ScanScheduler, QueueFullError
+from core.store import create_store_from_env
 
 app = Flask(__name__)
 app.secret_key = 'your-secret-key-here'  # Change this in production
 
-# In-memory storage for scan results (use database in production)
-scan_results = {}
+# Scan state lives in core.db by default (SCAN_STORE=memory keeps it in-process)
+store = create_store_from_env()
+
+# Pushes scan progress to /scan/<scan_id>/events subscribers in this process
+events = EventBroker()
+SSE_HEARTBEAT_S = float(os.getenv('SSE_HEARTBEAT', '10'))
+
+# Web scans for the same normalized URL share one queued job: job key -> [scan_id, ...]
+_scan_groups = {}
+# Forced rescans of a URL that already has a job run in their own: scan_id -> job key
+_forced_jobs = {}
+_scan_groups_lock = threading.Lock()
+
+# Limits for /api/scan/batch
+BATCH_MAX_URLS = int(os.getenv('BATCH_MAX_URLS', '1000'))
+BATCH_MAX_CONCURRENCY = int(os.getenv('BATCH_MAX_CONCURRENCY', '20'))
+# Upper bound on the per-scan "deadline" (seconds) API callers may ask for
+SCAN_MAX_DEADLINE = float(os.getenv('SCAN_MAX_DEADLINE', '60'))
+
+# Background scans run on a fixed pool of workers with a bounded queue
+scheduler = ScanScheduler(
+    workers=int(os.getenv('SCAN_WORKERS', '8')),
+    max_queue=int(os.getenv('SCAN_QUEUE_SIZE', '100')),
+)
+
+# Component state exported on /metrics, read at scrape time
+metrics.registry.gauge_callback('netra_queue_depth', 'Web scans waiting for a worker.',
+                                lambda: scheduler.stats()['queued'])
+metrics.registry.gauge_callback('netra_queue_running', 'Web scan jobs running on a worker.',
+                                lambda: scheduler.stats()['running'])
+metrics.registry.counter_callback('netra_verdict_cache_lookups_total', 'Verdict cache lookups by result.',
+                                  lambda: {'hit': verdict_cache.hits, 'miss': verdict_cache.misses}, label='result')
+metrics.registry.gauge_callback('netra_verdict_cache_hit_ratio', 'Verdict cache hits / lookups.',
+                                lambda: verdict_cache.stats()['hit_rate'])
+metrics.registry.gauge_callback('netra_http_requests_in_flight', 'Outbound HTTP requests in flight.',
+                                lambda: client_manager.stats()['requests_in_flight'])
+metrics.registry.gauge_callback('netra_http_circuits_open', 'Hosts skipped because they keep failing or hanging.',
+                                lambda: len(client_manager.governor.open_circuits()))
+metrics.registry.counter_callback('netra_http_circuit_rejections_total', 'Requests skipped by an open host circuit.',
+                                  lambda: client_manager.governor.rejected)
+metrics.registry.counter_callback('netra_dns_lookups_total', 'DNS lookups that missed the resolver cache.',
+                                  lambda: client_manager.resolver.lookups)
+metrics.registry.counter_callback('netra_dns_blocked_total', 'Connections refused for resolving to private addresses.',
+                                  lambda: client_manager.resolver.blocked)
+metrics.registry.gauge_callback('netra_sse_subscribers', 'Open /scan/<id>/events streams.',
+                                events.subscriber_count)
+metrics.registry.gauge_callback('netra_startup_seconds', 'Time spent in each start-up phase of this process.',
+                                lambda: bootstrap.startup_timings, label='phase')
+
+def _scan_payload(trace_result: TraceResult, verdict: Verdict) -> dict:
+    """Scan results as plain dicts, for the store and the ``done`` event."""
+    return serialization.to_builtins({'trace_result': trace_result, 'verdict': verdict})
 
-def _web_progress_callback(scan_id, progress, message):
-    """Callback function to update scan progress for web interface."""
-    if scan_id in scan_results:
-        scan_results[scan_id]['progress'] = progress
-        scan_results[scan_id]['message'] = message
-        scan_results[scan_id]['last_update'] = time.time()
+def _json_response(data, status: int = 200) -> Response:
+    """Encode with the shared serializer (result dataclasses included)."""
+    body = data if isinstance(data, bytes) else serialization.dumps(data)
+    return Response(body, status=status, mimetype='application/json')
 
-def scan_url_thread(scan_id, url):
-    """Thread function to run URL scan."""
+def _deadline(data: dict) -> float | None:
+    """The "deadline" of an API request in seconds, capped at SCAN_MAX_DEADLINE; ValueError if invalid."""
+    if data.get('deadline') is None:
+        return None
     try:
-        # Create progress callback specific to this scan
-        progress_callback = partial(_web_progress_callback, scan_id)
+        deadline = float(data['deadline'])
+    except (TypeError, ValueError):
+        raise ValueError('deadline must be a number of seconds')
+    if not deadline > 0:
+        raise ValueError('deadline must be positive')
+    return min(deadline, SCAN_MAX_DEADLINE)
+
+def _web_progress_callback(job_key, progress, message):
+    """Callback function to update scan progress for every scan sharing a job."""
+    for scan_id in _scan_groups.get(job_key, ()):
+        store.update_progress(scan_id, progress, message)
+        events.publish(scan_id, 'progress', {'status': 'processing', 'progress': progress, 'message': message})
+
+def _flag(value) -> bool:
+    """Interpret a boolean request flag (e.g. 'force') from a form field or JSON body."""
+    if isinstance(value, str):
+        return value.strip().lower() in ('1', 'true', 'yes', 'on')
+    return bool(value)
+
+def scan_url_job(job_key, url, force_rescan=False):
+    """Worker job that runs a queued URL scan for every scan attached to it."""
+    for scan_id in _scan_groups.get(job_key, ()):
+        store.update(scan_id, status='processing')
+    try:
+        # Create progress callback specific to this job
+        progress_callback = partial(_web_progress_callback, job_key)
         
         # Run the scan
-        trace_result, verdict = scan_url(url, progress_callback)
+        trace_result, verdict = scan_url(url, progress_callback, force_rescan=force_rescan)
         
-        # Store final results
-        scan_results[scan_id].update({
+        outcome = {
             'status': 'completed',
-            'trace_result': {
-                'input_url': trace_result.input_url,
-                'final_url': trace_result.final_url,
-                'hops': [{
-                    'url': hop.url,
-                    'status_code': hop.status_code,
-                    'reason': hop.reason,
-                    'elapsed_ms': hop.elapsed_ms
-                } for hop in trace_result.hops],
-                'js_or_meta_followed': trace_result.js_or_meta_followed,
-                'content_type': trace_result.content_type,
-                'has_login_form': trace_result.has_login_form,
-                'errors': trace_result.errors
-            },
-            'verdict': {
-                'label': verdict.label,
-                'score': verdict.score,
-                'reasons': verdict.reasons
-            },
-            'completed_at': time.time()
-        })
-        
+            **_scan_payload(trace_result, verdict),
+        }
     except Exception as e:
-        scan_results[scan_id].update({
+        outcome = {
             'status': 'error',
             'error': str(e),
-            'completed_at': time.time()
-        })
+        }
+    
+    # Detach the group first so later submissions start a fresh job
+    with _scan_groups_lock:
+        scan_ids = _scan_groups.pop(job_key, [])
+        for scan_id in scan_ids:
+            _forced_jobs.pop(scan_id, None)
+    
+    # Store final results
+    for scan_id in scan_ids:
+        store.update(scan_id, **outcome, completed_at=time.time())
+        events.publish(scan_id, 'done', outcome)
 
 @app.route('/')
 def index():
@@ -71,54 +145,122 @@ def index():
 def start_scan():
     """Start a new URL scan."""
     url = request.form.get('url', '').strip()
+    force_rescan = _flag(request.form.get('force', ''))
     
     if not url:
         return jsonify({'error': 'URL is required'}), 400
     
     # Generate unique scan ID
     scan_id = str(uuid.uuid4())
+    job_key = _normalize_url(url)
     
-    # Initialize scan entry
-    scan_results[scan_id] = {
-        'status': 'processing',
-        'url': url,
-        'progress': 0.0,
-        'message': 'Starting scan...',
-        'started_at': time.time(),
-        'last_update': time.time()
-    }
-    
-    # Start scan in background thread
-    thread = threading.Thread(target=scan_url_thread, args=(scan_id, url))
-    thread.daemon = True
-    thread.start()
+    store.start_background_jobs()
+    with _scan_groups_lock:
+        group = _scan_groups.get(job_key)
+        if group is not None and force_rescan:
+            # The queued or running job may serve a cached verdict: a forced rescan gets its own
+            job_key = f"{job_key}#{scan_id}"
+            _forced_jobs[scan_id] = job_key
+            group = None
+        if group is not None:
+            # The same URL is already queued or running: share its job
+            leader = store.get(group[0]) or {}
+            store.create(scan_id, url,
+                         status=leader.get('status', 'queued'),
+                         progress=leader.get('progress', 0.0),
+                         message=leader.get('message', 'Waiting in queue...'))
+            group.append(scan_id)
+            return jsonify({'scan_id': scan_id, 'queue_position': scheduler.position(job_key)})
+        
+        # Initialize scan entry
+        store.create(scan_id, url, status='queued', progress=0.0, message='Waiting in queue...')
+        _scan_groups[job_key] = [scan_id]
+        
+        # Hand the scan to the worker pool, or push back if it is saturated
+        try:
+            scheduler.submit(job_key, scan_url_job, job_key, url, force_rescan)
+        except QueueFullError as e:
+            del _scan_groups[job_key]
+            _forced_jobs.pop(scan_id, None)
+            store.delete(scan_id)
+            response = jsonify({'error': 'Scanner is busy, please retry shortly',
+                                'retry_after': e.retry_after})
+            response.headers['Retry-After'] = str(e.retry_after)
+            return response, 429
     
-    return jsonify({'scan_id': scan_id})
+    return jsonify({'scan_id': scan_id, 'queue_position': scheduler.position(job_key)})
 
 @app.route('/scan/<scan_id>/status')
 def get_scan_status(scan_id):
     """Get the current status of a scan."""
-    if scan_id not in scan_results:
+    # Finished scans are encoded once; repeated polls reuse the bytes
+    body = store.get_json(scan_id, view=partial(_status_view, scan_id=scan_id))
+    if body is None:
         return jsonify({'error': 'Scan not found'}), 404
     
-    scan_data = scan_results[scan_id]
+    return _json_response(body)
+
+def _status_view(scan_data: dict, scan_id: str) -> dict:
+    """Add the live queue position to a queued scan's record."""
+    if scan_data['status'] != 'queued':
+        return scan_data
+    position = scheduler.position(_forced_jobs.get(scan_id) or _normalize_url(scan_data['url']))
+    return dict(scan_data, queue_position=position,
+                message=f'Waiting in queue (position {position})...' if position else scan_data['message'])
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {serialization.dumps(data).decode()}\n\n"
+
+@app.route('/scan/<scan_id>/events')
+def scan_events(scan_id):
+    """
+    Stream scan progress as Server-Sent Events.
     
-    # Clean up old completed scans (optional)
-    if scan_data['status'] in ['completed', 'error']:
-        # Keep completed scans for 1 hour
-        if time.time() - scan_data.get('completed_at', 0) > 3600:
-            del scan_results[scan_id]
-            return jsonify({'error': 'Scan expired'}), 404
+    Emits ``progress`` events while the scan runs and a final ``done`` event
+    carrying the outcome. Scans running in another server process are picked
+    up by re-reading the store on every heartbeat.
+    """
+    # Subscribe before reading the store so no update falls in between
+    subscriber = events.subscribe(scan_id)
+    scan_data = store.get(scan_id)
+    if scan_data is None:
+        events.unsubscribe(scan_id, subscriber)
+        return jsonify({'error': 'Scan not found'}), 404
     
-    return jsonify(scan_data)
+    def generate(scan_data):
+        try:
+            while scan_data is not None and scan_data['status'] not in ('completed', 'error'):
+                yield _sse('progress', _status_view(scan_data, scan_id))
+                try:
+                    event, data = subscriber.get(timeout=SSE_HEARTBEAT_S)
+                except queue.Empty:
+                    # Heartbeat; the scan may be running in another process
+                    scan_data = store.get(scan_id)
+                    continue
+                if event == 'done':
+                    yield _sse('done', data)
+                    return
+                scan_data = dict(scan_data, **data)
+            
+            if scan_data is None:
+                yield _sse('done', {'status': 'error', 'error': 'Scan not found'})
+            else:
+                yield _sse('done', scan_data)
+        finally:
+            events.unsubscribe(scan_id, subscriber)
+    
+    response = Response(stream_with_context(generate(scan_data)), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
 
 @app.route('/results/<scan_id>')
 def show_results(scan_id):
     """Display scan results."""
-    if scan_id not in scan_results or scan_results[scan_id]['status'] != 'completed':
+    scan_data = store.get(scan_id)
+    if scan_data is None or scan_data['status'] != 'completed':
         return render_template('error.html', message='Scan not found or not completed'), 404
     
-    scan_data = scan_results[scan_id]
     return render_template('results.html', 
                          scan_data=scan_data,
                          trace_result=scan_data['trace_result'],
@@ -132,39 +274,94 @@ def api_scan():
     
     if not url:
         return jsonify({'error': 'URL is required'}), 400
+    try:
+        deadline_s = _deadline(data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
     try:
-        # Run scan synchronously for API
+        # Run the async scan on the shared event loop and wait for it
         def api_progress_callback(progress, message):
             pass  # No progress updates for API
         
-        trace_result, verdict = scan_url(url, api_progress_callback)
+        force_rescan = _flag(data.get('force', False))
+        full_evidence = _flag(data['full_evidence']) if 'full_evidence' in data else None
+        trace_result, verdict = event_loop.run(scan_url_async(url, api_progress_callback,
+                                                              force_rescan=force_rescan,
+                                                              full_evidence=full_evidence,
+                                                              deadline_s=deadline_s))
         
-        return jsonify({
-            'url': url,
-            'trace_result': {
-                'input_url': trace_result.input_url,
-                'final_url': trace_result.final_url,
-                'hops': [{
-                    'url': hop.url,
-                    'status_code': hop.status_code,
-                    'reason': hop.reason,
-                    'elapsed_ms': hop.elapsed_ms
-                } for hop in trace_result.hops],
-                'js_or_meta_followed': trace_result.js_or_meta_followed,
-                'content_type': trace_result.content_type,
-                'has_login_form': trace_result.has_login_form,
-                'errors': trace_result.errors
-            },
-            'verdict': {
-                'label': verdict.label,
-                'score': verdict.score,
-                'reasons': verdict.reasons
-            }
-        })
+        return _json_response({'url': url, 'trace_result': trace_result, 'verdict': verdict})
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/scan/batch', methods=['POST'])
+def api_scan_batch():
+    """
+    Scan a list of URLs concurrently and stream results as NDJSON.
+
+    Each line is emitted as soon as its scan finishes, so the order follows
+    completion time rather than input order.
+    """
+    data = request.get_json(silent=True) or {}
+    urls = data.get('urls')
+    if not isinstance(urls, list) or not urls:
+        return jsonify({'error': 'A non-empty list of URLs is required'}), 400
+    
+    # Deduplicate on the normalized URL, keeping the first spelling
+    unique_urls = {}
+    for url in urls:
+        if isinstance(url, str) and url.strip():
+            unique_urls.setdefault(_normalize_url(url.strip()), url.strip())
+    if not unique_urls:
+        return jsonify({'error': 'A non-empty list of URLs is required'}), 400
+    if len(unique_urls) > BATCH_MAX_URLS:
+        return jsonify({'error': f'At most {BATCH_MAX_URLS} URLs per batch'}), 400
+    
+    try:
+        concurrency = int(data.get('concurrency', 10))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'concurrency must be an integer'}), 400
+    concurrency = max(1, min(concurrency, BATCH_MAX_CONCURRENCY))
+    try:
+        deadline_s = _deadline(data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    force_rescan = _flag(data.get('force', False))
+    full_evidence = _flag(data['full_evidence']) if 'full_evidence' in data else None
+    
+    def generate():
+        results = event_loop.iterate(scan_many_async(unique_urls.values(), concurrency,
+                                                     force_rescan=force_rescan,
+                                                     full_evidence=full_evidence,
+                                                     deadline_s=deadline_s))
+        for url, trace_result, verdict in results:
+            yield serialization.dumps({'url': url, 'trace_result': trace_result, 'verdict': verdict}) + b'\n'
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+@app.route('/api/stats')
+def api_stats():
+    """Runtime statistics for monitoring."""
+    return jsonify({
+        'scheduler': scheduler.stats(),
+        'http_pool': client_manager.stats(),
+        'verdict_cache': verdict_cache.stats(),
+        'sse_subscribers': events.subscriber_count(),
+        'startup': bootstrap.startup_timings,
+        'denylist': DENYLIST.stats(),
+        'rules': rule_engine.stats(),
+    })
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus metrics for this process."""
+    return Response(metrics.registry.render(), mimetype='text/plain; version=0.0.4')
+
+# Build the suffix list, rules, denylist and TLS context now instead of during
+# the first scan; under gunicorn --preload this runs once in the master
+bootstrap.warm_up(_import_started)
+
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5000)